@@ -0,0 +1,8 @@
+"""
+チュートリアルアプリの性能測定（ベンチマーク）パッケージ
+Step 1〜5 の各アプリの全ルートにリクエストを送り、処理件数（req/s）と応答時間（p50/p95/p99）を測ります
+
+使い方（tutorials フォルダで実行）:
+    python -m benchmarks --steps 3 5 --concurrency 1 8 --dataset 100 10000 --output before.json
+    python -m benchmarks --steps 3 5 --concurrency 1 8 --dataset 100 10000 --compare before.json
+"""
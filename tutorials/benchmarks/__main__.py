@@ -0,0 +1,154 @@
+"""
+ベンチマークの実行スクリプト（tutorials フォルダで python -m benchmarks として実行）
+"""
+
+import argparse
+import logging
+import tempfile
+
+from .apps import STEPS, load_app_module
+from .results import DEFAULT_THRESHOLD, compare_results, load_results, save_results
+from .runner import TRANSPORTS, make_transport, run_scenario
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='チュートリアルアプリの性能測定（req/s・p50/p95/p99）')
+    parser.add_argument('--steps', type=int, nargs='+', default=sorted(STEPS), choices=sorted(STEPS),
+                        help='測定するステップ（既定: すべて）')
+    parser.add_argument('--scenario', default=None,
+                        help='シナリオ名にこの文字列を含むものだけを測定する（例: "/api/"）')
+    parser.add_argument('--transport', choices=TRANSPORTS + ('both',), default='both',
+                        help='リクエストの送り方（既定: both）')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4],
+                        help='同時に送るリクエスト数（スレッド数）。複数指定可（既定: 1 4）')
+    parser.add_argument('--dataset', type=int, nargs='+', default=[100],
+                        help='用意するタスクの件数。複数指定可（既定: 100）')
+    parser.add_argument('--requests', type=int, default=200,
+                        help='1つの条件で送るリクエスト数（既定: 200）')
+    parser.add_argument('--warmup', type=int, default=10,
+                        help='集計に含めない最初のリクエスト数（既定: 10）')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='ランダムに選ぶIDの乱数シード（既定: 0）')
+    parser.add_argument('--output', default=None,
+                        help='結果を保存するJSONファイル')
+    parser.add_argument('--compare', default=None,
+                        help='比較する前回の結果のJSONファイル（悪化があれば終了コード1）')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help=f'悪化とみなす変化率（%%、既定: {DEFAULT_THRESHOLD}）')
+    return parser.parse_args()
+
+
+def print_result(result):
+    print(f"  {result['scenario']:<32} {result['transport']:<11} c={result['concurrency']:<3} "
+          f"n={result['dataset']:<6} {result['rps']:>9.1f} req/s  "
+          f"p50 {result['p50_ms']:>8.2f}  p95 {result['p95_ms']:>8.2f}  p99 {result['p99_ms']:>8.2f} ms"
+          + (f"  ⚠️ エラー {result['errors']}件" if result['errors'] else ''))
+
+
+def run_benchmarks(args, workdir):
+    """
+    指定された条件の組み合わせをすべて測定し、結果のリストを返す
+    """
+    transports = TRANSPORTS if args.transport == 'both' else (args.transport,)
+    results = []
+    for step_number in args.steps:
+        step = STEPS[step_number]
+        module = load_app_module(step)
+        # Step 5 の app.py はアプリを作らないため、prepare で作ったアプリ（context['app']）を使う
+        app = getattr(module, 'app', None)
+        scenarios = [
+            s for s in step['scenarios']
+            if args.scenario is None or args.scenario in s['name']
+        ]
+        if not scenarios:
+            continue
+        # Step 1 はデータを持たないため、件数を変えて測っても意味がない
+        datasets = args.dataset if step.get('uses_dataset', True) else [0]
+
+        print(f"🚀 Step {step_number}（{step['directory']}）")
+        for dataset in datasets:
+            for transport_name in transports:
+                for concurrency in args.concurrency:
+                    for scenario in scenarios:
+                        # シナリオごとにデータを用意し直し、前のシナリオの変更が影響しないようにする
+                        context = step['prepare'](module, dataset, workdir)
+                        if scenario.get('ids') == 'sequential' and args.requests + args.warmup > dataset:
+                            print(f"  💡 {scenario['name']}: 件数（{dataset}）より多く実行するため、"
+                                  f"途中から存在しないIDへのリクエストになります")
+                        # Step 5 はシナリオごとに、用意したデータベースを使うアプリを作り直す
+                        with make_transport(transport_name, context.get('app', app)) as transport:
+                            summary = run_scenario(
+                                transport, scenario, context['ids'],
+                                requests=args.requests,
+                                concurrency=concurrency,
+                                warmup=args.warmup,
+                                seed=args.seed,
+                            )
+                        result = {
+                            'step': step_number,
+                            'scenario': scenario['name'],
+                            'transport': transport_name,
+                            'concurrency': concurrency,
+                            'dataset': dataset,
+                            **summary,
+                        }
+                        print_result(result)
+                        results.append(result)
+        if 'cleanup' in step:
+            step['cleanup'](module)
+    return results
+
+
+def print_comparison(comparisons, threshold):
+    """
+    前回との比較結果を表示し、悪化した件数を返す
+    """
+    print()
+    print(f"📊 前回の結果との比較（±{threshold}% 以上の変化を表示）")
+    regressions = 0
+    for c in comparisons:
+        step, scenario, transport, concurrency, dataset = c['key']
+        label = f"Step {step} {scenario} {transport} c={concurrency} n={dataset}"
+        if c['regression']:
+            regressions += 1
+            mark = '❌ 悪化'
+        elif c['improvement']:
+            mark = '✅ 改善'
+        else:
+            continue
+        print(f"  {mark} {label}: {c['rps_before']} → {c['rps_after']} req/s（{c['rps_change']:+}%）, "
+              f"p95 {c['p95_before']} → {c['p95_after']} ms（{c['p95_change']:+}%）")
+    if not comparisons:
+        print("  ⚠️ 同じ条件で測った前回の結果がありません")
+    elif regressions == 0:
+        print(f"  ✅ 悪化はありません（{len(comparisons)}件を比較）")
+    return regressions
+
+
+def main():
+    args = parse_args()
+
+    # HTTPサーバーの1リクエストごとのログは測定結果の表示の邪魔になるため出さない
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+
+    with tempfile.TemporaryDirectory(prefix='tutorial-bench-') as workdir:
+        results = run_benchmarks(args, workdir)
+
+    settings = {
+        'requests': args.requests,
+        'warmup': args.warmup,
+        'seed': args.seed,
+    }
+    current = {'results': results, 'settings': settings}
+    if args.output:
+        current = save_results(args.output, results, settings)
+        print(f"💾 結果を {args.output} に保存しました")
+
+    if args.compare:
+        comparisons = compare_results(load_results(args.compare), current, args.threshold)
+        regressions = print_comparison(comparisons, args.threshold)
+        raise SystemExit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
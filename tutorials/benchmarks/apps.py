@@ -0,0 +1,278 @@
+"""
+ベンチマーク対象のアプリと、ルートごとの測定シナリオの定義
+各ステップの app.py を読み込み、指定した件数のデータを用意してから測定します
+"""
+
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import urllib.parse
+
+# tutorials フォルダ（各ステップのフォルダが並んでいる場所）
+TUTORIALS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PRIORITIES = ('high', 'medium', 'low')
+
+# 合成データのタイトルに使う語句（全文検索・部分一致検索の対象になる）
+TITLE_WORDS = ('Flask学習', 'データベース設計', 'HTMLとCSS', 'JavaScript', 'フォーム処理', '資料作成', '会議準備')
+
+# インポートのシナリオで1回に送る件数
+IMPORT_BATCH_ROWS = 100
+
+
+def make_todo(i):
+    """
+    i 番目の合成タスクを作る（同じ i からは常に同じ内容になる）
+    """
+    return {
+        'id': i,
+        'title': f'{TITLE_WORDS[i % len(TITLE_WORDS)]} その{i}',
+        'description': f'ベンチマーク用に生成したタスク {i} 件目の説明文',
+        'priority': PRIORITIES[i % len(PRIORITIES)],
+        'completed': i % 3 == 0,
+        'created_at': f'2024-01-{i % 28 + 1:02d}',
+    }
+
+
+def load_app_module(step):
+    """
+    ステップのフォルダにある app.py を、他のステップと名前が重ならないように読み込む
+    """
+    module_name = f'benchmark_{step["directory"]}_app'
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+
+    directory = os.path.join(TUTORIALS_DIR, step['directory'])
+    # Step 5 の app.py は同じフォルダの db_pool.py などを import する
+    if directory not in sys.path:
+        sys.path.insert(0, directory)
+
+    spec = importlib.util.spec_from_file_location(module_name, os.path.join(directory, 'app.py'))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+# ===== データの準備（ステップごと） =====
+
+def prepare_nothing(module, dataset, workdir):
+    """
+    Step 1: データを持たないため何もしない
+    """
+    return {'ids': []}
+
+
+def prepare_sample_list(module, dataset, workdir):
+    """
+    Step 2: todo_sample_data を dataset 件の合成データに入れ替える
+    """
+    module.todo_sample_data[:] = [make_todo(i) for i in range(1, dataset + 1)]
+    return {'ids': list(range(1, dataset + 1))}
+
+
+def prepare_todo_store(module, dataset, workdir):
+    """
+    Step 3: タスクの置き場（todo_store）を dataset 件の合成データに入れ替える
+    """
+    module.todo_store.replace(make_todo(i) for i in range(1, dataset + 1))
+    return {'ids': list(range(1, dataset + 1))}
+
+
+def prepare_form_list(module, dataset, workdir):
+    """
+    Step 4: タスクの置き場を dataset 件の合成データ（完了状態なし）に入れ替える（次のIDは dataset + 1 になる）
+    """
+    todos = []
+    for i in range(1, dataset + 1):
+        todo = make_todo(i)
+        del todo['completed']
+        todos.append(todo)
+    module.todo_store.replace(todos)
+    return {'ids': list(range(1, dataset + 1))}
+
+
+def build_step05_database(module, dataset, workdir):
+    """
+    Step 5: dataset 件の合成データを入れたデータベースファイルを作る（件数ごとに1回だけ作って使い回す）
+    """
+    template_path = os.path.join(workdir, f'template_{dataset}.db')
+    if os.path.exists(template_path):
+        return template_path
+
+    import init_db
+    import seed_data
+    # init_db の進捗表示はベンチマークの結果に混ざらないよう捨てる
+    with contextlib.redirect_stdout(io.StringIO()):
+        init_db.init_database(template_path, with_samples=False)
+
+    # init_db.py --rows と同じ合成データ（IDは 1〜dataset になる）
+    conn = sqlite3.connect(template_path)
+    try:
+        seed_data.bulk_load(conn, dataset, report=None)
+    finally:
+        conn.close()
+    return template_path
+
+
+# Step 5: 最後に作ったアプリ（次のシナリオの前・終了時にデータベースの接続を閉じる）
+_database_apps = {}
+
+
+def prepare_database(module, dataset, workdir):
+    """
+    Step 5: 作成済みのデータベースをコピーし、そのファイルを使うアプリを create_app() で作る
+    """
+    template_path = build_step05_database(module, dataset, workdir)
+    db_path = os.path.join(workdir, 'bench.db')
+
+    # 前のシナリオの接続と書き込みスレッドを片付けてからファイルを差し替える
+    close_database(module)
+    shutil.copyfile(template_path, db_path)
+
+    # 接続先以外はアプリと同じ設定（読み取り専用・書き込み専用の2つのプール、SQLの計測あり）で作る
+    with contextlib.redirect_stdout(io.StringIO()):
+        app = module.create_app({'DATABASE': db_path})
+    _database_apps[module.__name__] = app
+    return {'ids': list(range(1, dataset + 1)), 'app': app}
+
+
+def close_database(module):
+    """
+    Step 5: 書き込みスレッドを止め、プールの接続をすべて閉じる
+    """
+    app = _database_apps.pop(module.__name__, None)
+    if app is not None:
+        app.extensions['todo_db'].close()
+
+
+def import_body():
+    """
+    Step 5 のインポートで送る NDJSON（IMPORT_BATCH_ROWS 件）
+    """
+    lines = []
+    for i in range(1, IMPORT_BATCH_ROWS + 1):
+        todo = make_todo(i)
+        lines.append(json.dumps({
+            'title': todo['title'],
+            'description': todo['description'],
+            'priority': todo['priority'],
+            'completed': todo['completed'],
+        }, ensure_ascii=False))
+    return ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+# ===== 測定シナリオ =====
+# path の {id} は ids の指定に従って置き換える
+#   'random': 用意したIDからランダムに選ぶ（何度実行しても状態が大きく変わらない操作）
+#   'sequential': 先頭から順に1回ずつ使う（削除など、同じIDに2回実行できない操作）
+# expect は成功とみなすステータスコード
+
+STEPS = {
+    1: {
+        'directory': 'step01_flask_setup',
+        'prepare': prepare_nothing,
+        'uses_dataset': False,
+        'scenarios': [
+            {'name': 'GET /', 'method': 'GET', 'path': '/', 'expect': (200,)},
+            {'name': 'GET /hello', 'method': 'GET', 'path': '/hello', 'expect': (200,)},
+            {'name': 'GET /about', 'method': 'GET', 'path': '/about', 'expect': (200,)},
+            {'name': 'GET /health', 'method': 'GET', 'path': '/health', 'expect': (200,)},
+            {'name': 'GET /livez', 'method': 'GET', 'path': '/livez', 'expect': (200,)},
+            {'name': 'GET /readyz', 'method': 'GET', 'path': '/readyz', 'expect': (200,)},
+            {'name': 'GET /metrics', 'method': 'GET', 'path': '/metrics', 'expect': (200,)},
+        ],
+    },
+    2: {
+        'directory': 'step02_html_css',
+        'prepare': prepare_sample_list,
+        'scenarios': [
+            {'name': 'GET /', 'method': 'GET', 'path': '/', 'expect': (200,)},
+            {'name': 'GET /about', 'method': 'GET', 'path': '/about', 'expect': (200,)},
+            {'name': 'GET /health', 'method': 'GET', 'path': '/health', 'expect': (200,)},
+            {'name': 'GET /livez', 'method': 'GET', 'path': '/livez', 'expect': (200,)},
+            {'name': 'GET /readyz', 'method': 'GET', 'path': '/readyz', 'expect': (200,)},
+            {'name': 'GET /metrics', 'method': 'GET', 'path': '/metrics', 'expect': (200,)},
+        ],
+    },
+    3: {
+        'directory': 'step03_javascript_dom',
+        'prepare': prepare_todo_store,
+        'scenarios': [
+            {'name': 'GET /', 'method': 'GET', 'path': '/', 'expect': (200,)},
+            {'name': 'GET /about', 'method': 'GET', 'path': '/about', 'expect': (200,)},
+            {'name': 'POST /api/toggle-todo/<id>', 'method': 'POST', 'path': '/api/toggle-todo/{id}',
+             'ids': 'random', 'expect': (200,)},
+            {'name': 'POST /api/hide-todo/<id>', 'method': 'POST', 'path': '/api/hide-todo/{id}',
+             'ids': 'random', 'expect': (200,)},
+            {'name': 'GET /api/todos?status=completed', 'method': 'GET',
+             'path': '/api/todos?status=completed&limit=100', 'expect': (200,)},
+            {'name': 'GET /api/todos?priority=high&sort=-created_at', 'method': 'GET',
+             'path': '/api/todos?priority=high&sort=-created_at&limit=20', 'expect': (200,)},
+            {'name': 'GET /api/show-completed', 'method': 'GET', 'path': '/api/show-completed', 'expect': (200,)},
+            {'name': 'GET /api/show-pending', 'method': 'GET', 'path': '/api/show-pending', 'expect': (200,)},
+            {'name': 'GET /health', 'method': 'GET', 'path': '/health', 'expect': (200,)},
+            {'name': 'GET /livez', 'method': 'GET', 'path': '/livez', 'expect': (200,)},
+            {'name': 'GET /readyz', 'method': 'GET', 'path': '/readyz', 'expect': (200,)},
+            {'name': 'GET /metrics', 'method': 'GET', 'path': '/metrics', 'expect': (200,)},
+        ],
+    },
+    4: {
+        'directory': 'step04_form_post',
+        'prepare': prepare_form_list,
+        'scenarios': [
+            {'name': 'GET /', 'method': 'GET', 'path': '/', 'expect': (200,)},
+            {'name': 'GET /add', 'method': 'GET', 'path': '/add', 'expect': (200,)},
+            {'name': 'POST /add', 'method': 'POST', 'path': '/add', 'expect': (302,),
+             'form': {'title': 'ベンチマークのタスク', 'description': '説明', 'priority': 'medium'}},
+            {'name': 'POST /delete/<id>', 'method': 'POST', 'path': '/delete/{id}',
+             'ids': 'sequential', 'expect': (302,)},
+            {'name': 'GET /about', 'method': 'GET', 'path': '/about', 'expect': (200,)},
+            {'name': 'GET /health', 'method': 'GET', 'path': '/health', 'expect': (200,)},
+            {'name': 'GET /livez', 'method': 'GET', 'path': '/livez', 'expect': (200,)},
+            {'name': 'GET /readyz', 'method': 'GET', 'path': '/readyz', 'expect': (200,)},
+            {'name': 'GET /metrics', 'method': 'GET', 'path': '/metrics', 'expect': (200,)},
+        ],
+    },
+    5: {
+        'directory': 'step05_database',
+        'prepare': prepare_database,
+        'cleanup': close_database,
+        'scenarios': [
+            {'name': 'GET /', 'method': 'GET', 'path': '/', 'expect': (200,)},
+            {'name': 'GET /?per_page=100', 'method': 'GET', 'path': '/?per_page=100', 'expect': (200,)},
+            {'name': 'GET /search', 'method': 'GET', 'path': '/search?q=' + urllib.parse.quote('データベース'), 'expect': (200,)},
+            {'name': 'GET /add', 'method': 'GET', 'path': '/add', 'expect': (200,)},
+            {'name': 'POST /add', 'method': 'POST', 'path': '/add', 'expect': (302,),
+             'form': {'title': 'ベンチマークのタスク', 'description': '説明', 'priority': 'medium'}},
+            {'name': 'GET /edit/<id>', 'method': 'GET', 'path': '/edit/{id}', 'ids': 'random', 'expect': (200,)},
+            {'name': 'POST /edit/<id>', 'method': 'POST', 'path': '/edit/{id}', 'ids': 'random', 'expect': (302,),
+             'form': {'title': '更新したタスク', 'description': '更新', 'priority': 'high', 'completed': '1'}},
+            {'name': 'POST /toggle/<id>', 'method': 'POST', 'path': '/toggle/{id}', 'ids': 'random', 'expect': (302,)},
+            {'name': 'POST /delete/<id>', 'method': 'POST', 'path': '/delete/{id}', 'ids': 'sequential', 'expect': (302,)},
+            {'name': 'GET /api/todos', 'method': 'GET', 'path': '/api/todos', 'expect': (200,)},
+            {'name': 'POST /api/todos', 'method': 'POST', 'path': '/api/todos', 'expect': (201,),
+             'json': {'title': 'ベンチマークのタスク', 'priority': 'low'}},
+            {'name': 'GET /api/todos/<id>', 'method': 'GET', 'path': '/api/todos/{id}', 'ids': 'random', 'expect': (200,)},
+            {'name': 'PATCH /api/todos/<id>', 'method': 'PATCH', 'path': '/api/todos/{id}', 'ids': 'random',
+             'expect': (200,), 'json': {'completed': True}},
+            {'name': 'DELETE /api/todos/<id>', 'method': 'DELETE', 'path': '/api/todos/{id}', 'ids': 'sequential',
+             'expect': (200,)},
+            {'name': 'POST /api/todos/batch', 'method': 'POST', 'path': '/api/todos/batch', 'expect': (200,),
+             'json': {'operations': [{'op': 'toggle', 'id': i} for i in range(1, 11)]}},
+            {'name': 'POST /import', 'method': 'POST', 'path': '/import?format=ndjson', 'expect': (200,),
+             'body': import_body, 'content_type': 'application/x-ndjson'},
+            {'name': 'GET /export', 'method': 'GET', 'path': '/export?format=ndjson', 'expect': (200,)},
+            {'name': 'GET /about', 'method': 'GET', 'path': '/about', 'expect': (200,)},
+            {'name': 'GET /health', 'method': 'GET', 'path': '/health', 'expect': (200,)},
+            {'name': 'GET /livez', 'method': 'GET', 'path': '/livez', 'expect': (200,)},
+            {'name': 'GET /readyz', 'method': 'GET', 'path': '/readyz', 'expect': (200,)},
+            {'name': 'GET /metrics', 'method': 'GET', 'path': '/metrics', 'expect': (200,)},
+        ],
+    },
+}
@@ -0,0 +1,131 @@
+"""
+gzip 圧縮の効果の測定（tutorials フォルダで python -m benchmarks.compression として実行）
+
+各ステップの GET のレスポンス（HTML・JSON）を圧縮レベルごとに圧縮し、
+「減ったバイト数」と「圧縮にかかったCPU時間」を並べて表示します。
+"""
+
+import argparse
+import gzip
+import logging
+import tempfile
+import time
+
+from common.compression import COMPRESSIBLE_TYPES, DEFAULT_MINIMUM_SIZE
+
+from .apps import STEPS, load_app_module
+
+# 比べる圧縮レベル（1: 速いが縮みにくい 〜 9: 遅いがよく縮む。アプリの既定は 6）
+DEFAULT_LEVELS = (1, 6, 9)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='レスポンスの gzip 圧縮の効果（減ったバイト数・CPU時間）')
+    parser.add_argument('--steps', type=int, nargs='+', default=sorted(STEPS), choices=sorted(STEPS),
+                        help='測定するステップ（既定: すべて）')
+    parser.add_argument('--scenario', default=None,
+                        help='シナリオ名にこの文字列を含むものだけを測定する（例: "/api/"）')
+    parser.add_argument('--levels', type=int, nargs='+', default=list(DEFAULT_LEVELS),
+                        help='比べる圧縮レベル（既定: 1 6 9）')
+    parser.add_argument('--dataset', type=int, nargs='+', default=[100],
+                        help='用意するタスクの件数。複数指定可（既定: 100）')
+    parser.add_argument('--repeat', type=int, default=50,
+                        help='1つのレスポンスを圧縮する回数（既定: 50）')
+    return parser.parse_args()
+
+
+def fetch_body(app, path):
+    """
+    圧縮しない状態のレスポンス（Accept-Encoding なし）の本文と Content-Type を取得する
+    """
+    client = app.test_client(use_cookies=False)
+    response = client.get(path)
+    body = response.get_data()
+    response.close()
+    return response.mimetype, body
+
+
+def measure_level(body, level, repeat):
+    """
+    body を level で repeat 回圧縮し、圧縮後のバイト数と1回あたりのCPU時間（ミリ秒）を返す
+    process_time は他のスレッド・プロセスを待っていた時間を含まない、このプロセスのCPU時間
+    """
+    started = time.process_time()
+    for _ in range(repeat):
+        compressed = gzip.compress(body, compresslevel=level)
+    cpu_ms = (time.process_time() - started) / repeat * 1000
+    return len(compressed), cpu_ms
+
+
+def run(args, workdir):
+    results = []
+    for step_number in args.steps:
+        step = STEPS[step_number]
+        module = load_app_module(step)
+        # {id} を含むシナリオ・ストリーミングで返すエクスポートは対象外（ミドルウェアが圧縮しない）
+        scenarios = [
+            s for s in step['scenarios']
+            if s['method'] == 'GET' and '{id}' not in s['path'] and not s['path'].startswith('/export')
+            and (args.scenario is None or args.scenario in s['name'])
+        ]
+        if not scenarios:
+            continue
+        datasets = args.dataset if step.get('uses_dataset', True) else [0]
+
+        print(f"🚀 Step {step_number}（{step['directory']}）")
+        for dataset in datasets:
+            context = step['prepare'](module, dataset, workdir)
+            app = context.get('app') or module.app
+            for scenario in scenarios:
+                mimetype, body = fetch_body(app, scenario['path'])
+                if mimetype not in COMPRESSIBLE_TYPES or len(body) < DEFAULT_MINIMUM_SIZE:
+                    print(f"  {scenario['name']:<24} n={dataset:<6} {len(body):>9,} バイト"
+                          f"  （{mimetype}・圧縮の対象外）")
+                    continue
+                line = f"  {scenario['name']:<24} n={dataset:<6} {len(body):>9,} バイト"
+                for level in args.levels:
+                    size, cpu_ms = measure_level(body, level, args.repeat)
+                    results.append({
+                        'step': step_number,
+                        'scenario': scenario['name'],
+                        'dataset': dataset,
+                        'level': level,
+                        'bytes_in': len(body),
+                        'bytes_out': size,
+                        'cpu_ms': round(cpu_ms, 3),
+                    })
+                    line += f" | L{level}: {size:>8,}（{size / len(body):>5.1%}） {cpu_ms:>6.2f}ms"
+                print(line)
+        if 'cleanup' in step:
+            step['cleanup'](module)
+    return results
+
+
+def print_summary(results):
+    """
+    圧縮レベルごとの合計（減ったバイト数と、1KB 減らすのにかかったCPU時間）を表示する
+    """
+    print()
+    print("📊 圧縮レベルごとの合計")
+    for level in sorted({r['level'] for r in results}):
+        rows = [r for r in results if r['level'] == level]
+        bytes_in = sum(r['bytes_in'] for r in rows)
+        bytes_out = sum(r['bytes_out'] for r in rows)
+        cpu_ms = sum(r['cpu_ms'] for r in rows)
+        saved_kb = (bytes_in - bytes_out) / 1024
+        per_kb = cpu_ms / saved_kb if saved_kb else 0
+        print(f"  レベル {level}: {bytes_in:,} → {bytes_out:,} バイト（{bytes_out / bytes_in:.1%}）"
+              f"  CPU {cpu_ms:.2f}ms  1KB 減らすのに {per_kb * 1000:.1f}µs")
+
+
+def main():
+    args = parse_args()
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    with tempfile.TemporaryDirectory(prefix='tutorial-bench-') as workdir:
+        results = run(args, workdir)
+    if results:
+        print_summary(results)
+
+
+if __name__ == '__main__':
+    main()
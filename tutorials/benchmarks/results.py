@@ -0,0 +1,92 @@
+"""
+ベンチマーク結果のJSON保存と、前回の結果との比較（性能の悪化＝リグレッションの検出）
+"""
+
+import json
+import platform
+import sqlite3
+import sys
+from datetime import datetime
+from importlib.metadata import version
+
+# 結果を突き合わせるときに使う項目（同じ条件で測った結果どうしを比べる）
+RESULT_KEY = ('step', 'scenario', 'transport', 'concurrency', 'dataset')
+
+# 悪化とみなす変化率の既定値（%）
+DEFAULT_THRESHOLD = 10.0
+
+
+def environment_info():
+    """
+    測定した環境の情報（比較するときに条件が同じかを確かめるため）
+    """
+    return {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'flask': version('flask'),
+        'sqlite': sqlite3.sqlite_version,
+        'argv': sys.argv[1:],
+    }
+
+
+def save_results(path, results, settings):
+    """
+    測定結果をJSONファイルに保存する
+    """
+    document = {
+        'environment': environment_info(),
+        'settings': settings,
+        'results': results,
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(document, f, ensure_ascii=False, indent=2)
+    return document
+
+
+def load_results(path):
+    """
+    保存した測定結果を読み込む
+    """
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def result_key(result):
+    return tuple(result[name] for name in RESULT_KEY)
+
+
+def percent_change(before, after):
+    if not before:
+        return 0.0
+    return (after - before) / before * 100
+
+
+def compare_results(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """
+    前回（baseline）と今回（current）の結果を同じ条件どうしで比べる
+    req/s が threshold% 以上下がった、または p95 が threshold% 以上増えたものを悪化とする
+
+    戻り値: 比較結果の辞書のリスト（'regression' が True のものが悪化）
+    """
+    previous = {result_key(r): r for r in baseline['results']}
+    comparisons = []
+    for result in current['results']:
+        before = previous.get(result_key(result))
+        if before is None:
+            continue
+        rps_change = percent_change(before['rps'], result['rps'])
+        p95_change = percent_change(before['p95_ms'], result['p95_ms'])
+        comparisons.append({
+            'key': result_key(result),
+            'rps_before': before['rps'],
+            'rps_after': result['rps'],
+            'rps_change': round(rps_change, 1),
+            'p95_before': before['p95_ms'],
+            'p95_after': result['p95_ms'],
+            'p95_change': round(p95_change, 1),
+            'regression': rps_change <= -threshold or p95_change >= threshold,
+            'improvement': rps_change >= threshold and p95_change <= -threshold,
+        })
+    return comparisons
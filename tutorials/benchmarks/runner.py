@@ -0,0 +1,205 @@
+"""
+シナリオを指定した同時接続数で実行し、処理件数と応答時間を集計する
+リクエストの送り方（トランスポート）は2種類あります
+  - 'test-client': Flaskのテストクライアントで直接呼び出す（ネットワークを通らないアプリ本体の速さ）
+  - 'http': ローカルで起動したマルチスレッドのWSGIサーバーにHTTPで送る（通信を含めた速さ）
+"""
+
+import http.client
+import itertools
+import json
+import random
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.serving import make_server
+
+TRANSPORTS = ('test-client', 'http')
+
+
+def percentile(sorted_values, p):
+    """
+    並べ替え済みの値から p パーセンタイルを求める（最近傍順位法）
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * p // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def summarize(latencies, errors, elapsed):
+    """
+    応答時間（秒）のリストから、req/s とパーセンタイル（ミリ秒）をまとめる
+    """
+    ordered = sorted(latencies)
+    count = len(ordered)
+    return {
+        'requests': count,
+        'errors': errors,
+        'elapsed_s': round(elapsed, 4),
+        'rps': round(count / elapsed, 1) if elapsed > 0 else 0.0,
+        'mean_ms': round(sum(ordered) / count * 1000, 3) if count else 0.0,
+        'p50_ms': round(percentile(ordered, 50) * 1000, 3),
+        'p95_ms': round(percentile(ordered, 95) * 1000, 3),
+        'p99_ms': round(percentile(ordered, 99) * 1000, 3),
+        'max_ms': round(ordered[-1] * 1000, 3) if count else 0.0,
+    }
+
+
+def build_request(scenario):
+    """
+    シナリオから送信する本文と Content-Type を作る
+    """
+    if 'form' in scenario:
+        return urllib.parse.urlencode(scenario['form']).encode('utf-8'), 'application/x-www-form-urlencoded'
+    if 'json' in scenario:
+        return json.dumps(scenario['json'], ensure_ascii=False).encode('utf-8'), 'application/json'
+    if 'body' in scenario:
+        return scenario['body'](), scenario['content_type']
+    return None, None
+
+
+class PathPicker:
+    """
+    シナリオの path に含まれる {id} を、指定された方法で選んだIDに置き換える
+    """
+
+    def __init__(self, scenario, ids, seed):
+        self.template = scenario['path']
+        self.mode = scenario.get('ids')
+        self.ids = ids
+        self._random = random.Random(seed)
+        self._sequence = itertools.cycle(ids) if ids else None
+        self._lock = threading.Lock()
+
+    def next_path(self):
+        if not self.mode or not self.ids:
+            return self.template.replace('{id}', '1')
+        with self._lock:
+            if self.mode == 'sequential':
+                todo_id = next(self._sequence)
+            else:
+                todo_id = self._random.choice(self.ids)
+        return self.template.replace('{id}', str(todo_id))
+
+
+class TestClientTransport:
+    """
+    Flaskのテストクライアントでリクエストを送る
+    フラッシュメッセージがCookieにたまり続けないよう、Cookieは保存しない
+    """
+
+    name = 'test-client'
+
+    def __init__(self, app):
+        self.app = app
+        self._local = threading.local()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def send(self, method, path, body, content_type):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.app.test_client(use_cookies=False)
+        response = client.open(path, method=method, data=body, content_type=content_type)
+        response.get_data()  # ストリーミングされる本文も最後まで受け取る
+        response.close()
+        return response.status_code
+
+
+class HttpTransport:
+    """
+    ローカルのマルチスレッドWSGIサーバー（werkzeug）を起動し、HTTPでリクエストを送る
+    """
+
+    name = 'http'
+
+    def __init__(self, app):
+        self.app = app
+        self.server = None
+        self.thread = None
+
+    def __enter__(self):
+        # ポート0を指定すると空いているポートが自動で選ばれる
+        self.server = make_server('127.0.0.1', 0, self.app, threaded=True)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+        return False
+
+    def send(self, method, path, body, content_type):
+        conn = http.client.HTTPConnection('127.0.0.1', self.server.port, timeout=30)
+        try:
+            headers = {'Content-Type': content_type} if content_type else {}
+            conn.request(method, path, body=body, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            return response.status
+        finally:
+            conn.close()
+
+
+def make_transport(name, app):
+    """
+    トランスポート名からトランスポートを作る
+    """
+    if name == 'http':
+        return HttpTransport(app)
+    return TestClientTransport(app)
+
+
+def run_scenario(transport, scenario, ids, requests=200, concurrency=1, warmup=10, seed=0):
+    """
+    1つのシナリオを concurrency 本のスレッドで合計 requests 回実行し、集計結果を返す
+    最初の warmup 回（テンプレートの読み込みなど初回だけの処理）は集計に含めない
+    """
+    body, content_type = build_request(scenario)
+    picker = PathPicker(scenario, ids, seed)
+    expected = scenario.get('expect', (200,))
+    method = scenario['method']
+
+    for _ in range(warmup):
+        transport.send(method, picker.next_path(), body, content_type)
+
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+    counter = itertools.count()
+
+    def worker():
+        nonlocal errors
+        local_latencies = []
+        local_errors = 0
+        while next(counter) < requests:
+            path = picker.next_path()
+            started = time.perf_counter()
+            try:
+                status = transport.send(method, path, body, content_type)
+            except Exception:
+                status = None
+            local_latencies.append(time.perf_counter() - started)
+            if status not in expected:
+                local_errors += 1
+        with lock:
+            latencies.extend(local_latencies)
+            errors += local_errors
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for future in [executor.submit(worker) for _ in range(concurrency)]:
+            future.result()
+    elapsed = time.perf_counter() - started
+
+    return summarize(latencies, errors, elapsed)
@@ -0,0 +1,178 @@
+"""
+開発サーバーと本番用のサーバーの比較（tutorials フォルダで python -m benchmarks.serve として実行）
+
+同じアプリを次の2つの方法で別のプロセスとして起動し、HTTPで同じリクエストを送って req/s と応答時間を比べます。
+- dev: これまでの python app.py と同じ開発サーバー（app.run(debug=True)、自動再起動はなし）
+- production: common/serve.py の本番用のサーバー（--workers × --threads）
+
+データを変更しないよう、GET のシナリオ（IDを使わないもの）だけを送ります。
+Step 5 は各ステップのフォルダの todo_app.db を使うため、先に python init_db.py を実行しておきます。
+"""
+
+import argparse
+import http.client
+import os
+import socket
+import subprocess
+import sys
+import time
+
+from .apps import STEPS, TUTORIALS_DIR
+from .runner import run_scenario
+
+# 開発サーバーの起動（python app.py と同じ debug=True。自動再起動はプロセスが2つになるため使わない）
+DEV_SERVER_CODE = """
+import sys
+from common.serve import load_app
+app = load_app(sys.argv[1])
+app.run(debug=True, use_reloader=False, host='127.0.0.1', port=int(sys.argv[2]))
+"""
+
+# サーバーの起動を待つ最大秒数
+STARTUP_TIMEOUT = 30.0
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='開発サーバーと本番用のサーバー（複数プロセス × 複数スレッド）の比較')
+    parser.add_argument('--steps', type=int, nargs='+', default=[1, 2, 5], choices=sorted(STEPS),
+                        help='測定するステップ（既定: 1 2 5）')
+    parser.add_argument('--scenario', default=None,
+                        help='シナリオ名にこの文字列を含むものだけを測定する（例: "/api/"）')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='本番用のサーバーのワーカー数（既定: CPUのコア数）')
+    parser.add_argument('--threads', type=int, default=8,
+                        help='本番用のサーバーの1ワーカーあたりのスレッド数（既定: 8）')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 16],
+                        help='同時に送るリクエスト数（スレッド数）。複数指定可（既定: 1 16）')
+    parser.add_argument('--requests', type=int, default=500,
+                        help='1つの条件で送るリクエスト数（既定: 500）')
+    parser.add_argument('--warmup', type=int, default=20,
+                        help='集計に含めない最初のリクエスト数（既定: 20）')
+    return parser.parse_args()
+
+
+def free_port():
+    """
+    空いているポート番号を1つ選ぶ
+    """
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def server_command(mode, directory, port, args):
+    if mode == 'dev':
+        return [sys.executable, '-c', DEV_SERVER_CODE, directory, str(port)]
+    return [sys.executable, '-m', 'common.serve', directory, '--port', str(port),
+            '--workers', str(args.workers), '--threads', str(args.threads)]
+
+
+def wait_until_ready(process, port):
+    """
+    /livez が 200 を返すまで待つ
+    """
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError('サーバーが起動直後に終了しました')
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            conn.request('GET', '/livez')
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            pass
+        finally:
+            conn.close()
+        time.sleep(0.1)
+    raise RuntimeError(f'サーバーが{STARTUP_TIMEOUT:g}秒以内に起動しませんでした')
+
+
+class ExternalHttpTransport:
+    """
+    別のプロセスで起動したサーバーに HTTP でリクエストを送る（runner.HttpTransport と同じ送り方）
+    """
+
+    name = 'http'
+
+    def __init__(self, port):
+        self.port = port
+
+    def send(self, method, path, body, content_type):
+        conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=30)
+        try:
+            headers = {'Content-Type': content_type} if content_type else {}
+            conn.request(method, path, body=body, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            return response.status
+        finally:
+            conn.close()
+
+
+def run(args):
+    results = []
+    for step_number in args.steps:
+        step = STEPS[step_number]
+        directory = step['directory']
+        if directory == 'step05_database' and not os.path.exists(os.path.join(TUTORIALS_DIR, directory, 'todo_app.db')):
+            print(f"⚠️  Step {step_number}: todo_app.db がありません（{directory} で python init_db.py を実行してください）")
+            continue
+        scenarios = [
+            s for s in step['scenarios']
+            if s['method'] == 'GET' and '{id}' not in s['path']
+            and (args.scenario is None or args.scenario in s['name'])
+        ]
+        if not scenarios:
+            continue
+
+        print(f"🚀 Step {step_number}（{directory}）")
+        for mode in ('dev', 'production'):
+            port = free_port()
+            process = subprocess.Popen(server_command(mode, directory, port, args), cwd=TUTORIALS_DIR,
+                                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            try:
+                wait_until_ready(process, port)
+                transport = ExternalHttpTransport(port)
+                for concurrency in args.concurrency:
+                    for scenario in scenarios:
+                        summary = run_scenario(transport, scenario, [], requests=args.requests,
+                                               concurrency=concurrency, warmup=args.warmup)
+                        result = {'step': step_number, 'scenario': scenario['name'], 'mode': mode,
+                                  'concurrency': concurrency, **summary}
+                        print(f"  {scenario['name']:<24} {mode:<10} c={concurrency:<3} "
+                              f"{result['rps']:>9.1f} req/s  p50 {result['p50_ms']:>8.2f}  "
+                              f"p95 {result['p95_ms']:>8.2f}  p99 {result['p99_ms']:>8.2f} ms"
+                              + (f"  ⚠️ エラー {result['errors']}件" if result['errors'] else ''))
+                        results.append(result)
+            finally:
+                process.terminate()
+                process.wait()
+    return results
+
+
+def print_summary(results):
+    """
+    シナリオ・同時接続数ごとに、本番用のサーバーが開発サーバーの何倍の req/s だったかを表示する
+    """
+    print()
+    print("📊 本番用のサーバー / 開発サーバー（req/s の比）")
+    dev = {(r['step'], r['scenario'], r['concurrency']): r for r in results if r['mode'] == 'dev'}
+    for r in results:
+        if r['mode'] != 'production':
+            continue
+        before = dev.get((r['step'], r['scenario'], r['concurrency']))
+        if before and before['rps']:
+            print(f"  Step {r['step']} {r['scenario']:<24} c={r['concurrency']:<3} "
+                  f"{before['rps']:>9.1f} → {r['rps']:>9.1f} req/s（{r['rps'] / before['rps']:.2f}倍）")
+
+
+def main():
+    args = parse_args()
+    results = run(args)
+    if results:
+        print_summary(results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,4 @@
+"""
+全ステップ共通の部品（監視・運用のための仕組み）
+各ステップの app.py から、tutorials フォルダを読み込み先に追加して import します
+"""
@@ -0,0 +1,173 @@
+"""
+静的ファイル（CSS・JavaScript）のビルドと長期キャッシュでの配信
+
+ファイル名に内容のハッシュ値を入れて（style.css → style.3f2a9c1b7e.css）、gzip で圧縮した .gz も作っておきます。
+内容が変わればファイル名も変わるため、ブラウザには「1年間確認せずに使ってよい」（immutable）と伝えられます。
+
+ビルド（tutorials フォルダで実行）:
+    python -m common.assets step02_html_css step03_javascript_dom step04_form_post step05_database
+
+アプリへの組み込み:
+    from common.assets import init_assets
+    init_assets(app)
+
+テンプレートでは url_for('static', filename='css/style.css') の代わりに
+asset_url('static', filename='css/style.css') を使います（引数は url_for と同じ）。
+ビルドしていない場合・デバッグモードの場合は、これまでどおり /static/ のURLになります。
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import shutil
+
+from flask import current_app, request, send_from_directory, url_for
+
+# ビルドの出力先（static フォルダの中）と、ハッシュ値付きのファイル名の対応表
+DIST_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+
+# ビルドの対象にするファイルの種類
+ASSET_EXTENSIONS = ('.css', '.js')
+
+# ハッシュ値の長さ（16進数の文字数）
+HASH_LENGTH = 10
+
+# ハッシュ値付きのファイルのキャッシュ期間（1年）
+IMMUTABLE_MAX_AGE = 31536000
+
+
+def hashed_name(filename, content):
+    """
+    内容のハッシュ値を入れたファイル名を作る（css/style.css → css/style.3f2a9c1b7e.css）
+    """
+    digest = hashlib.sha256(content).hexdigest()[:HASH_LENGTH]
+    base, ext = os.path.splitext(filename)
+    return f'{base}.{digest}{ext}'
+
+
+def build_assets(static_dir, report=print):
+    """
+    static_dir の CSS・JavaScript を、ハッシュ値付きのファイル名と .gz にして static_dir/dist に書き出す
+    前回のビルド結果は消してから作り直す
+    戻り値: 元のファイル名 -> ハッシュ値付きのファイル名 の辞書
+    """
+    dist_dir = os.path.join(static_dir, DIST_DIR)
+    if os.path.isdir(dist_dir):
+        shutil.rmtree(dist_dir)
+
+    manifest = {}
+    for root, dirs, files in os.walk(static_dir):
+        dirs[:] = sorted(d for d in dirs if os.path.join(root, d) != dist_dir)
+        for name in sorted(files):
+            if not name.endswith(ASSET_EXTENSIONS):
+                continue
+            path = os.path.join(root, name)
+            filename = os.path.relpath(path, static_dir).replace(os.sep, '/')
+            with open(path, 'rb') as f:
+                content = f.read()
+
+            target = hashed_name(filename, content)
+            target_path = os.path.join(dist_dir, *target.split('/'))
+            os.makedirs(os.path.dirname(target_path), exist_ok=True)
+            with open(target_path, 'wb') as f:
+                f.write(content)
+            # mtime=0 にすると、同じ内容からは毎回同じ .gz ができる
+            compressed = gzip.compress(content, compresslevel=9, mtime=0)
+            with open(target_path + '.gz', 'wb') as f:
+                f.write(compressed)
+
+            manifest[filename] = target
+            if report:
+                report(f"  📦 {filename} → {DIST_DIR}/{target}"
+                       f"（{len(content):,} → gzip {len(compressed):,} バイト）")
+
+    os.makedirs(dist_dir, exist_ok=True)
+    with open(os.path.join(dist_dir, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+    return manifest
+
+
+def load_manifest(static_dir):
+    """
+    ビルド結果の対応表を読み込む（ビルドしていなければ空の辞書）
+    """
+    path = os.path.join(static_dir, DIST_DIR, MANIFEST_NAME)
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def accepts_gzip():
+    """
+    ブラウザが gzip で圧縮されたレスポンスを受け取れるか
+    """
+    return request.accept_encodings['gzip'] > 0
+
+
+def init_assets(app, url_path='/assets'):
+    """
+    ハッシュ値付きのファイルを配信するルートと、テンプレートで使う asset_url() を追加する
+    """
+    dist_dir = os.path.join(app.static_folder, DIST_DIR)
+    manifest = load_manifest(app.static_folder)
+    app.extensions['assets'] = manifest
+
+    def asset_url(endpoint, **values):
+        """
+        url_for と同じ引数で、ビルド済みのファイルがあればハッシュ値付きのURLを返す
+        （デバッグモードでは CSS・JavaScript の編集がすぐ反映されるよう、元のファイルのURLを返す）
+        """
+        if endpoint == 'static' and not current_app.debug:
+            target = manifest.get(values.get('filename'))
+            if target:
+                values['filename'] = target
+                return url_for('serve_asset', **values)
+        return url_for(endpoint, **values)
+
+    app.add_template_global(asset_url, 'asset_url')
+
+    @app.route(f'{url_path}/<path:filename>', endpoint='serve_asset')
+    def serve_asset(filename):
+        """
+        ハッシュ値付きのファイルを1年間のキャッシュ付きで返す
+        ブラウザが gzip を受け取れる場合は、ビルド時に圧縮しておいた .gz をそのまま返す
+        """
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        if accepts_gzip() and os.path.isfile(os.path.join(dist_dir, filename + '.gz')):
+            response = send_from_directory(dist_dir, filename + '.gz', mimetype=mimetype,
+                                           max_age=IMMUTABLE_MAX_AGE)
+            response.headers['Content-Encoding'] = 'gzip'
+        else:
+            response = send_from_directory(dist_dir, filename, mimetype=mimetype,
+                                           max_age=IMMUTABLE_MAX_AGE)
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        response.vary.add('Accept-Encoding')
+        return response
+
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description='CSS・JavaScript にハッシュ値付きのファイル名と .gz を作ります')
+    parser.add_argument('steps', nargs='+', help='ビルドするステップのフォルダ（例: step03_javascript_dom）')
+    args = parser.parse_args()
+
+    for step in args.steps:
+        static_dir = os.path.join(step, 'static')
+        if not os.path.isdir(static_dir):
+            print(f"⚠️  {static_dir} が見つかりません")
+            continue
+        print(f"🔨 {step} の静的ファイルをビルドします...")
+        manifest = build_assets(static_dir)
+        print(f"✅ {len(manifest)}個のファイルを {static_dir}/{DIST_DIR} に書き出しました")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,191 @@
+"""
+レスポンスの gzip 圧縮（WSGIミドルウェア）
+HTML・JSON・CSS などの文字のレスポンスを、ブラウザが gzip を受け取れる場合に圧縮して送ります
+
+使い方:
+    from common.compression import init_compression
+    init_compression(app)
+
+圧縮の強さ（1〜9、0 で無効）と圧縮する最小サイズは、環境変数 GZIP_LEVEL・GZIP_MIN_SIZE で変更できます。
+次のレスポンスは圧縮しません。
+- すでに圧縮されているもの（Content-Encoding がある、ビルド済みの .gz など）
+- 少しずつ送るもの（ストリーミング。Content-Length がない）
+- 小さいもの・画像など圧縮しても小さくならない種類のもの
+"""
+
+import gzip
+import os
+import threading
+import time
+
+# 圧縮する Content-Type（; charset=... より前の部分）
+COMPRESSIBLE_TYPES = (
+    'text/html', 'text/css', 'text/plain', 'text/javascript', 'text/csv',
+    'application/json', 'application/javascript', 'application/xml', 'image/svg+xml',
+)
+
+DEFAULT_LEVEL = 6
+DEFAULT_MINIMUM_SIZE = 500  # バイト（これより小さいと、圧縮してもほとんど小さくならない）
+
+# 本文を持たない、または一部だけを返すステータスコード
+NO_COMPRESS_STATUSES = (204, 206, 304)
+
+
+def _get_header(headers, name):
+    name = name.lower()
+    for key, value in headers:
+        if key.lower() == name:
+            return value
+    return None
+
+
+def _add_vary(headers):
+    """
+    Vary: Accept-Encoding を付ける（キャッシュが圧縮版と非圧縮版を区別できるように）
+    """
+    for i, (key, value) in enumerate(headers):
+        if key.lower() == 'vary':
+            values = [v.strip() for v in value.split(',')]
+            if not any(v.lower() == 'accept-encoding' or v == '*' for v in values):
+                headers[i] = (key, f'{value}, Accept-Encoding')
+            return
+    headers.append(('Vary', 'Accept-Encoding'))
+
+
+def accepts_gzip(environ):
+    """
+    Accept-Encoding に gzip が含まれるか（gzip;q=0 は「受け取れない」の意味）
+    """
+    qualities = {}
+    for part in environ.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        coding, *params = [item.strip() for item in part.split(';')]
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding.lower()] = quality
+    return qualities.get('gzip', qualities.get('*', 0.0)) > 0
+
+
+class GzipMiddleware:
+    """
+    WSGIアプリのレスポンスを gzip で圧縮するミドルウェア
+    圧縮の回数・圧縮前後のバイト数・圧縮にかかった時間を stats に記録する
+    """
+
+    def __init__(self, app, level=DEFAULT_LEVEL, minimum_size=DEFAULT_MINIMUM_SIZE,
+                 compressible_types=COMPRESSIBLE_TYPES):
+        self.app = app
+        self.level = level
+        self.minimum_size = minimum_size
+        self.compressible_types = compressible_types
+        self._lock = threading.Lock()
+        self.stats = {
+            'compressed': 0,     # 圧縮したレスポンスの数
+            'bytes_in': 0,       # 圧縮前の合計バイト数
+            'bytes_out': 0,      # 圧縮後の合計バイト数
+            'seconds': 0.0,      # 圧縮にかかった合計時間
+        }
+
+    def should_compress(self, status_code, headers, method):
+        """
+        このレスポンスを圧縮するかどうか
+        """
+        if method == 'HEAD' or status_code < 200 or status_code in NO_COMPRESS_STATUSES:
+            return False
+        if _get_header(headers, 'Content-Encoding'):
+            return False
+        content_length = _get_header(headers, 'Content-Length')
+        if content_length is None or int(content_length) < self.minimum_size:
+            # Content-Length がないレスポンスは少しずつ送られる（ストリーミング）ため、まとめて圧縮しない
+            return False
+        content_type = (_get_header(headers, 'Content-Type') or '').split(';')[0].strip().lower()
+        if content_type not in self.compressible_types:
+            return False
+        cache_control = (_get_header(headers, 'Cache-Control') or '').lower()
+        return 'no-transform' not in cache_control
+
+    def __call__(self, environ, start_response):
+        if self.level <= 0:
+            return self.app(environ, start_response)
+        client_accepts_gzip = accepts_gzip(environ)
+        captured = {}
+
+        def capture_start_response(status, headers, exc_info=None):
+            captured['status'] = status
+            captured['headers'] = headers
+            captured['exc_info'] = exc_info
+            # 本文を受け取る前にヘッダーを送ることはできないため、本文は app_iter からだけ受け取る
+            return lambda data: None
+
+        app_iter = self.app(environ, capture_start_response)
+        status = captured['status']
+        headers = list(captured['headers'])
+        status_code = int(status.split(' ', 1)[0])
+
+        if not self.should_compress(status_code, headers, environ.get('REQUEST_METHOD')):
+            start_response(status, headers, captured['exc_info'])
+            return app_iter
+
+        # 圧縮するかどうかが Accept-Encoding で変わることを、圧縮しない場合もキャッシュに伝える
+        _add_vary(headers)
+        if not client_accepts_gzip:
+            start_response(status, headers, captured['exc_info'])
+            return app_iter
+
+        try:
+            body = b''.join(app_iter)
+        finally:
+            if hasattr(app_iter, 'close'):
+                app_iter.close()
+
+        started = time.perf_counter()
+        compressed = gzip.compress(body, compresslevel=self.level)
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.stats['compressed'] += 1
+            self.stats['bytes_in'] += len(body)
+            self.stats['bytes_out'] += len(compressed)
+            self.stats['seconds'] += elapsed
+
+        new_headers = []
+        for key, value in headers:
+            lower = key.lower()
+            if lower in ('content-length', 'accept-ranges', 'content-md5'):
+                continue
+            if lower == 'etag' and not value.startswith('W/'):
+                # 圧縮後は元のバイト列と違うため、「内容は同じ」という意味の弱いETagにする
+                value = f'W/{value}'
+            new_headers.append((key, value))
+        new_headers.append(('Content-Encoding', 'gzip'))
+        new_headers.append(('Content-Length', str(len(compressed))))
+        start_response(status, new_headers, captured['exc_info'])
+        return [compressed]
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+        stats['level'] = self.level
+        stats['minimum_size'] = self.minimum_size
+        stats['saved_bytes'] = stats['bytes_in'] - stats['bytes_out']
+        stats['ratio'] = round(stats['bytes_out'] / stats['bytes_in'], 3) if stats['bytes_in'] else 0
+        stats['seconds'] = round(stats['seconds'], 6)
+        return stats
+
+
+def init_compression(app, level=None, minimum_size=None):
+    """
+    アプリに gzip 圧縮のミドルウェアを組み込む（app.wsgi_app を包む）
+    """
+    if level is None:
+        level = int(os.environ.get('GZIP_LEVEL', DEFAULT_LEVEL))
+    if minimum_size is None:
+        minimum_size = int(os.environ.get('GZIP_MIN_SIZE', DEFAULT_MINIMUM_SIZE))
+    middleware = GzipMiddleware(app.wsgi_app, level=level, minimum_size=minimum_size)
+    app.wsgi_app = middleware
+    app.extensions['compression'] = middleware
+    return middleware
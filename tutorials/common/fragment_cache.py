@@ -0,0 +1,160 @@
+"""
+部分テンプレート（1行分のHTML）のキャッシュ
+一覧ページのタスクのように「ほとんどの行が前回と同じ」ものを、行ごとに描画済みのHTMLで覚えておき、
+変わった行・新しい行だけを描画し直します
+
+使い方:
+    from common.fragment_cache import init_fragment_cache
+    init_fragment_cache(app, 'render_todo_row', '_todo_row.html', 'todo',
+                        version=lambda todo: todo['updated_at'])
+
+テンプレートの中では {{ render_todo_row(todo) }} のように呼び出します。
+行のHTMLに url_for() のリンクが含まれていても使えるよう、保存したHTMLはアプリのURL（ホスト名・
+SCRIPT_NAME）ごとに区別します（別のURLで公開されているときに、他のURLのリンクを返さない）。
+"""
+
+import collections
+import hashlib
+import json
+import threading
+
+from flask import has_request_context, request
+from markupsafe import Markup
+
+# キャッシュに残す行の数の既定値（超えたら最も長く使われていない行から捨てる）
+DEFAULT_MAX_ENTRIES = 2000
+
+# 行の内容から version を作るときに使う項目の既定値（一覧の1行に表示する項目）
+DEFAULT_FINGERPRINT_FIELDS = ('id', 'title', 'description', 'completed', 'priority', 'created_at')
+
+
+class FragmentCache:
+    """
+    行ごとのHTMLを覚えておく、上限付きのLRUキャッシュ（複数スレッドから使えるようロックで守る）
+
+    key（タスクのIDなど）ごとに1つだけ、version（更新日時など）と描画済みのHTMLを保存する
+    version が変わっていれば、古いHTMLは使わずに描画し直して上書きする
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = collections.OrderedDict()  # key -> (version, HTML)
+        self._lock = threading.Lock()
+        self._stats = {
+            'hits': 0,         # 保存済みのHTMLをそのまま使えた回数
+            'misses': 0,       # 描画し直した回数（新しい行・内容が変わった行）
+            'evictions': 0,    # 上限を超えて捨てた回数
+            'invalidations': 0,  # 更新・削除によって捨てた回数
+        }
+
+    def get(self, key, version):
+        """
+        保存済みのHTMLを返す（ないか、version が違えば None）
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                self._stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return entry[1]
+
+    def set(self, key, version, html):
+        """
+        描画したHTMLを保存する
+        """
+        with self._lock:
+            self._entries[key] = (version, html)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def invalidate(self, *keys):
+        """
+        指定した key のHTMLを捨てる（データを更新・削除したとき）
+        """
+        with self._lock:
+            for key in keys:
+                if self._entries.pop(key, None) is not None:
+                    self._stats['invalidations'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self):
+        """
+        キャッシュの統計情報を返す（/health で表示）
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+        stats['max_entries'] = self.max_entries
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 3) if lookups else 0
+        return stats
+
+
+def content_fingerprint(item, fields=DEFAULT_FINGERPRINT_FIELDS):
+    """
+    行の内容そのものから version を作る（更新日時を持たないデータ用）
+    fields の項目だけを決まった順番に並べ、JSON にしてからハッシュを取る
+    （辞書の順番に左右されず、True と 1、None と 'None' も別の値として区別する）
+    値が1つでも変われば別の文字列になる
+    item は辞書のほか、sqlite3.Row のような item[field] で取り出せる行でもよい
+    """
+    get = getattr(item, 'get', None)
+    values = [get(field) if get else item[field] for field in fields]
+    text = json.dumps(values, ensure_ascii=False, separators=(',', ':'), default=str)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]
+
+
+def fingerprint_fields(*fields):
+    """
+    指定した項目から version を作る関数を返す（例: version=fingerprint_fields('title', 'completed')）
+    """
+    return lambda item: content_fingerprint(item, fields)
+
+
+def current_url_root():
+    """
+    処理中のリクエストのアプリのURL（ホスト名と SCRIPT_NAME。リクエストの外では None）
+    """
+    return request.url_root if has_request_context() else None
+
+
+def init_fragment_cache(app, name, template_name, variable, key=lambda item: item['id'],
+                        version=content_fingerprint, max_entries=DEFAULT_MAX_ENTRIES):
+    """
+    行を描画する関数を、テンプレートから name という名前で呼べるようにする
+
+    - template_name: 1行分を描画する部分テンプレート（例: '_todo_row.html'）
+    - variable: 部分テンプレートの中での行の変数名（例: 'todo'）
+    - key / version: 行からキャッシュのキーとバージョンを取り出す関数
+    戻り値: FragmentCache（データを更新したときに invalidate() を呼ぶため）
+    """
+    cache = FragmentCache(max_entries)
+    app.extensions.setdefault('fragment_caches', {})[name] = cache
+    loaded = {'template': None}
+
+    def render_fragment(item):
+        # テンプレートのファイルが変更されて読み込み直された場合は、保存済みのHTMLをすべて捨てる
+        template = app.jinja_env.get_template(template_name)
+        if template is not loaded['template']:
+            loaded['template'] = template
+            cache.clear()
+
+        # url_for() の結果はアプリのURLで変わるため、URL も version に含める
+        # （key は変えないため、invalidate(ID) でどのURLの分もまとめて捨てられる）
+        item_key, item_version = key(item), (current_url_root(), version(item))
+        html = cache.get(item_key, item_version)
+        if html is None:
+            # render_template を使わないのは、1行ごとにテンプレート描画のシグナル（計測）を送らないため
+            html = Markup(template.render({variable: item}))
+            cache.set(item_key, item_version, html)
+        return html
+
+    app.add_template_global(render_fragment, name)
+    return cache
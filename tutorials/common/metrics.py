@@ -0,0 +1,239 @@
+"""
+Prometheus形式のメトリクス（/metrics）と Server-Timing ヘッダー
+リクエスト数・応答時間の分布・処理中のリクエスト数を、Flaskのエンドポイントごとに集計します
+
+使い方:
+    from common.metrics import init_metrics
+    init_metrics(app)
+
+データベースやテンプレートにかかった時間は add_timing() でリクエストごとに積み上げ、
+レスポンスの Server-Timing ヘッダー（ブラウザの開発者ツールの「タイミング」に表示される）にも出力します。
+"""
+
+import threading
+import time
+
+from flask import Response, before_render_template, g, has_request_context, request, template_rendered
+
+# 応答時間のヒストグラムの区切り（秒）
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# リクエストごとの処理時間の内訳の名前（Server-Timing の説明、HTTPヘッダーのため英数字のみ）
+PHASE_DESCRIPTIONS = {
+    'db': 'SQLite',
+    'template': 'Jinja2',
+}
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class Histogram:
+    """
+    値の分布（区切りごとの件数・合計・件数）を記録する
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, upper in enumerate(self.buckets):
+            if value <= upper:
+                self.counts[i] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """
+        Prometheus の形式（各区切り以下の累計件数）に変換する
+        """
+        total = 0
+        for upper, count in zip(self.buckets, self.counts):
+            total += count
+            yield upper, total
+
+
+class MetricsRegistry:
+    """
+    アプリ全体のメトリクスを保持する（複数スレッドから同時に更新されるためロックで守る）
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+        self.in_flight = 0
+        self.requests = {}    # (endpoint, method, status) -> 件数
+        self.latency = {}     # (endpoint, method) -> Histogram
+        self.phases = {}      # (endpoint, phase) -> Histogram（1リクエストあたりの時間）
+        self.operations = {}  # (endpoint, phase) -> 件数（SQL文の数・描画したテンプレートの数）
+
+    def request_started(self):
+        with self._lock:
+            self.in_flight += 1
+
+    def request_finished(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def observe_request(self, endpoint, method, status, seconds, timings):
+        with self._lock:
+            key = (endpoint, method, str(status))
+            self.requests[key] = self.requests.get(key, 0) + 1
+            self.latency.setdefault((endpoint, method), Histogram()).observe(seconds)
+            for phase, (count, phase_seconds) in timings.items():
+                self.phases.setdefault((endpoint, phase), Histogram()).observe(phase_seconds)
+                self.operations[(endpoint, phase)] = self.operations.get((endpoint, phase), 0) + count
+
+    def render(self, prefix='flask'):
+        """
+        Prometheus のテキスト形式に変換する
+        """
+        with self._lock:
+            lines = [
+                f'# HELP {prefix}_process_start_time_seconds アプリの起動時刻（UNIX時刻）',
+                f'# TYPE {prefix}_process_start_time_seconds gauge',
+                f'{prefix}_process_start_time_seconds {self.started_at:.3f}',
+                f'# HELP {prefix}_http_requests_in_flight 処理中のリクエスト数',
+                f'# TYPE {prefix}_http_requests_in_flight gauge',
+                f'{prefix}_http_requests_in_flight {self.in_flight}',
+                f'# HELP {prefix}_http_requests_total エンドポイント・メソッド・ステータスごとのリクエスト数',
+                f'# TYPE {prefix}_http_requests_total counter',
+            ]
+            for (endpoint, method, status), count in sorted(self.requests.items()):
+                labels = _labels(endpoint=endpoint, method=method, status=status)
+                lines.append(f'{prefix}_http_requests_total{{{labels}}} {count}')
+
+            lines += [
+                f'# HELP {prefix}_http_request_duration_seconds エンドポイントごとの応答時間',
+                f'# TYPE {prefix}_http_request_duration_seconds histogram',
+            ]
+            for (endpoint, method), histogram in sorted(self.latency.items()):
+                lines += _histogram_lines(
+                    f'{prefix}_http_request_duration_seconds', histogram,
+                    endpoint=endpoint, method=method,
+                )
+
+            lines += [
+                f'# HELP {prefix}_request_phase_duration_seconds 1リクエストのうちSQLite・テンプレート描画にかかった時間',
+                f'# TYPE {prefix}_request_phase_duration_seconds histogram',
+            ]
+            for (endpoint, phase), histogram in sorted(self.phases.items()):
+                lines += _histogram_lines(
+                    f'{prefix}_request_phase_duration_seconds', histogram,
+                    endpoint=endpoint, phase=phase,
+                )
+
+            lines += [
+                f'# HELP {prefix}_request_phase_operations_total 実行したSQL文・描画したテンプレートの数',
+                f'# TYPE {prefix}_request_phase_operations_total counter',
+            ]
+            for (endpoint, phase), count in sorted(self.operations.items()):
+                labels = _labels(endpoint=endpoint, phase=phase)
+                lines.append(f'{prefix}_request_phase_operations_total{{{labels}}} {count}')
+
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    return ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items())
+
+
+def _histogram_lines(name, histogram, **labels):
+    base = _labels(**labels)
+    lines = []
+    for upper, count in histogram.cumulative():
+        lines.append(f'{name}_bucket{{{base},le="{upper}"}} {count}')
+    lines.append(f'{name}_bucket{{{base},le="+Inf"}} {histogram.count}')
+    lines.append(f'{name}_sum{{{base}}} {histogram.sum:.6f}')
+    lines.append(f'{name}_count{{{base}}} {histogram.count}')
+    return lines
+
+
+def add_timing(phase, seconds, count=1):
+    """
+    処理中のリクエストに、内訳（'db' など）の時間と回数を加える
+    リクエストの外（起動時の処理や別スレッド）から呼ばれた場合は何もしない
+    """
+    if not has_request_context():
+        return
+    timings = g.setdefault('_metrics_timings', {})
+    previous_count, previous_seconds = timings.get(phase, (0, 0.0))
+    timings[phase] = (previous_count + count, previous_seconds + seconds)
+
+
+def server_timing_header(timings, total):
+    """
+    Server-Timing ヘッダーの値を作る（例: db;dur=1.2;desc="SQLite x3", total;dur=4.5）
+    """
+    parts = []
+    for phase, (count, seconds) in timings.items():
+        description = PHASE_DESCRIPTIONS.get(phase, phase)
+        parts.append(f'{phase};dur={seconds * 1000:.2f};desc="{description} x{count}"')
+    parts.append(f'total;dur={total * 1000:.2f}')
+    return ', '.join(parts)
+
+
+def init_metrics(app, path='/metrics', prefix='flask'):
+    """
+    アプリにメトリクスの収集と /metrics エンドポイントを追加する
+    """
+    registry = MetricsRegistry()
+    app.extensions['metrics'] = registry
+
+    @app.before_request
+    def start_request_metrics():
+        g._metrics_started = time.perf_counter()
+        g._metrics_timings = {}
+        g._metrics_in_flight = True
+        registry.request_started()
+
+    @app.after_request
+    def record_request_metrics(response):
+        started = g.pop('_metrics_started', None)
+        if started is None:
+            return response
+        total = time.perf_counter() - started
+        timings = g.pop('_metrics_timings', {})
+        registry.observe_request(request.endpoint or 'unmatched', request.method,
+                                 response.status_code, total, timings)
+        response.headers['Server-Timing'] = server_timing_header(timings, total)
+        return response
+
+    @app.teardown_request
+    def finish_request_metrics(exception):
+        # 例外で after_request が呼ばれなかった場合も、500 として記録する
+        started = g.pop('_metrics_started', None)
+        if started is not None:
+            registry.observe_request(request.endpoint or 'unmatched', request.method, 500,
+                                     time.perf_counter() - started, g.pop('_metrics_timings', {}))
+        if g.pop('_metrics_in_flight', False):
+            registry.request_finished()
+
+    def template_started(sender, template, context, **extra):
+        g._metrics_template_started = time.perf_counter()
+
+    def template_finished(sender, template, context, **extra):
+        started = g.pop('_metrics_template_started', None)
+        if started is not None:
+            add_timing('template', time.perf_counter() - started)
+
+    # テンプレート描画の前後に送られるシグナルで描画時間を測る
+    # （関数がこの中で定義されているため、弱参照にせず登録し続ける）
+    before_render_template.connect(template_started, app, weak=False)
+    template_rendered.connect(template_finished, app, weak=False)
+
+    @app.route(path)
+    def metrics():
+        """
+        Prometheus形式のメトリクス
+        """
+        return Response(registry.render(prefix), content_type=CONTENT_TYPE)
+
+    return registry
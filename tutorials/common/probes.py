@@ -0,0 +1,183 @@
+"""
+死活監視（/livez）・準備完了の確認（/readyz）と、/health の結果の一時保存
+Kubernetes などの監視の仕組みが毎秒アクセスしても、アプリの負担にならないようにします
+
+使い方:
+    from common.probes import init_probes, cached_view
+    init_probes(app, templates=('base.html',), checks={'database': check_database})
+
+    @app.route('/health')
+    @cached_view()
+    def health_check():
+        ...
+
+- /livez: プロセスが応答できるかだけを返す（データベースにもファイルにも触れない）
+- /readyz: データベースの SELECT 1・テンプレートの読み込みなどを確認する
+  （確認の結果は READY_CHECK_INTERVAL 秒のあいだ使い回し、毎回は実行しない）
+- cached_view: /health のような重い診断ページの結果を ttl 秒のあいだ使い回す
+"""
+
+import functools
+import threading
+import time
+import weakref
+from datetime import datetime
+
+from flask import Response, current_app, jsonify, request
+
+# /readyz の確認をやり直す間隔（秒）
+READY_CHECK_INTERVAL = 5.0
+
+# /health の結果を使い回す時間（秒）
+HEALTH_CACHE_TTL = 10.0
+
+
+class CachedCheck:
+    """
+    確認用の関数を一定間隔でだけ実行し、結果を覚えておく
+
+    check は問題がなければ何も返さず、問題があれば例外を発生させる関数
+    間隔を過ぎた後の最初の1リクエストだけが確認をやり直し、
+    その間に届いた他のリクエストには前回の結果を返す（確認が重なって実行されない）
+    """
+
+    def __init__(self, name, check, interval=READY_CHECK_INTERVAL):
+        self.name = name
+        self.check = check
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._result = None
+        self._checked_at = 0.0
+
+    def result(self):
+        """
+        確認結果を返す（{'ok': bool, 'duration_ms': 所要時間, 'checked_at': 時刻, 'error': 内容}）
+        """
+        if self._result is not None and time.monotonic() - self._checked_at < self.interval:
+            return self._result
+
+        if self._result is None:
+            # まだ一度も確認していない場合だけは、結果が出るまで待つ
+            with self._lock:
+                if self._result is None:
+                    self._refresh()
+        elif self._lock.acquire(blocking=False):
+            try:
+                self._refresh()
+            finally:
+                self._lock.release()
+        return self._result
+
+    def _refresh(self):
+        started = time.perf_counter()
+        result = {'ok': True}
+        try:
+            self.check()
+        except Exception as e:
+            result = {'ok': False, 'error': f'{type(e).__name__}: {e}'}
+        result['duration_ms'] = round((time.perf_counter() - started) * 1000, 3)
+        result['checked_at'] = datetime.now().isoformat(timespec='seconds')
+        self._result = result
+        self._checked_at = time.monotonic()
+
+
+def template_check(app, names):
+    """
+    テンプレートを読み込めるか確認する関数を作る（描画はしないので、データや request は不要）
+    """
+    def check():
+        for name in names:
+            app.jinja_env.get_template(name)
+    return check
+
+
+def init_probes(app, templates=(), checks=None, interval=READY_CHECK_INTERVAL):
+    """
+    アプリに /livez と /readyz を追加する
+
+    - templates: 読み込めることを確認するテンプレートの名前
+    - checks: 名前 -> 確認用の関数 の辞書（データベースの SELECT 1 など）
+    """
+    probes = []
+    if templates:
+        probes.append(CachedCheck('templates', template_check(app, templates), interval))
+    for name, check in (checks or {}).items():
+        probes.append(CachedCheck(name, check, interval))
+    app.extensions['probes'] = probes
+
+    @app.route('/livez')
+    def livez():
+        """
+        死活監視（プロセスが応答できれば常に 200）
+        """
+        response = Response('ok\n', mimetype='text/plain')
+        response.cache_control.no_store = True
+        return response
+
+    @app.route('/readyz')
+    def readyz():
+        """
+        準備完了の確認（すべての確認が成功していれば 200、1つでも失敗していれば 503）
+        """
+        results = {probe.name: probe.result() for probe in probes}
+        ready = all(result['ok'] for result in results.values())
+        response = jsonify({
+            'status': 'ready' if ready else 'not_ready',
+            'checks': results
+        })
+        response.status_code = 200 if ready else 503
+        response.cache_control.no_store = True
+        return response
+
+    return probes
+
+
+def cached_view(ttl=HEALTH_CACHE_TTL, validators=None):
+    """
+    ビュー関数の結果（200 のレスポンス）を ttl 秒のあいだ使い回すデコレーター
+    使い回したレスポンスには、作成からの経過秒数（Age）と ETag が付き、
+    同じ内容を持っているブラウザ・監視ツールには 304 を返す
+
+    validators: (ETag, Last-Modified) を返す関数（データのバージョン番号から作るなど。None を返せば使わない）
+    指定すると、ETag はその値になり、値が変わったときは ttl 秒を待たずに作り直す
+    """
+    def decorator(view):
+        lock = threading.Lock()
+        # アプリごとの 'body', 'content_type', 'created_at'（create_app() で複数のアプリを作っても混ざらない）
+        caches = weakref.WeakKeyDictionary()
+
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            etag, last_modified = (validators() if validators else None) or (None, None)
+            with lock:
+                cache = caches.setdefault(current_app._get_current_object(), {})
+                if (not cache or time.monotonic() - cache['created_at'] >= ttl
+                        or cache['etag'] != etag):
+                    response = current_app.make_response(view(*args, **kwargs))
+                    if response.status_code != 200 or response.is_streamed:
+                        # エラーの結果は使い回さない（次のリクエストで作り直す）
+                        return response
+                    cache.update(
+                        body=response.get_data(),
+                        content_type=response.content_type,
+                        created_at=time.monotonic(),
+                        etag=etag,
+                    )
+                body = cache['body']
+                content_type = cache['content_type']
+                age = time.monotonic() - cache['created_at']
+
+            response = Response(body, content_type=content_type)
+            response.headers['Age'] = str(int(age))
+            response.cache_control.max_age = max(0, int(ttl - age))
+            if etag:
+                response.set_etag(etag)
+                if last_modified is not None:
+                    # None を代入すると werkzeug が今の時刻を入れてしまうため、代入しない
+                    response.last_modified = last_modified
+            else:
+                response.add_etag()
+            return response.make_conditional(request)
+
+        return wrapper
+    return decorator
@@ -0,0 +1,448 @@
+"""
+本番用のサーバー（複数のプロセス × 複数のスレッド）
+
+app.run(debug=True) の開発サーバーは、1つのプロセスでデバッガーと自動再起動を動かすための仕組みで、
+実際の利用者からのアクセスを受けるには向きません。ここでは次のように動かします。
+
+- 親プロセスが待ち受け用のソケットを1つ作り、ワーカー（子プロセス）を --workers 個起動する（プリフォーク）
+  ワーカーは同じソケットから接続を受け取る（--reuse-port を付けると SO_REUSEPORT で各ワーカーが自分のソケットを持つ）
+- 各ワーカーは --threads 本のスレッドでリクエストを同時に処理する
+  1つの接続で1つのリクエストを返したら接続を閉じる（Connection: close）。次のリクエストを待つ接続が
+  スレッドを占有しないため、スレッドは常に新しい接続の処理に使える
+- スレッドの空きを待つ接続は --max-pending 件まで。それを超えた接続には、すぐに 503 を返して閉じる
+  （待たせ続けてタイムアウトさせるより、混んでいることを早く伝えて再試行してもらう）
+- ワーカーは --max-requests 件を処理すると入れ替わる（メモリが少しずつ増えても、たまり続けない）
+- Ctrl+C・SIGTERM では新しい接続の受け付けを止め、処理中のリクエストを最後まで返してから終了する
+
+使い方（各ステップのフォルダで）:
+    python app.py --production --workers 4 --threads 8 --port 8000
+
+tutorials フォルダから:
+    python -m common.serve step05_database --workers 4
+
+Windows など fork が使えない環境では、1つのプロセスの複数スレッドで動かします（--workers は無視）。
+"""
+
+import argparse
+import importlib.util
+import logging
+import os
+import random
+import signal
+import socket
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8000
+DEFAULT_THREADS = 8
+
+# ワーカーを入れ替えるまでに処理するリクエスト数（0 で入れ替えない）
+DEFAULT_MAX_REQUESTS = 10000
+# 全ワーカーが同時に入れ替わらないよう、上限を最大10%ずらす
+MAX_REQUESTS_JITTER = 0.1
+
+# 終了時に処理中のリクエストを待つ最大秒数（過ぎたら強制終了する）
+GRACEFUL_TIMEOUT = 30.0
+
+# リクエストを送り終えない接続を閉じるまでの秒数（遅いクライアントがスレッドを占有し続けないため）
+REQUEST_TIMEOUT = 5.0
+
+# スレッドの空きを待てる接続の数の既定値（超えた接続には 503 を返す）
+DEFAULT_MAX_PENDING = 64
+
+# 混んでいるときに返すレスポンス（アプリを通さず、受け付けのスレッドからそのまま送る）
+BUSY_RESPONSE = (
+    b'HTTP/1.1 503 Service Unavailable\r\n'
+    b'Content-Type: text/plain; charset=utf-8\r\n'
+    b'Content-Length: 12\r\n'
+    b'Retry-After: 1\r\n'
+    b'Connection: close\r\n'
+    b'\r\n'
+    b'Server busy\n'
+)
+
+# 受け付け待ちの接続を何件までためておけるか
+LISTEN_BACKLOG = 2048
+
+# ワーカーが起動に失敗したときの終了コード（同じ失敗を繰り返さないよう、親も終了する）
+WORKER_BOOT_ERROR = 3
+
+
+def load_app(target):
+    """
+    'step05_database'・'step05_database/app.py'・'step05_database/app.py:app' の形式で指定されたアプリを読み込む
+    フォルダを指定した場合、wsgi.py があればそちらを読み込む（app.py を import してもアプリを作らないステップ用）
+    """
+    path, sep, attr = target.rpartition(':')
+    if not sep or not attr or '/' in attr or '\\' in attr:
+        # コロンがない、または Windows のドライブ名（C:\...）のコロンだった
+        path, attr = target, 'app'
+    if os.path.isdir(path):
+        wsgi_path = os.path.join(path, 'wsgi.py')
+        path = wsgi_path if os.path.exists(wsgi_path) else os.path.join(path, 'app.py')
+    path = os.path.abspath(path)
+
+    # Step 5 の app.py は同じフォルダの db_pool.py などを import する
+    directory = os.path.dirname(path)
+    if directory not in sys.path:
+        sys.path.insert(0, directory)
+
+    module_name = os.path.splitext(os.path.basename(path))[0]
+    spec = importlib.util.spec_from_file_location(module_name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return getattr(module, attr)
+
+
+def create_socket(host, port, reuse_port=False):
+    """
+    待ち受け用のソケットを作る
+    """
+    family = socket.AF_INET6 if ':' in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    if os.name != 'nt':
+        # 再起動の直後でも同じポートを使えるようにする（Windows では意味が違うため設定しない）
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuse_port:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    sock.listen(LISTEN_BACKLOG)
+    sock.set_inheritable(True)
+    return sock
+
+
+class DrainingRequestHandler(WSGIRequestHandler):
+    """
+    1つの接続で1つのリクエストだけを処理し、返したら接続を閉じる（Connection: close）
+
+    keep-alive で次のリクエストを待つと、その間スレッドが何もせずに占有される。
+    スレッドの数は決まっているため、待っている接続がスレッドを使い切ると、新しい接続が処理されなくなる。
+    複数のワーカーで処理するこのサーバーでは、接続を作り直すコストより、スレッドを空けておく方を優先する
+    """
+
+    # チャンク形式（Transfer-Encoding: chunked）で送るために HTTP/1.1 で応答する
+    protocol_version = 'HTTP/1.1'
+    timeout = REQUEST_TIMEOUT
+
+    def handle_one_request(self):
+        super().handle_one_request()
+        self.close_connection = True
+
+    def end_headers(self):
+        # アプリのレスポンス以外（エラーの応答など）でも、閉じることをクライアントに伝える
+        if not self.close_connection:
+            self.send_header('Connection', 'close')
+        super().end_headers()
+
+    def log_error(self, format, *args):
+        # REQUEST_TIMEOUT 秒以内にリクエストを送り終えなかった接続を閉じるのは正常な動作のため、記録しない
+        if format.startswith('Request timed out'):
+            return
+        super().log_error(format, *args)
+
+
+class WorkerServer(BaseWSGIServer):
+    """
+    決まった数のスレッドでリクエストを処理する WSGI サーバー（werkzeug の開発サーバーを土台にする）
+    スレッドの空きを待つ接続は max_pending 件までためておき、それを超えた接続には 503 を返す
+    """
+
+    multithread = True
+
+    def __init__(self, sock, app, threads=DEFAULT_THREADS, max_pending=DEFAULT_MAX_PENDING):
+        self.draining = False
+        self.max_pending = max_pending
+        self.pending = 0    # 受け付けたが、まだスレッドで処理を始めていない接続の数
+        self.rejected = 0   # 混んでいたため 503 を返した接続の数
+        self._pending_lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='http')
+        host, port = sock.getsockname()[:2]
+        super().__init__(host, port, app, handler=DrainingRequestHandler, fd=sock.fileno())
+
+    def process_request(self, request, client_address):
+        with self._pending_lock:
+            busy = self.pending >= self.max_pending
+            if busy:
+                self.rejected += 1
+            else:
+                self.pending += 1
+        if busy:
+            self._reject(request)
+            return
+        self.executor.submit(self._process_request, request, client_address)
+
+    def _reject(self, request):
+        """
+        混んでいることを伝えて接続を閉じる（受け付けのスレッドを止めないよう、送れなければあきらめる）
+        """
+        try:
+            request.settimeout(1.0)
+            request.sendall(BUSY_RESPONSE)
+        except OSError:
+            pass
+        finally:
+            self.shutdown_request(request)
+
+    def _process_request(self, request, client_address):
+        with self._pending_lock:
+            self.pending -= 1
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def drain(self):
+        """
+        新しい接続の受け付けを止める（serve_forever が戻る）
+        shutdown() は serve_forever を動かしているスレッドから呼ぶと止まってしまうため、別のスレッドで呼ぶ
+        """
+        if not self.draining:
+            self.draining = True
+            threading.Thread(target=self.shutdown, daemon=True).start()
+
+    def wait_requests(self, timeout=GRACEFUL_TIMEOUT):
+        """
+        処理中のリクエストが終わるまで最大 timeout 秒待つ（すべて終われば True）
+        """
+        waiter = threading.Thread(target=self.executor.shutdown, daemon=True)
+        waiter.start()
+        waiter.join(timeout)
+        return not waiter.is_alive()
+
+
+def count_requests(app, limit, on_limit):
+    """
+    処理したリクエスト数を数え、limit 件に達したら on_limit を呼ぶ WSGI アプリで包む
+    """
+    lock = threading.Lock()
+    handled = 0
+
+    def counted(environ, start_response):
+        nonlocal handled
+        with lock:
+            handled += 1
+            reached = handled == limit
+        if reached:
+            on_limit()
+        return app(environ, start_response)
+
+    return counted
+
+
+def run_worker(sock, target, options):
+    """
+    ワーカー（子プロセス）の本体。アプリを読み込み、終了の合図か上限の件数まで処理を続ける
+    """
+    # Ctrl+C は親プロセスが受け取り、SIGTERM でワーカーに伝える
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    try:
+        app = load_app(target)
+    except Exception as e:
+        print(f"❌ ワーカー {os.getpid()}: アプリを読み込めませんでした（{type(e).__name__}: {e}）", file=sys.stderr)
+        os._exit(WORKER_BOOT_ERROR)
+
+    if options.reuse_port:
+        sock = create_socket(options.host, options.port, reuse_port=True)
+
+    server = None
+
+    def on_limit():
+        print(f"♻️  ワーカー {os.getpid()}: {limit}件のリクエストを処理したため入れ替えます")
+        server.drain()
+
+    if options.max_requests > 0:
+        limit = options.max_requests + random.randint(0, int(options.max_requests * MAX_REQUESTS_JITTER))
+        app = count_requests(app, limit, on_limit)
+    server = WorkerServer(sock, app, threads=options.threads, max_pending=options.max_pending)
+    # サーバーは複製したソケットを使うため、元のソケットは閉じておく
+    # （--reuse-port の場合、閉じないと受け付けをやめた後もこのワーカーに接続が割り振られてしまう）
+    sock.close()
+    signal.signal(signal.SIGTERM, lambda signum, frame: server.drain())
+
+    server.serve_forever()
+    finished = server.wait_requests(options.graceful_timeout)
+    if not finished:
+        print(f"⚠️  ワーカー {os.getpid()}: {options.graceful_timeout}秒以内に終わらなかったリクエストを打ち切ります",
+              file=sys.stderr)
+    sys.stdout.flush()
+    os._exit(0)
+
+
+class Arbiter:
+    """
+    ワーカーを起動し、終了したワーカーを起動し直す親プロセス
+    """
+
+    def __init__(self, target, options):
+        self.target = target
+        self.options = options
+        self.sock = None
+        self.workers = {}  # pid -> 起動した時刻
+        self.stopping = False
+        self.reloading = False
+
+    def spawn(self):
+        # 表示待ちの出力が子プロセスに引き継がれて2回表示されないよう、先に書き出しておく
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if pid == 0:
+            try:
+                run_worker(self.sock, self.target, self.options)
+            finally:
+                os._exit(1)
+        self.workers[pid] = time.monotonic()
+
+    def handle_stop(self, signum, frame):
+        self.stopping = True
+
+    def handle_reload(self, signum, frame):
+        self.reloading = True
+
+    def signal_workers(self, signum):
+        for pid in list(self.workers):
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:
+                self.workers.pop(pid, None)
+
+    def reap(self):
+        """
+        終了したワーカーを片付け、起動に失敗したワーカーがあれば True を返す
+        """
+        boot_error = False
+        while self.workers:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                self.workers.clear()
+                break
+            if pid == 0:
+                break
+            self.workers.pop(pid, None)
+            if os.waitstatus_to_exitcode(status) == WORKER_BOOT_ERROR:
+                boot_error = True
+        return boot_error
+
+    def run(self):
+        options = self.options
+        if not options.reuse_port:
+            self.sock = create_socket(options.host, options.port)
+
+        signal.signal(signal.SIGINT, self.handle_stop)
+        signal.signal(signal.SIGTERM, self.handle_stop)
+        # SIGHUP: 全ワーカーを順に入れ替える（プログラムの変更を反映する）
+        signal.signal(signal.SIGHUP, self.handle_reload)
+
+        for _ in range(options.workers):
+            self.spawn()
+
+        while not self.stopping:
+            time.sleep(0.2)
+            if self.reap():
+                print("❌ ワーカーの起動に失敗したため、サーバーを停止します", file=sys.stderr)
+                self.stopping = True
+                break
+            if self.reloading:
+                self.reloading = False
+                print("🔄 ワーカーを入れ替えます")
+                self.signal_workers(signal.SIGTERM)
+            while len(self.workers) < options.workers:
+                self.spawn()
+
+        self.shutdown()
+
+    def shutdown(self):
+        """
+        全ワーカーに終了を伝え、処理中のリクエストが終わるのを待つ
+        """
+        print(f"🛑 停止しています（処理中のリクエストを最大{self.options.graceful_timeout:g}秒待ちます）...")
+        self.signal_workers(signal.SIGTERM)
+        deadline = time.monotonic() + self.options.graceful_timeout + 1
+        while self.workers and time.monotonic() < deadline:
+            self.reap()
+            time.sleep(0.1)
+        if self.workers:
+            self.signal_workers(signal.SIGKILL)
+            self.reap()
+        if self.sock is not None:
+            self.sock.close()
+        print("✅ 停止しました")
+
+
+def serve(target, options, app=None):
+    """
+    本番用のサーバーを起動する（Ctrl+C・SIGTERM で停止するまで戻らない）
+    """
+    if not options.access_log:
+        # 1リクエストごとのログは遅くなる原因になるため、既定では出さない
+        logging.getLogger('werkzeug').setLevel(logging.WARNING)
+
+    if hasattr(os, 'fork'):
+        print(f"🚀 本番モードで起動します: http://{options.host}:{options.port}"
+              f"（ワーカー {options.workers} × スレッド {options.threads}）")
+        Arbiter(target, options).run()
+        return
+
+    # fork が使えない環境（Windows）: 1つのプロセスの複数スレッドで動かす
+    print(f"🚀 本番モードで起動します: http://{options.host}:{options.port}"
+          f"（スレッド {options.threads}、この環境ではワーカーのプロセスを分けられません）")
+    app = app or load_app(target)
+    server = WorkerServer(create_socket(options.host, options.port), app, threads=options.threads,
+                          max_pending=options.max_pending)
+    server.serve_forever()  # Ctrl+C で戻る
+    server.wait_requests(options.graceful_timeout)
+    print("✅ 停止しました")
+
+
+def parse_args(argv=None, with_target=True, default_workers=None):
+    parser = argparse.ArgumentParser(description='チュートリアルのアプリを本番用のサーバー（複数プロセス × 複数スレッド）で起動します')
+    if with_target:
+        parser.add_argument('target', help='ステップのフォルダ または app.py（例: step05_database）')
+    parser.add_argument('--production', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--host', default=DEFAULT_HOST, help=f'待ち受けるアドレス（既定: {DEFAULT_HOST}）')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f'ポート番号（既定: {DEFAULT_PORT}）')
+    parser.add_argument('--workers', type=int, default=default_workers or os.cpu_count() or 1,
+                        help='ワーカー（プロセス）の数（既定: CPUのコア数）')
+    parser.add_argument('--threads', type=int, default=DEFAULT_THREADS,
+                        help=f'1つのワーカーのスレッド数（既定: {DEFAULT_THREADS}）')
+    parser.add_argument('--max-pending', type=int, default=DEFAULT_MAX_PENDING,
+                        help=f'スレッドの空きを待てる接続の数、超えたら 503 を返す（既定: {DEFAULT_MAX_PENDING}）')
+    parser.add_argument('--max-requests', type=int, default=DEFAULT_MAX_REQUESTS,
+                        help=f'ワーカーを入れ替えるまでのリクエスト数、0 で入れ替えない（既定: {DEFAULT_MAX_REQUESTS}）')
+    parser.add_argument('--graceful-timeout', type=float, default=GRACEFUL_TIMEOUT,
+                        help=f'停止時に処理中のリクエストを待つ秒数（既定: {GRACEFUL_TIMEOUT:g}）')
+    parser.add_argument('--reuse-port', action='store_true',
+                        help='SO_REUSEPORT で各ワーカーが自分のソケットを持つ（Linux など）')
+    parser.add_argument('--access-log', action='store_true', help='1リクエストごとのログを表示する')
+    options = parser.parse_args(argv)
+    if options.reuse_port and not hasattr(socket, 'SO_REUSEPORT'):
+        parser.error('この環境では --reuse-port（SO_REUSEPORT）を使えません')
+    if options.reuse_port and options.port == 0:
+        parser.error('--reuse-port を使う場合はポート番号を指定してください')
+    return options
+
+
+def serve_main(app_file, argv, app=None, default_workers=None):
+    """
+    各ステップの app.py から呼び出す（python app.py --production ...）
+    """
+    options = parse_args(argv, with_target=False, default_workers=default_workers)
+    serve(app_file, options, app=app)
+
+
+def main():
+    options = parse_args()
+    serve(options.target, options)
+
+
+if __name__ == '__main__':
+    main()
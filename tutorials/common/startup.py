@@ -0,0 +1,119 @@
+"""
+起動時間の短縮（テンプレートのバイトコードキャッシュ・事前コンパイル）と起動時間の内訳の表示
+
+Jinja2 はテンプレートを最初に使うときに Python のコードへ変換（コンパイル）します。
+そのままでは再起動のたびに「最初のアクセスだけ遅い」状態になるため、次の2つを行います。
+
+- 変換結果（バイトコード）をフォルダに保存し、再起動後は変換をせずに読み込む
+- アプリの起動時に templates/ のテンプレートをすべて読み込んでおく（ウォームアップ）
+
+使い方（app.py の先頭で STARTUP_STARTED = time.perf_counter() を記録しておく）:
+    startup = StartupTimer(STARTUP_STARTED)
+    startup.mark('import')
+    app = Flask(__name__)
+    init_template_cache(app)
+    ...（ルートの定義）
+    finish_startup(app, startup)
+"""
+
+import os
+import time
+
+from jinja2 import FileSystemBytecodeCache
+
+# バイトコードを保存するフォルダ名（各ステップのフォルダの中に作る）
+TEMPLATE_CACHE_DIR = '.jinja_cache'
+
+# 起動時間の内訳の表示名
+PHASE_LABELS = {
+    'import': 'import',
+    'app': 'アプリ作成',
+    'templates': 'テンプレート',
+}
+
+
+class StartupTimer:
+    """
+    起動処理の区切りごとの時間を記録する
+    """
+
+    def __init__(self, started=None):
+        self.started = started if started is not None else time.perf_counter()
+        self._last = self.started
+        self.phases = {}  # 区切りの名前 -> 秒数
+        self.details = {}
+
+    def mark(self, phase):
+        """
+        前の区切りからここまでを phase の時間として記録する
+        """
+        now = time.perf_counter()
+        self.phases[phase] = now - self._last
+        self._last = now
+
+    @property
+    def total(self):
+        return self._last - self.started
+
+    def as_dict(self):
+        """
+        起動時間の内訳をミリ秒で返す（/health で表示）
+        """
+        return {
+            'total_ms': round(self.total * 1000, 1),
+            'phases_ms': {phase: round(seconds * 1000, 1) for phase, seconds in self.phases.items()},
+            **self.details,
+        }
+
+    def report(self):
+        """
+        起動時間の内訳を1行で表示する
+        """
+        parts = [f"{PHASE_LABELS.get(phase, phase)} {seconds * 1000:.1f}ms" for phase, seconds in self.phases.items()]
+        line = f"⏱️  起動時間: {self.total * 1000:.1f}ms（{' / '.join(parts)}）"
+        if self.details.get('templates'):
+            cache = 'キャッシュから読み込み' if self.details.get('bytecode_cache_warm') else 'コンパイル'
+            line += f" テンプレート{self.details['templates']}個を{cache}"
+        print(line)
+
+
+def init_template_cache(app, cache_dir=None):
+    """
+    テンプレートのバイトコードをフォルダに保存するよう設定する
+    フォルダは環境変数 TEMPLATE_CACHE_DIR で変更できる（既定は app.py と同じフォルダの .jinja_cache）
+    """
+    cache_dir = cache_dir or os.environ.get('TEMPLATE_CACHE_DIR') or os.path.join(app.root_path, TEMPLATE_CACHE_DIR)
+    os.makedirs(cache_dir, exist_ok=True)
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(cache_dir)
+    app.config['TEMPLATE_CACHE_DIR'] = cache_dir
+    return cache_dir
+
+
+def warm_up_templates(app):
+    """
+    templates/ のテンプレートをすべて読み込み（コンパイルし）、読み込んだ数を返す
+    """
+    names = app.jinja_env.list_templates(filter_func=lambda name: name.endswith('.html'))
+    for name in names:
+        app.jinja_env.get_template(name)
+    return len(names)
+
+
+def finish_startup(app, startup, warm_up=None):
+    """
+    起動処理の最後に呼び出す
+    アプリ作成の時間を記録し、テンプレートのウォームアップ（環境変数 TEMPLATE_WARMUP=0 で無効）を行い、内訳を表示する
+    """
+    startup.mark('app')
+    if warm_up is None:
+        warm_up = os.environ.get('TEMPLATE_WARMUP', '1') != '0'
+
+    if warm_up:
+        cache_dir = app.config.get('TEMPLATE_CACHE_DIR')
+        startup.details['bytecode_cache_warm'] = bool(cache_dir and os.listdir(cache_dir))
+        startup.details['templates'] = warm_up_templates(app)
+        startup.mark('templates')
+
+    app.extensions['startup'] = startup
+    startup.report()
+    return startup
@@ -0,0 +1,494 @@
+"""
+メモリ上のタスクの置き場（Step 3・Step 4 用）
+リストの代わりに使い、IDでの検索・削除・完了状態での絞り込みを件数に関係なく速く行います
+
+使い方:
+    from common.todo_store import init_todo_store
+    todo_store = init_todo_store(app, [{'id': 1, 'title': '...', 'completed': False}, ...])
+
+    todo_store.get(1)                      # IDで1件取得（なければ None）
+    todo_store.add({'title': '...'})       # IDを割り当てて追加
+    todo_store.toggle(1)                   # 完了状態を反転
+    todo_store.delete(1)                   # 削除
+    todos = todo_store.snapshot()          # ある時点の一覧（読み取り専用）
+    todos.page(status='completed', priority='high', limit=20)  # 絞り込み・並べ替えた1ページ分
+
+仕組み:
+- 辞書（ID → タスク）で1件を探すため、リストを先頭から探す必要がない（辞書は追加した順番も覚えている）
+- 件数（全体・完了済み・優先度ごと）は書き込みのたびに足し引きし、数え直さない
+- 書き込み（追加・更新・削除）とIDの割り当ては1つのロックの中で行うため、同時に追加してもIDが重ならない
+- 書き込みのたびに新しい「スナップショット」を作って差し替える（コピーオンライト）
+  読み取りはロックを取らずに今のスナップショットを使うため、書き込み中でも待たされない
+  スナップショットとその中のタスクの辞書は作った後に変更されないので、テンプレートの描画中に中身が変わらない
+- スナップショットは「土台」（まとめ直した時点の全タスク）と「差分」（その後に変わったタスクだけ）でできている
+  書き込みでは差分だけを複製するため、1件の書き込みで全タスクを複製しない
+  差分が土台の件数の平方根（最低 MIN_DELTA_SIZE 件）を超えたら、差分を土台に取り込んで新しい土台を作る
+- 絞り込み・並べ替えた一覧（区分け）は土台ごとに持ち、ページを返すときに差分を混ぜる
+  新しい土台へは、前の土台の区分けに差分の分だけ出し入れ（bisect）して引き継ぐため、並べ替え直さない
+"""
+
+import bisect
+import heapq
+import math
+import threading
+from itertools import islice
+from operator import itemgetter
+
+# 一覧APIの1ページの件数（limit を指定しないときの件数と、指定できる上限）
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+# 絞り込み・並べ替えに使える値（先頭の '-' は新しい順・大きい順）
+STATUSES = ('all', 'completed', 'pending')
+PRIORITIES = ('high', 'medium', 'low')
+SORTS = ('id', '-id', 'created_at', '-created_at')
+
+# 差分を土台に取り込むまでの件数の下限（実際は土台の件数の平方根と、この値の大きいほう）
+MIN_DELTA_SIZE = 32
+
+
+class TodoBase:
+    """
+    差分を取り込んだ時点のすべてのタスク（作った後は変更しない）
+    区分け（絞り込み・並べ替えた一覧）は最初に使われたときに作り、merge() で次の土台へ引き継ぐ
+    """
+
+    def __init__(self, by_id):
+        self.by_id = by_id    # ID → タスク（追加した順）
+        # (status, priority, field) → (並べたタスクのリスト, 並べ替えの値のリスト)
+        # 同時に作られても同じ内容になるだけなので、ロックは使わない
+        self.partitions = {}
+
+    def partition(self, status, priority, field):
+        """
+        絞り込んだタスクを field の順に並べたリストと、その並べ替えの値のリストを返す
+        絞り込みは、すべてのタスクを並べたものから順番を保ったまま取り出す（並べ替えは field ごとに1回だけ）
+        """
+        name = (status, priority, field)
+        cached = self.partitions.get(name)
+        if cached is not None:
+            return cached
+
+        if status == 'all' and priority is None:
+            todos = sorted(self.by_id.values(), key=lambda todo: _sort_key(field, todo))
+            cached = (todos, [_sort_key(field, todo) for todo in todos])
+        else:
+            all_todos, all_keys = self.partition('all', None, field)
+            pairs = [(key, todo) for key, todo in zip(all_keys, all_todos) if _matches(todo, status, priority)]
+            cached = ([todo for key, todo in pairs], [key for key, todo in pairs])
+        self.partitions[name] = cached
+        return cached
+
+    def merge(self, delta):
+        """
+        差分（ID → 変更後のタスク、削除なら None）を取り込んだ新しい土台を返す
+        作ってある区分けは、変わったタスクだけを出し入れして引き継ぐ（並べ替え直さない）
+        """
+        by_id = dict(self.by_id)
+        for todo_id, todo in delta.items():
+            if todo is None:
+                by_id.pop(todo_id, None)
+            else:
+                by_id[todo_id] = todo
+        merged = TodoBase(by_id)
+
+        # 読み取り側が区分けを追加することがあるため、先に list() で取り出してから回す
+        for (status, priority, field), (todos, keys) in list(self.partitions.items()):
+            todos, keys = list(todos), list(keys)
+            for todo_id, todo in delta.items():
+                old = self.by_id.get(todo_id)
+                if old is not None and _matches(old, status, priority):
+                    index = bisect.bisect_left(keys, _sort_key(field, old))
+                    del todos[index], keys[index]
+                if todo is not None and _matches(todo, status, priority):
+                    key = _sort_key(field, todo)
+                    index = bisect.bisect_left(keys, key)
+                    todos.insert(index, todo)
+                    keys.insert(index, key)
+            merged.partitions[(status, priority, field)] = (todos, keys)
+        return merged
+
+
+class TodoSnapshot:
+    """
+    ある時点のタスクの一覧（読み取り専用。書き込みのたびに新しいものが作られる）
+
+    タスクの辞書は書き換えずに使う（変更は TodoStore の update() などで行う）
+    """
+
+    def __init__(self, base, delta, version, counts):
+        self._base = base      # 土台（TodoBase）
+        self._delta = delta    # 土台を作った後に変わったタスク（ID → 変更後のタスク、削除なら None）
+        self._counts = counts  # (全体の件数, 完了済みの件数, 優先度 → 件数)
+        self.version = version  # 書き込みのたびに1つ増える番号
+        # 一覧・絞り込みの結果は、最初に使われたときに一度だけ作る
+        # （同時に作られても同じ内容になるだけなので、ロックは使わない）
+        self._lists = {}
+
+    def __len__(self):
+        return self._counts[0]
+
+    def __iter__(self):
+        return iter(self.todos)
+
+    def __contains__(self, todo_id):
+        return self.get(todo_id) is not None
+
+    def get(self, todo_id):
+        """
+        IDでタスクを1件取得する（なければ None）
+        """
+        if todo_id in self._delta:
+            return self._delta[todo_id]
+        return self._base.by_id.get(todo_id)
+
+    @property
+    def todos(self):
+        """
+        すべてのタスク（追加した順）
+        """
+        return self._list('all', lambda todo: True)
+
+    @property
+    def completed(self):
+        """
+        完了済みのタスク（追加した順）
+        """
+        return self._list('completed', lambda todo: todo.get('completed'))
+
+    @property
+    def pending(self):
+        """
+        未完了のタスク（追加した順）
+        """
+        return self._list('pending', lambda todo: not todo.get('completed'))
+
+    def count(self, completed=None):
+        """
+        件数を返す（completed=True: 完了済み、False: 未完了、None: すべて）。数え直さない
+        """
+        total, completed_count, _ = self._counts
+        if completed is None:
+            return total
+        if completed:
+            return completed_count
+        return total - completed_count
+
+    def count_priority(self, priority):
+        """
+        指定した優先度のタスクの件数を返す。数え直さない
+        """
+        return self._counts[2].get(priority, 0)
+
+    def page(self, status='all', priority=None, sort='id', limit=DEFAULT_PAGE_SIZE, cursor=None):
+        """
+        絞り込み・並べ替えたタスクの1ページ分を返す
+        status: 'all' / 'completed' / 'pending'、priority: None（すべて）/ 'high' / 'medium' / 'low'
+        sort: 'id' / '-id' / 'created_at' / '-created_at'
+        cursor: 前のページの next_cursor（None なら先頭から）
+        戻り値: {'todos': [...], 'next_cursor': 次のページの目印（最後のページなら None）, 'total': 絞り込んだ件数}
+        値が正しくなければ ValueError
+        """
+        validate_page(status, priority, sort, limit, cursor)
+        field = sort.lstrip('-')
+        after = None if cursor is None else _parse_cursor(field, cursor)
+
+        # 土台の区分けのうち差分で変わったタスクを飛ばしたものと、差分のうち絞り込みに合うタスクを、
+        # 並べ替えの順に混ぜながら limit + 1 件まで取り出す（1件多く取れたら次のページがある）
+        # 目印は「前のページの最後のタスクの並べ替えの値」。件数ではなく値で続きを探すため、
+        # ページをめくる間にタスクが増減しても、同じタスクが2回出たり抜けたりしない
+        todos, keys = self._base.partition(status, priority, field)
+        changed, changed_keys, removed = self._changed(status, priority, field)
+        descending = sort.startswith('-')
+        merged = heapq.merge(
+            _walk(todos, keys, after, descending, skip=self._delta),
+            _walk(changed, changed_keys, after, descending),
+            key=itemgetter(0), reverse=descending,
+        )
+        selected = [todo for key, todo in islice(merged, limit + 1)]
+        has_more = len(selected) > limit
+        selected = selected[:limit]
+
+        return {
+            'todos': selected,
+            'next_cursor': _make_cursor(field, selected[-1]) if has_more else None,
+            'total': len(todos) - removed + len(changed),
+        }
+
+    def stats(self):
+        """
+        総数・完了数・未完了数・完了率（%）
+        """
+        total, completed, _ = self._counts
+        return {
+            'total': total,
+            'completed': completed,
+            'pending': total - completed,
+            'completion_rate': round(completed / total * 100) if total else 0,
+        }
+
+    def _changed(self, status, priority, field):
+        """
+        差分のうち絞り込みに合うタスクを field の順に並べたリスト・その並べ替えの値のリストと、
+        土台の区分けから差分で外れる（変更・削除された）タスクの件数を返す（スナップショットごとに1回だけ作る）
+        """
+        name = ('changed', status, priority, field)
+        cached = self._lists.get(name)
+        if cached is None:
+            base_ids = self._base.by_id
+            pairs = sorted((_sort_key(field, todo), todo) for todo in self._delta.values()
+                           if todo is not None and _matches(todo, status, priority))
+            removed = sum(1 for todo_id in self._delta
+                          if todo_id in base_ids and _matches(base_ids[todo_id], status, priority))
+            cached = ([todo for key, todo in pairs], [key for key, todo in pairs], removed)
+            self._lists[name] = cached
+        return cached
+
+    def _iter_todos(self):
+        """
+        土台のタスクに差分を当てながら、追加した順に返す
+        """
+        delta = self._delta
+        base_ids = self._base.by_id
+        for todo_id, todo in base_ids.items():
+            if todo_id in delta:
+                todo = delta[todo_id]
+                if todo is None:
+                    continue
+            yield todo
+        for todo_id, todo in delta.items():
+            if todo is not None and todo_id not in base_ids:
+                yield todo
+
+    def _list(self, name, predicate):
+        todos = self._lists.get(name)
+        if todos is None:
+            todos = [todo for todo in self._iter_todos() if predicate(todo)]
+            self._lists[name] = todos
+        return todos
+
+
+class TodoStore:
+    """
+    タスクの一覧のスナップショット・件数・IDの割り当てを持つ、スレッドセーフなタスクの置き場
+    """
+
+    def __init__(self, todos=()):
+        self._lock = threading.Lock()
+        self._next_id = 1
+        self._writes = 0
+        self._merges = 0
+        self._snapshot = TodoSnapshot(TodoBase({}), {}, 0, (0, 0, {}))
+        self.replace(todos)
+
+    def snapshot(self):
+        """
+        今のタスクの一覧を返す（ロックを取らない。返した後に書き込まれても中身は変わらない）
+        """
+        return self._snapshot
+
+    def get(self, todo_id):
+        return self._snapshot.get(todo_id)
+
+    def __len__(self):
+        return len(self._snapshot)
+
+    def allocate_id(self):
+        """
+        新しいIDを1つ割り当てる（ロックの中で行うため、同時に呼んでも重ならない）
+        """
+        with self._lock:
+            return self._allocate_id()
+
+    def add(self, fields):
+        """
+        IDを割り当ててタスクを追加し、追加したタスクを返す
+        """
+        with self._lock:
+            todo = {'id': self._allocate_id(), **fields}
+            self._write(todo['id'], todo)
+            return todo
+
+    def update(self, todo_id, **changes):
+        """
+        タスクの一部の項目を変更し、変更後のタスクを返す（なければ None）
+        元の辞書は書き換えず、変更後の新しい辞書に差し替える（読み取り中の一覧に影響しない）
+        """
+        with self._lock:
+            todo = self._snapshot.get(todo_id)
+            if todo is None:
+                return None
+            updated = {**todo, **changes, 'id': todo_id}
+            self._write(todo_id, updated)
+            return updated
+
+    def toggle(self, todo_id):
+        """
+        完了状態を反転し、変更後のタスクを返す（なければ None）
+        読み取りと書き込みを同じロックの中で行うため、同時に切り替えても反転が失われない
+        """
+        with self._lock:
+            todo = self._snapshot.get(todo_id)
+            if todo is None:
+                return None
+            updated = {**todo, 'completed': not todo.get('completed')}
+            self._write(todo_id, updated)
+            return updated
+
+    def delete(self, todo_id):
+        """
+        タスクを削除し、削除したタスクを返す（なければ None）
+        """
+        with self._lock:
+            todo = self._snapshot.get(todo_id)
+            if todo is None:
+                return None
+            self._write(todo_id, None)
+            return todo
+
+    def replace(self, todos):
+        """
+        すべてのタスクを入れ替える（サンプルデータ・ベンチマークのデータの読み込み用）
+        次に割り当てるIDは、今あるIDの最大値の次にする
+        """
+        by_id = {todo['id']: dict(todo) for todo in todos}
+        counts = (0, 0, {})
+        for todo in by_id.values():
+            counts = _recount(counts, None, todo)
+        with self._lock:
+            self._next_id = max(by_id, default=0) + 1
+            self._writes += 1
+            self._snapshot = TodoSnapshot(TodoBase(by_id), {}, self._snapshot.version + 1, counts)
+
+    def get_stats(self):
+        """
+        件数と書き込み回数を返す（/health で表示）
+        """
+        snapshot = self._snapshot
+        return {
+            'todos': len(snapshot),
+            'completed': snapshot.count(completed=True),
+            'by_priority': {priority: snapshot.count_priority(priority) for priority in PRIORITIES},
+            'version': snapshot.version,
+            'writes': self._writes,
+            'merges': self._merges,
+            'delta': len(snapshot._delta),
+            'next_id': self._next_id,
+        }
+
+    def _allocate_id(self):
+        todo_id = self._next_id
+        self._next_id += 1
+        return todo_id
+
+    def _write(self, todo_id, todo):
+        """
+        todo_id のタスクを todo に差し替えた（None なら削除した）スナップショットを作って差し替える（ロックの中で呼ぶ）
+        複製するのは差分と優先度ごとの件数だけ。差分が大きくなったら土台に取り込む
+        代入1回で差し替えるので、読み取り側が作りかけの状態を見ることはない
+        """
+        snapshot = self._snapshot
+        base = snapshot._base
+        delta = {**snapshot._delta, todo_id: todo}
+        if len(delta) > max(MIN_DELTA_SIZE, math.isqrt(len(base.by_id))):
+            base, delta = base.merge(delta), {}
+            self._merges += 1
+        self._writes += 1
+        self._snapshot = TodoSnapshot(base, delta, snapshot.version + 1,
+                                      _recount(snapshot._counts, snapshot.get(todo_id), todo))
+
+
+def validate_page(status='all', priority=None, sort='id', limit=DEFAULT_PAGE_SIZE, cursor=None):
+    """
+    page() に渡す値を確かめる（正しくなければ ValueError）
+    """
+    if status not in STATUSES:
+        raise ValueError(f'status は {", ".join(STATUSES)} のいずれかを指定してください')
+    if priority is not None and priority not in PRIORITIES:
+        raise ValueError(f'priority は {", ".join(PRIORITIES)} のいずれかを指定してください')
+    if sort not in SORTS:
+        raise ValueError(f'sort は {", ".join(SORTS)} のいずれかを指定してください')
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError(f'limit は 1〜{MAX_PAGE_SIZE} の範囲で指定してください')
+    if cursor is not None:
+        _parse_cursor(sort.lstrip('-'), cursor)
+
+
+def _matches(todo, status, priority):
+    """
+    タスクが完了状態・優先度の絞り込みに合うか
+    """
+    if status != 'all' and bool(todo.get('completed')) != (status == 'completed'):
+        return False
+    return priority is None or todo.get('priority') == priority
+
+
+def _recount(counts, old, new):
+    """
+    タスクが old から new に変わった（追加なら old、削除なら new が None）後の件数を返す
+    """
+    total, completed, by_priority = counts
+    by_priority = dict(by_priority)
+    for todo, sign in ((old, -1), (new, 1)):
+        if todo is not None:
+            total += sign
+            if todo.get('completed'):
+                completed += sign
+            priority = todo.get('priority')
+            by_priority[priority] = by_priority.get(priority, 0) + sign
+    return total, completed, by_priority
+
+
+def _walk(todos, keys, after, descending, skip=()):
+    """
+    並べたタスクを (並べ替えの値, タスク) の形で、目印 after の次から順に返す（skip のIDは飛ばす）
+    """
+    if descending:
+        end = len(keys) if after is None else bisect.bisect_left(keys, after)
+        indexes = range(end - 1, -1, -1)
+    else:
+        start = 0 if after is None else bisect.bisect_right(keys, after)
+        indexes = range(start, len(keys))
+    for index in indexes:
+        todo = todos[index]
+        if todo['id'] not in skip:
+            yield keys[index], todo
+
+
+def _sort_key(field, todo):
+    """
+    並べ替えの値（作成日が同じタスクはIDの順に並べ、値が重ならないようにする）
+    """
+    if field == 'created_at':
+        return (str(todo.get('created_at') or ''), todo['id'])
+    return (todo['id'],)
+
+
+def _make_cursor(field, todo):
+    """
+    次のページの目印（例: '12'、'2024-01-15_12'）
+    """
+    return '_'.join(map(str, _sort_key(field, todo)))
+
+
+def _parse_cursor(field, cursor):
+    """
+    目印を並べ替えの値に戻す（正しくなければ ValueError）
+    """
+    try:
+        if field == 'created_at':
+            created_at, todo_id = cursor.rsplit('_', 1)
+            return (created_at, int(todo_id))
+        return (int(cursor),)
+    except ValueError:
+        raise ValueError('cursor が正しくありません（前のページの next_cursor をそのまま指定してください）') from None
+
+
+def init_todo_store(app, todos=()):
+    """
+    タスクの置き場を作り、app.extensions['todo_store'] に登録する
+    戻り値: TodoStore
+    """
+    store = TodoStore(todos)
+    app.extensions['todo_store'] = store
+    return store
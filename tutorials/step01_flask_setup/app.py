@@ -3,12 +3,40 @@ Step 1: Flask基礎セットアップ / Hello World
 最小限のFlaskアプリケーション - ルーティングの基本を学ぶ
 """
 
+import time
+
+# 起動時間の計測の開始（import にかかる時間も含めるため、最初に記録する）
+STARTUP_STARTED = time.perf_counter()
+
 from flask import Flask
+import os
+import sys
+
+# 全ステップ共通の部品（tutorials/common）を読み込めるようにする
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.metrics import init_metrics
+from common.probes import init_probes, cached_view
+from common.compression import init_compression
+from common.startup import StartupTimer, finish_startup
+from common.serve import serve_main
+
+# ここまでが import にかかった時間
+startup = StartupTimer(STARTUP_STARTED)
+startup.mark('import')
 
 # Flaskアプリケーションの初期化
 # __name__ は現在のPythonモジュール名を表す
 app = Flask(__name__)
 
+# リクエスト数・応答時間などを /metrics で公開する
+init_metrics(app)
+
+# HTML・JSON などのレスポンスを gzip で圧縮して送る（環境変数 GZIP_LEVEL・GZIP_MIN_SIZE で調整）
+compression = init_compression(app)
+
+# 監視用の /livez（死活）と /readyz（準備完了）を追加する
+init_probes(app)
+
 @app.route('/')
 def index():
     """
@@ -74,6 +102,7 @@ def about():
     """
 
 @app.route('/health')
+@cached_view()
 def health_check():
     """
     アプリケーションの動作確認用エンドポイント
@@ -83,11 +112,21 @@ def health_check():
         'status': 'OK',
         'message': 'Step1 Flaskアプリケーションが正常に動作しています',
         'step': 1,
-        'description': 'Flask基礎セットアップ / Hello World'
+        'description': 'Flask基礎セットアップ / Hello World',
+        'startup': startup.as_dict(),
+        'compression': compression.get_stats()
     }
 
+# テンプレートを事前に読み込み（ウォームアップ）、起動時間の内訳を表示する
+finish_startup(app, startup)
+
 # このファイルが直接実行された場合のみWebサーバーを起動
 if __name__ == '__main__':
+    if '--production' in sys.argv[1:]:
+        # 本番用のサーバー（複数のプロセス × 複数のスレッド）で起動する（例: python app.py --production --workers 4）
+        serve_main(__file__, sys.argv[1:], app=app)
+        sys.exit(0)
+
     print("🚀 Flask開発サーバーを起動します...")
     print("📍 アクセスURL: http://localhost:5000")
     print("⚡ 開発モード: デバッグ情報表示、ファイル変更時の自動再起動")
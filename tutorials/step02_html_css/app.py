@@ -3,12 +3,51 @@ Step 2: Flask + HTML + CSS でページ返却
 HTMLテンプレートとCSSを使った本格的なWebページの作成
 """
 
+import time
+
+# 起動時間の計測の開始（import にかかる時間も含めるため、最初に記録する）
+STARTUP_STARTED = time.perf_counter()
+
 from flask import Flask, render_template
 from datetime import datetime
+import os
+import sys
+
+# 全ステップ共通の部品（tutorials/common）を読み込めるようにする
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.metrics import init_metrics
+from common.probes import init_probes, cached_view
+from common.compression import init_compression
+from common.startup import StartupTimer, init_template_cache, finish_startup
+from common.serve import serve_main
+from common.assets import init_assets
+from common.fragment_cache import init_fragment_cache
+
+# ここまでが import にかかった時間
+startup = StartupTimer(STARTUP_STARTED)
+startup.mark('import')
 
 # Flaskアプリケーションの初期化
 app = Flask(__name__)
 
+# テンプレートのコンパイル結果（バイトコード）を .jinja_cache に保存し、再起動後に使い回す
+init_template_cache(app)
+
+# ビルド済みの CSS・JavaScript（ハッシュ値付きのファイル名・gzip）を /assets/ から長期キャッシュ付きで配信する
+init_assets(app)
+
+# リクエスト数・応答時間などを /metrics で公開する
+init_metrics(app)
+
+# HTML・JSON などのレスポンスを gzip で圧縮して送る（環境変数 GZIP_LEVEL・GZIP_MIN_SIZE で調整）
+compression = init_compression(app)
+
+# 監視用の /livez（死活）と /readyz（テンプレートを読み込めるか）を追加する
+init_probes(app, templates=('base.html', 'todo_list.html', '_todo_row.html', 'about.html'))
+
+# 一覧の各行のHTMLを、内容が変わるまで使い回す（内容から作った目印で変更を見分ける）
+todo_row_cache = init_fragment_cache(app, 'render_todo_row', '_todo_row.html', 'todo')
+
 # サンプル ToDo データ（後のステップではデータベースから取得）
 todo_sample_data = [
     {
@@ -123,6 +162,7 @@ def about():
     return render_template('about.html', **template_data)
 
 @app.route('/health')
+@cached_view()
 def health_check():
     """
     アプリケーションの動作確認用エンドポイント
@@ -143,15 +183,21 @@ def health_check():
         'message': 'Step2 Flask+HTML+CSS アプリケーションが動作しています',
         'step': 2,
         'description': 'HTML テンプレート + CSS スタイリング',
+        'startup': startup.as_dict(),
+        'compression': compression.get_stats(),
         'features': {
             'templates': template_status,
             'static_files': static_status,
-            'sample_data_count': len(todo_sample_data)
+            'sample_data_count': len(todo_sample_data),
+            'fragment_cache': todo_row_cache.get_stats()
         },
         'endpoints': [
             {'url': '/', 'description': 'ToDoリスト表示'},
             {'url': '/about', 'description': 'アプリケーション説明'},
-            {'url': '/health', 'description': 'ヘルスチェック'}
+            {'url': '/health', 'description': 'ヘルスチェック'},
+            {'url': '/metrics', 'description': 'メトリクス（Prometheus形式）'},
+            {'url': '/livez', 'description': '死活監視（軽量）'},
+            {'url': '/readyz', 'description': '準備完了の確認（結果は数秒ごとに更新）'}
         ]
     }
 
@@ -175,8 +221,16 @@ def status_icon(completed):
     """
     return '✅' if completed else '⏰'
 
+# テンプレートを事前に読み込み（ウォームアップ）、起動時間の内訳を表示する
+finish_startup(app, startup)
+
 # このファイルが直接実行された場合のみWebサーバーを起動
 if __name__ == '__main__':
+    if '--production' in sys.argv[1:]:
+        # 本番用のサーバー（複数のプロセス × 複数のスレッド）で起動する（例: python app.py --production --workers 4）
+        serve_main(__file__, sys.argv[1:], app=app)
+        sys.exit(0)
+
     print("🚀 Flask Step2 HTMLテンプレート + CSS サーバーを起動します...")
     print("📍 アクセスURL: http://localhost:5000")
     print("🎨 新機能: HTMLテンプレート、基本的なCSS")
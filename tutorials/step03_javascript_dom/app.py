@@ -3,14 +3,55 @@ Step 3: Flask + HTML + CSS + JavaScript でインタラクティブなWebペー
 DOM操作とイベント処理による動的なWebページの作成
 """
 
+import time
+
+# 起動時間の計測の開始（import にかかる時間も含めるため、最初に記録する）
+STARTUP_STARTED = time.perf_counter()
+
 from flask import Flask, render_template, jsonify, request
 from datetime import datetime
+import hashlib
+import os
+import sys
+
+# 全ステップ共通の部品（tutorials/common）を読み込めるようにする
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.metrics import init_metrics
+from common.probes import init_probes, cached_view
+from common.compression import init_compression
+from common.startup import StartupTimer, init_template_cache, finish_startup
+from common.serve import serve_main
+from common.assets import init_assets
+from common.fragment_cache import init_fragment_cache
+from common.todo_store import init_todo_store, validate_page, DEFAULT_PAGE_SIZE
+
+# ここまでが import にかかった時間
+startup = StartupTimer(STARTUP_STARTED)
+startup.mark('import')
 
 # Flaskアプリケーションの初期化
 app = Flask(__name__)
 
+# テンプレートのコンパイル結果（バイトコード）を .jinja_cache に保存し、再起動後に使い回す
+init_template_cache(app)
+
+# ビルド済みの CSS・JavaScript（ハッシュ値付きのファイル名・gzip）を /assets/ から長期キャッシュ付きで配信する
+init_assets(app)
+
+# リクエスト数・応答時間などを /metrics で公開する
+init_metrics(app)
+
+# HTML・JSON などのレスポンスを gzip で圧縮して送る（環境変数 GZIP_LEVEL・GZIP_MIN_SIZE で調整）
+compression = init_compression(app)
+
+# 監視用の /livez（死活）と /readyz（テンプレートを読み込めるか）を追加する
+init_probes(app, templates=('base.html', 'todo_list.html', '_todo_row.html', 'about.html'))
+
+# 一覧の各行のHTMLを、内容が変わるまで使い回す（内容から作った目印で変更を見分ける）
+todo_row_cache = init_fragment_cache(app, 'render_todo_row', '_todo_row.html', 'todo')
+
 # サンプル ToDo データ（後のステップではデータベースから取得）
-todo_sample_data = [
+SAMPLE_TODOS = [
     {
         'id': 1,
         'title': 'Flask学習を完了する',
@@ -53,29 +94,26 @@ todo_sample_data = [
     }
 ]
 
+# タスクの置き場（IDの索引・完了状態ごとの集合を持ち、リストを先頭から探さずに済む）
+# 読み取りは書き込みのたびに作り直されるスナップショットを使うため、書き込み中でも待たない
+todo_store = init_todo_store(app, SAMPLE_TODOS)
+
+# アプリの起動ごとに変わる値（再起動で置き場の番号が1から数え直されても、古い ETag と一致させないため）
+APP_INSTANCE_TOKEN = datetime.now().strftime('%Y%m%d%H%M%S%f')
+
 @app.route('/')
 def index():
     """
     ToDoリスト表示ページ（メインページ）
     HTMLテンプレートにサンプルデータを渡して表示
     """
-    # データの集計
-    total_todos = len(todo_sample_data)
-    completed_todos = len([todo for todo in todo_sample_data if todo['completed']])
-    pending_todos = total_todos - completed_todos
-    
-    # 完了率の計算
-    completion_rate = round((completed_todos / total_todos) * 100) if total_todos > 0 else 0
+    # ある時点の一覧（描画中に他のリクエストが書き込んでも、この一覧は変わらない）
+    todos = todo_store.snapshot()
     
-    # テンプレートに渡すデータを準備
+    # テンプレートに渡すデータを準備（件数・完了率は数え直さずに置き場が持っている値を使う）
     template_data = {
-        'todos': todo_sample_data,
-        'stats': {
-            'total': total_todos,
-            'completed': completed_todos,
-            'pending': pending_todos,
-            'completion_rate': completion_rate
-        },
+        'todos': todos.todos,
+        'stats': todos.stats(),
         'current_date': datetime.now().strftime('%Y年%m月%d日'),
         'page_title': 'ToDoリスト - JavaScript インタラクション'
     }
@@ -142,17 +180,17 @@ def toggle_todo(todo_id):
     """
     ToDoの完了状態を切り替える（JavaScriptから呼び出される）
     """
-    for todo in todo_sample_data:
-        if todo['id'] == todo_id:
-            todo['completed'] = not todo['completed']
-            return jsonify({
-                'success': True,
-                'todo_id': todo_id,
-                'completed': todo['completed'],
-                'message': f"タスク「{todo['title']}」を{'完了'if todo['completed'] else '未完了'}に変更しました"
-            })
+    # IDの索引で1件を探し、ロックの中で反転する（同時に切り替えても反転が失われない）
+    todo = todo_store.toggle(todo_id)
+    if todo is None:
+        return jsonify({'success': False, 'message': 'タスクが見つかりません'}), 404
     
-    return jsonify({'success': False, 'message': 'タスクが見つかりません'}), 404
+    return jsonify({
+        'success': True,
+        'todo_id': todo_id,
+        'completed': todo['completed'],
+        'message': f"タスク「{todo['title']}」を{'完了'if todo['completed'] else '未完了'}に変更しました"
+    })
 
 @app.route('/api/hide-todo/<int:todo_id>', methods=['POST'])
 def hide_todo(todo_id):
@@ -165,12 +203,59 @@ def hide_todo(todo_id):
         'message': f"タスクID {todo_id} を非表示にしました（学習用機能）"
     })
 
+@app.route('/api/todos', methods=['GET'])
+def list_todos():
+    """
+    タスクを絞り込み・並べ替えて、1ページ分（既定20件・最大100件）ずつ返す
+    例: /api/todos?status=completed&priority=high&sort=-created_at&limit=20&cursor=<前のページの next_cursor>
+    置き場の番号（書き込みのたびに増える）から ETag を作り、変わっていなければ 304 を返す
+    """
+    # 条件が正しくなければ、ETag が一致していても 400 を返す（先に確かめる）
+    limit = request.args.get('limit', str(DEFAULT_PAGE_SIZE))
+    options = {
+        'status': request.args.get('status', 'all'),
+        'priority': request.args.get('priority') or None,
+        'sort': request.args.get('sort', 'id'),
+        'limit': int(limit) if limit.isdigit() else 0,
+        'cursor': request.args.get('cursor') or None,
+    }
+    try:
+        validate_page(**options)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    
+    snapshot = todo_store.snapshot()
+    
+    # 置き場の番号と URL（絞り込みの条件）が同じなら、返す内容も同じ
+    key = f'{APP_INSTANCE_TOKEN}|{request.full_path}'
+    etag = f'v{snapshot.version}-{hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]}'
+    # gzip で圧縮したレスポンスには弱いETag（W/"..."）が付くため、弱い比較で照合する
+    if request.if_none_match.contains_weak(etag):
+        response = app.response_class(status=304)
+    else:
+        page = snapshot.page(**options)
+        response = jsonify({
+            'success': True,
+            'todos': page['todos'],
+            'count': len(page['todos']),
+            'total': page['total'],
+            'next_cursor': page['next_cursor'],
+            'version': snapshot.version,
+            'stats': snapshot.stats()
+        })
+    
+    # ブラウザに保存させつつ、使う前に毎回サーバーに確認させる（変わっていなければ 304 で本文を送らない）
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
+    return response
+
+# 以前の絞り込みAPI（該当するタスクをすべて一度に返す。件数が多いときはページ分けする /api/todos を使う）
 @app.route('/api/show-completed', methods=['GET'])
 def show_completed():
     """
-    完了済みタスクのみを返す
+    完了済みタスクのみを返す（新しいコードでは /api/todos?status=completed を使う）
     """
-    completed_todos = [todo for todo in todo_sample_data if todo['completed']]
+    completed_todos = todo_store.snapshot().completed
     return jsonify({
         'success': True,
         'todos': completed_todos,
@@ -180,9 +265,9 @@ def show_completed():
 @app.route('/api/show-pending', methods=['GET'])
 def show_pending():
     """
-    未完了タスクのみを返す
+    未完了タスクのみを返す（新しいコードでは /api/todos?status=pending を使う）
     """
-    pending_todos = [todo for todo in todo_sample_data if not todo['completed']]
+    pending_todos = todo_store.snapshot().pending
     return jsonify({
         'success': True,
         'todos': pending_todos,
@@ -190,6 +275,7 @@ def show_pending():
     })
 
 @app.route('/health')
+@cached_view()
 def health_check():
     """
     アプリケーションの動作確認用エンドポイント
@@ -210,20 +296,28 @@ def health_check():
         'message': 'Step3 Flask+HTML+CSS+JavaScript アプリケーションが動作しています',
         'step': 3,
         'description': 'JavaScript DOM操作とイベント処理',
+        'startup': startup.as_dict(),
+        'compression': compression.get_stats(),
         'features': {
             'templates': template_status,
             'static_files': static_status,
             'javascript_api': True,
-            'sample_data_count': len(todo_sample_data)
+            'sample_data_count': len(todo_store),
+            'todo_store': todo_store.get_stats(),
+            'fragment_cache': todo_row_cache.get_stats()
         },
         'endpoints': [
             {'url': '/', 'description': 'ToDoリスト表示'},
             {'url': '/about', 'description': 'アプリケーション説明'},
             {'url': '/api/toggle-todo/<id>', 'description': 'タスク完了切り替え'},
             {'url': '/api/hide-todo/<id>', 'description': 'タスク非表示'},
-            {'url': '/api/show-completed', 'description': '完了済みタスク表示'},
-            {'url': '/api/show-pending', 'description': '未完了タスク表示'},
-            {'url': '/health', 'description': 'ヘルスチェック'}
+            {'url': '/api/todos', 'description': 'タスク一覧（status・priority・sort で絞り込み、limit・cursor でページ分け）'},
+            {'url': '/api/show-completed', 'description': '完了済みタスク表示（以前のAPI）'},
+            {'url': '/api/show-pending', 'description': '未完了タスク表示（以前のAPI）'},
+            {'url': '/health', 'description': 'ヘルスチェック'},
+            {'url': '/metrics', 'description': 'メトリクス（Prometheus形式）'},
+            {'url': '/livez', 'description': '死活監視（軽量）'},
+            {'url': '/readyz', 'description': '準備完了の確認（結果は数秒ごとに更新）'}
         ]
     }
 
@@ -247,8 +341,17 @@ def status_icon(completed):
     """
     return '✅' if completed else '⏰'
 
+# テンプレートを事前に読み込み（ウォームアップ）、起動時間の内訳を表示する
+finish_startup(app, startup)
+
 # このファイルが直接実行された場合のみWebサーバーを起動
 if __name__ == '__main__':
+    if '--production' in sys.argv[1:]:
+        # 本番用のサーバーで起動する（例: python app.py --production --threads 8）
+        # タスクをメモリ上に持つため、プロセスを分けるとプロセスごとに別のデータになる。既定ではワーカーを1つにする
+        serve_main(__file__, sys.argv[1:], app=app, default_workers=1)
+        sys.exit(0)
+
     print("🚀 Flask Step3 JavaScript DOM操作 サーバーを起動します...")
     print("📍 アクセスURL: http://localhost:5000")
     print("🎨 新機能: JavaScript DOM操作、イベント処理")
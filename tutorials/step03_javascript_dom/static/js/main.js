@@ -91,6 +91,10 @@ function setupFilterButtons() {
 }
 
 function showAllTodos() {
+    // 絞り込みで読み込み中・続きがあった場合は打ち切る
+    filterRequest++;
+    removeMoreButton();
+    
     const todoCards = document.querySelectorAll('.todo-card');
     todoCards.forEach(card => {
         card.style.display = 'block';
@@ -99,25 +103,88 @@ function showAllTodos() {
     console.log('📋 すべてのタスクを表示しました');
 }
 
+// 絞り込みで1回に受け取る件数（続きは「さらに表示」ボタンで受け取る）
+const TODO_PAGE_SIZE = 20;
+
+// 絞り込みの番号（ボタンを続けて押したとき、前の絞り込みの結果を表示しないため）
+let filterRequest = 0;
+
 function filterTodosByStatus(completed) {
-    const todoCards = document.querySelectorAll('.todo-card');
+    const status = completed ? 'completed' : 'pending';
     
-    todoCards.forEach(card => {
-        const isCompleted = card.classList.contains('completed');
+    // いったんすべて隠し、最初の1ページ分だけをサーバーから受け取って表示する
+    filterRequest++;
+    removeMoreButton();
+    document.querySelectorAll('.todo-card').forEach(card => {
+        card.style.display = 'none';
+        card.style.opacity = '0.5';
+    });
+    loadTodoPage(status, null, filterRequest, 0);
+}
+
+/**
+ * 指定した完了状態のタスクを /api/todos から1ページ分受け取り、そのカードを表示する
+ * 続きがあれば「さらに表示」ボタンを出し、押されたときに next_cursor で次のページを受け取る
+ * サーバーは ETag を返すため、前回から変わっていなければブラウザが保存した内容を使う（304）
+ */
+function loadTodoPage(status, cursor, request, shown) {
+    const statusText = status === 'completed' ? '完了済み' : '未完了';
+    const params = new URLSearchParams({ status: status, limit: TODO_PAGE_SIZE });
+    if (cursor) {
+        params.set('cursor', cursor);
+    }
+    
+    fetch(`/api/todos?${params}`)
+    .then(response => response.json())
+    .then(data => {
+        if (request !== filterRequest) {
+            // 待っている間に別の絞り込みに切り替わった
+            return;
+        }
+        if (!data.success) {
+            throw new Error(data.message || 'タスクを取得できませんでした');
+        }
+        
+        data.todos.forEach(todo => {
+            const card = document.querySelector(`.todo-card[data-todo-id="${todo.id}"]`);
+            if (card) {
+                // 表示
+                card.style.display = 'block';
+                card.style.opacity = '1';
+            }
+        });
+        shown += data.todos.length;
         
-        if (isCompleted === completed) {
-            // 表示
-            card.style.display = 'block';
-            card.style.opacity = '1';
-        } else {
-            // 非表示
-            card.style.display = 'none';
-            card.style.opacity = '0.5';
+        removeMoreButton();
+        if (data.next_cursor) {
+            addMoreButton(data.total - shown, () => loadTodoPage(status, data.next_cursor, request, shown));
         }
+        console.log(`${statusText}のタスクを表示しました（${shown}件 / ${data.total}件）`);
+    })
+    .catch(error => {
+        console.error('Error:', error);
+        alert(`❌ タスクを絞り込めませんでした: ${error.message}`);
     });
-    
-    const statusText = completed ? '完了済み' : '未完了';
-    console.log(`${statusText}のタスクのみを表示しました`);
+}
+
+function addMoreButton(remaining, onClick) {
+    const grid = document.querySelector('.todos-grid');
+    if (!grid) {
+        return;
+    }
+    grid.insertAdjacentHTML('afterend', `
+        <div class="load-more" style="margin-top: 15px; text-align: center;">
+            <button class="btn btn-secondary">⬇️ さらに表示（残り ${remaining}件）</button>
+        </div>
+    `);
+    grid.nextElementSibling.querySelector('button').addEventListener('click', function() {
+        this.disabled = true;
+        onClick();
+    });
+}
+
+function removeMoreButton() {
+    document.querySelector('.load-more')?.remove();
 }
 
 function updateActiveFilter(activeButton) {
@@ -3,18 +3,54 @@ Step 4: Flask フォーム処理とPOST通信
 HTMLフォームを使ったデータ送信とサーバー処理の基礎
 """
 
+import time
+
+# 起動時間の計測の開始（import にかかる時間も含めるため、最初に記録する）
+STARTUP_STARTED = time.perf_counter()
+
 from flask import Flask, render_template, request, redirect, url_for, flash
 from datetime import datetime
+import os
+import sys
+
+# 全ステップ共通の部品（tutorials/common）を読み込めるようにする
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.metrics import init_metrics
+from common.probes import init_probes, cached_view
+from common.compression import init_compression
+from common.startup import StartupTimer, init_template_cache, finish_startup
+from common.serve import serve_main
+from common.assets import init_assets
+from common.todo_store import init_todo_store
+
+# ここまでが import にかかった時間
+startup = StartupTimer(STARTUP_STARTED)
+startup.mark('import')
 
 # Flaskアプリケーションの初期化
 app = Flask(__name__)
 
+# テンプレートのコンパイル結果（バイトコード）を .jinja_cache に保存し、再起動後に使い回す
+init_template_cache(app)
+
+# ビルド済みの CSS・JavaScript（ハッシュ値付きのファイル名・gzip）を /assets/ から長期キャッシュ付きで配信する
+init_assets(app)
+
+# リクエスト数・応答時間などを /metrics で公開する
+init_metrics(app)
+
+# HTML・JSON などのレスポンスを gzip で圧縮して送る（環境変数 GZIP_LEVEL・GZIP_MIN_SIZE で調整）
+compression = init_compression(app)
+
+# 監視用の /livez（死活）と /readyz（テンプレートを読み込めるか）を追加する
+init_probes(app, templates=('base.html', 'index.html', 'add_todo.html', 'about.html'))
+
 # フラッシュメッセージ用のシークレットキー（本番環境では必ず変更してください）
 app.secret_key = 'step4-learning-secret-key'
 
 # サンプル ToDo データ（メモリ上で管理）
 # Step 5でデータベースに移行予定
-todo_data = [
+SAMPLE_TODOS = [
     {
         'id': 1,
         'title': 'Flask基礎学習を完了する',
@@ -31,8 +67,9 @@ todo_data = [
     }
 ]
 
-# 次のIDを管理する変数
-next_id = 3
+# タスクの置き場（IDで探す・削除するのがリストより速く、IDの割り当てはロックの中で行うため重ならない）
+# 次のIDはサンプルデータの最大のIDの次（3）から割り当てる
+todo_store = init_todo_store(app, SAMPLE_TODOS)
 
 @app.route('/')
 def index():
@@ -40,13 +77,13 @@ def index():
     ToDoリスト表示ページ（メインページ）
     フォーム送信後はここにリダイレクトされる
     """
-    # データの集計
-    total_todos = len(todo_data)
+    # ある時点の一覧（描画中に他のリクエストが追加・削除しても、この一覧は変わらない）
+    todos = todo_store.snapshot()
     
     # テンプレートに渡すデータを準備
     template_data = {
-        'todos': todo_data,
-        'total_todos': total_todos,
+        'todos': todos.todos,
+        'total_todos': len(todos),
         'current_date': datetime.now().strftime('%Y年%m月%d日'),
         'page_title': 'ToDoリスト - フォーム送信機能'
     }
@@ -67,8 +104,6 @@ def add_todo():
     新しいタスク追加処理
     POSTリクエストでフォームデータを受信
     """
-    global next_id
-    
     # フォームデータを取得
     title = request.form.get('title', '').strip()
     description = request.form.get('description', '').strip()
@@ -83,18 +118,13 @@ def add_todo():
         flash('タイトルは100文字以内で入力してください', 'error')
         return redirect(url_for('add_form'))
     
-    # 新しいタスクを作成
-    new_todo = {
-        'id': next_id,
+    # 新しいタスクを作成し、メモリ上のデータに追加（IDは置き場が重ならないように割り当てる）
+    todo_store.add({
         'title': title,
         'description': description if description else 'なし',
         'priority': priority,
         'created_at': datetime.now().strftime('%Y-%m-%d')
-    }
-    
-    # メモリ上のデータに追加
-    todo_data.append(new_todo)
-    next_id += 1
+    })
     
     # 成功メッセージを表示
     flash(f'タスク「{title}」を追加しました', 'success')
@@ -108,18 +138,10 @@ def delete_todo(todo_id):
     タスク削除処理
     POSTリクエストで削除実行
     """
-    global todo_data
-    
-    # 指定されたIDのタスクを検索
-    todo_to_delete = None
-    for todo in todo_data:
-        if todo['id'] == todo_id:
-            todo_to_delete = todo
-            break
+    # IDの索引で探して削除する（リストを先頭から探す必要がない）
+    todo_to_delete = todo_store.delete(todo_id)
     
     if todo_to_delete:
-        # タスクを削除
-        todo_data.remove(todo_to_delete)
         flash(f'タスク「{todo_to_delete["title"]}」を削除しました', 'success')
     else:
         flash('削除するタスクが見つかりません', 'error')
@@ -173,6 +195,7 @@ def about():
     return render_template('about.html', **template_data)
 
 @app.route('/health')
+@cached_view()
 def health_check():
     """
     アプリケーションの動作確認用エンドポイント
@@ -182,24 +205,39 @@ def health_check():
         'message': 'Step4 フォーム処理・POST通信 アプリケーションが動作しています',
         'step': 4,
         'description': 'HTMLフォーム + POST通信 + バリデーション',
+        'startup': startup.as_dict(),
+        'compression': compression.get_stats(),
         'features': {
             'form_processing': True,
             'post_requests': True,
             'flash_messages': True,
             'basic_validation': True,
-            'data_count': len(todo_data)
+            'data_count': len(todo_store),
+            'todo_store': todo_store.get_stats()
         },
         'endpoints': [
             {'url': '/', 'description': 'ToDoリスト表示'},
             {'url': '/add', 'description': 'タスク追加フォーム（GET・POST）'},
             {'url': '/delete/<id>', 'description': 'タスク削除（POST）'},
             {'url': '/about', 'description': 'Step 4説明'},
-            {'url': '/health', 'description': 'ヘルスチェック'}
+            {'url': '/health', 'description': 'ヘルスチェック'},
+            {'url': '/metrics', 'description': 'メトリクス（Prometheus形式）'},
+            {'url': '/livez', 'description': '死活監視（軽量）'},
+            {'url': '/readyz', 'description': '準備完了の確認（結果は数秒ごとに更新）'}
         ]
     }
 
+# テンプレートを事前に読み込み（ウォームアップ）、起動時間の内訳を表示する
+finish_startup(app, startup)
+
 # このファイルが直接実行された場合のみWebサーバーを起動
 if __name__ == '__main__':
+    if '--production' in sys.argv[1:]:
+        # 本番用のサーバーで起動する（例: python app.py --production --threads 8）
+        # タスクをメモリ上に持つため、プロセスを分けるとプロセスごとに別のデータになる。既定ではワーカーを1つにする
+        serve_main(__file__, sys.argv[1:], app=app, default_workers=1)
+        sys.exit(0)
+
     print("🚀 Flask Step4 フォーム処理とPOST通信 サーバーを起動します...")
     print("📍 アクセスURL: http://localhost:5000")
     print("📝 新機能: HTMLフォーム、POST通信、バリデーション")
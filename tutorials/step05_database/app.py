@@ -3,83 +3,464 @@ Step 5: Flask + SQLiteデータベース連携
 完全なCRUD操作とデータ永続化の実現
 """
 
-from flask import Flask, render_template, request, redirect, url_for, flash
+import time
+
+# 起動時間の計測の開始（import にかかる時間も含めるため、最初に記録する）
+STARTUP_STARTED = time.perf_counter()
+
+from flask import (Flask, Blueprint, current_app, render_template, request, redirect, url_for, flash, g,
+                   session, jsonify, make_response, Response, stream_with_context, abort)
+import hashlib
 import sqlite3
-from datetime import datetime
+from datetime import datetime, timezone
 import os
+import sys
 
-# Flaskアプリケーションの初期化
-app = Flask(__name__)
+# 全ステップ共通の部品（tutorials/common）を読み込めるようにする
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.metrics import init_metrics, add_timing
+from common.probes import init_probes, cached_view
+from common.compression import init_compression
+from common.startup import StartupTimer, init_template_cache, finish_startup
+from common.serve import serve_main
+from common.assets import init_assets
+from common.fragment_cache import init_fragment_cache, fingerprint_fields
 
-# フラッシュメッセージ用のシークレットキー（本番環境では必ず変更してください）
-app.secret_key = 'step5-database-secret-key'
+from config import load_config
+from database import TodoDatabase
+from init_db import init_database
+from slow_query_log import SlowQueryLog
+from migrations import LATEST_VERSION, get_schema_version
+from stats import read_stats, read_data_version
+from search import fts_available, search_todos
+from bulk_io import (FORMATS, ImportAborted, detect_format, iter_records, import_todos, insert_todo_rows,
+                     iter_export)
 
-# データベースファイルのパス
-DATABASE = 'todo_app.db'
+# ここまでが import にかかった時間（既定の設定のアプリを作るとき、起動時間の内訳に含める）
+startup = StartupTimer(STARTUP_STARTED)
+startup.mark('import')
 
-def get_db_connection():
+# ルートをまとめる Blueprint（create_app() でアプリに登録する）
+bp = Blueprint('todos', __name__)
+
+def record_sql_timing(seconds, statements):
     """
-    データベース接続を取得する共通関数
+    SQLの実行時間と回数を、処理中のリクエストの内訳（Server-Timing の db）に加える
     """
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row  # 辞書形式でデータを取得
-    return conn
+    add_timing('db', seconds, statements)
+
+# 一覧の各行のHTMLを使い回すキャッシュの名前（テンプレートからは {{ render_todo_row(todo) }} で呼ぶ）
+ROW_CACHE_NAME = 'render_todo_row'
+
+# 一覧ページに表示する1ページあたりの件数（?per_page= で変更可能、上限あり）
+TODOS_PER_PAGE = 20
+MAX_TODOS_PER_PAGE = 100
+
+# 一括インポートで1回のトランザクションにまとめる件数・エクスポートで1回に読み出す件数
+IMPORT_CHUNK_SIZE = 1000
+EXPORT_BATCH_SIZE = 500
+
+# 一括操作APIで1リクエストに含められる操作数の上限
+MAX_BATCH_OPERATIONS = 1000
+
+# UPDATE/DELETE ... RETURNING が使えるか（SQLite 3.35.0 以降）
+SUPPORTS_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+def get_database():
+    """
+    処理中のアプリのデータベース（接続プール・書き込みキュー）を取得する
+    """
+    return current_app.extensions['todo_db']
+
+def get_slow_query_log():
+    """
+    処理中のアプリの、遅いSQLの記録を取得する
+    """
+    return current_app.extensions['slow_query_log']
+
+def get_row_cache():
+    """
+    処理中のアプリの、一覧の行ごとのキャッシュを取得する
+    """
+    return current_app.extensions['fragment_caches'][ROW_CACHE_NAME]
+
+def get_read_connection():
+    """
+    読み取り専用のデータベース接続を取得する（GETのページ・APIで使う）
+    書き込み用の接続とは別のプールから借りるため、書き込みの順番待ちに巻き込まれない
+    """
+    if 'read_db' not in g:
+        g.read_db = get_database().read_pool.acquire()
+    return g.read_db
+
+def release_db_connection(exception):
+    """
+    リクエスト終了時に読み取り用の接続をプールへ返却する（create_app() で teardown_appcontext に登録する）
+    書き込み用の接続は run_write() が書き込みのたびに借りて返すため、ここでは返さない
+    """
+    db = get_database()
+    read_conn = g.pop('read_db', None)
+    if read_conn is not None:
+        db.read_pool.release(read_conn)
 
 def init_db_if_not_exists():
     """
-    データベースが存在しない場合は初期化する
+    データベースが存在しない、またはスキーマが古い場合は初期化を促す
     """
-    if not os.path.exists(DATABASE):
-        print(f"⚠️  データベースファイル {DATABASE} が見つかりません。")
+    db = get_database()
+    if not db.exists():
+        print(f"⚠️  データベースファイル {db.path} が見つかりません。")
         print("📊 初期化スクリプトを実行してください: python init_db.py")
         return False
+    if not db.schema_checked:
+        version = get_schema_version(get_read_connection())
+        if version < LATEST_VERSION:
+            print(f"⚠️  データベースのスキーマが古いです（バージョン {version} / 最新 {LATEST_VERSION}）。")
+            print("📊 更新スクリプトを実行してください: python init_db.py")
+            return False
+        db.schema_checked = True
     return True
 
-@app.route('/')
+# アプリの起動時刻と、起動ごとに変わる値（テンプレートの更新後に古いキャッシュを使わせないため）
+APP_STARTED = datetime.now(timezone.utc)
+APP_INSTANCE_TOKEN = APP_STARTED.strftime('%Y%m%d%H%M%S%f')
+
+def get_cache_validators(*key_parts, not_before=None):
+    """
+    データのバージョン番号から ETag と Last-Modified を作る
+    集計テーブルを1行読むだけなので、todos テーブルやテンプレートには触れない
+    key_parts: ページごとに結果を変える要素（URLのパラメータ・日付など）
+    not_before: key_parts で内容が変わり始める時刻（日付なら今日の0時）。Last-Modified はこれより前にしない
+
+    Last-Modified は秒単位のため、同じ秒のうちに書き込みがあっても値が変わらない
+    その秒が終わるまでは Last-Modified を付けず（None）、If-Modified-Since だけでは 304 を返さない
+    """
+    version, last_modified = read_data_version(get_read_connection())
+    key = '|'.join([APP_INSTANCE_TOKEN, request.full_path, *map(str, key_parts)])
+    digest = hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+    
+    # データ・アプリの起動（テンプレート）・key_parts のうち、最後に変わった時刻
+    last_modified = max(datetime.fromtimestamp(last_modified, tz=timezone.utc),
+                        APP_STARTED.replace(microsecond=0), not_before or APP_STARTED.replace(microsecond=0))
+    if last_modified >= datetime.now(timezone.utc).replace(microsecond=0):
+        last_modified = None
+    return f'v{version}-{digest}', last_modified
+
+def not_modified_response(etag, last_modified):
+    """
+    ブラウザが持っている内容が最新なら 304 Not Modified を返す（そうでなければ None）
+    フラッシュメッセージが残っている場合は、表示する必要があるので必ず作り直す
+    """
+    if session.get('_flashes'):
+        return None
+    
+    if request.if_none_match:
+        # gzip で圧縮したレスポンスには弱いETag（W/"..."）が付くため、弱い比較で照合する
+        matched = request.if_none_match.contains_weak(etag)
+    elif request.if_modified_since and last_modified is not None:
+        matched = last_modified <= request.if_modified_since
+    else:
+        matched = False
+    
+    if not matched:
+        return None
+    return set_cache_validators(Response(status=304), etag, last_modified)
+
+def set_cache_validators(response, etag, last_modified):
+    """
+    レスポンスに ETag・Last-Modified を付け、毎回サーバーに確認させる（no-cache）
+    last_modified が None なら Last-Modified は付けない（ETag だけで確認させる）
+    """
+    response.set_etag(etag)
+    if last_modified is not None:
+        # None を代入すると werkzeug が今の時刻を入れてしまうため、代入しない
+        response.last_modified = last_modified
+    response.cache_control.no_cache = True
+    response.vary.add('Cookie')
+    return response
+
+def encode_cursor(todo):
+    """
+    ページ送り用のカーソル文字列を作る（"作成日時|ID" の形式）
+    """
+    return f"{todo['created_at']}|{todo['id']}"
+
+def decode_cursor(value):
+    """
+    カーソル文字列を (作成日時, ID) に戻す。不正な値なら None
+    """
+    if not value or '|' not in value:
+        return None
+    created_at, _, todo_id = value.rpartition('|')
+    try:
+        return created_at, int(todo_id)
+    except ValueError:
+        return None
+
+def get_per_page(value):
+    """
+    1ページあたりの件数を決める（範囲外・不正な値は既定値に丸める）
+    """
+    try:
+        per_page = int(value)
+    except (TypeError, ValueError):
+        return TODOS_PER_PAGE
+    return max(1, min(per_page, MAX_TODOS_PER_PAGE))
+
+def fetch_todo_page(conn, after=None, before=None, per_page=TODOS_PER_PAGE):
+    """
+    キーセット方式（(created_at, id) の位置を基準にする方式）で1ページ分のタスクを取得する
+    OFFSETと違い、何ページ目でも読み飛ばす行がないため速度が一定になる
+
+    after:  このカーソルより古いタスク（次のページ）
+    before: このカーソルより新しいタスク（前のページ）
+    戻り値: (タスクのリスト, 前のページのカーソル, 次のページのカーソル)
+    """
+    columns = 'id, title, description, priority, completed, created_at, updated_at'
+    
+    # 削除済みの行を除く（deleted_at IS NULL を書くことで、削除していない行だけの部分インデックスを使える）
+    # 1件多く取得して、さらに続きがあるかを判定する
+    if before:
+        rows = conn.execute(f'''
+            SELECT {columns}
+            FROM todos
+            WHERE deleted_at IS NULL AND (created_at, id) > (?, ?)
+            ORDER BY created_at ASC, id ASC
+            LIMIT ?
+        ''', (*before, per_page + 1)).fetchall()
+        has_more = len(rows) > per_page
+        todos = list(reversed(rows[:per_page]))
+        has_prev, has_next = has_more, True
+    else:
+        if after:
+            rows = conn.execute(f'''
+                SELECT {columns}
+                FROM todos
+                WHERE deleted_at IS NULL AND (created_at, id) < (?, ?)
+                ORDER BY created_at DESC, id DESC
+                LIMIT ?
+            ''', (*after, per_page + 1)).fetchall()
+        else:
+            rows = conn.execute(f'''
+                SELECT {columns}
+                FROM todos
+                WHERE deleted_at IS NULL
+                ORDER BY created_at DESC, id DESC
+                LIMIT ?
+            ''', (per_page + 1,)).fetchall()
+        has_more = len(rows) > per_page
+        todos = rows[:per_page]
+        has_prev, has_next = after is not None, has_more
+    
+    prev_cursor = encode_cursor(todos[0]) if todos and has_prev else None
+    next_cursor = encode_cursor(todos[-1]) if todos and has_next else None
+    return todos, prev_cursor, next_cursor
+
+# ===== 書き込み処理（書き込みキューからも直接からも呼べるよう、接続を受け取る関数にする） =====
+
+# 取得・返却するタスクの列
+TODO_COLUMNS = 'id, title, description, priority, completed, created_at, updated_at'
+
+def fetch_returning(cursor):
+    """
+    RETURNING 付きの文の結果を1行取り出す（該当行がなければ None）
+    最後まで読み切ることで、コミット前に文の実行を完了させる
+    """
+    rows = cursor.fetchall()
+    return rows[0] if rows else None
+
+def get_todo_row(conn, todo_id):
+    """
+    IDを指定してタスクを1件取得する（削除済みのタスクは None）
+    """
+    return conn.execute(f'SELECT {TODO_COLUMNS} FROM todos WHERE id = ? AND deleted_at IS NULL',
+                        (todo_id,)).fetchone()
+
+def insert_todo(conn, title, description, priority, completed=0):
+    """
+    タスクを追加し、追加した行を返す（コミットは呼び出し側で行う）
+    """
+    values = (title, description, priority, completed)
+    if SUPPORTS_RETURNING:
+        return fetch_returning(conn.execute(f'''
+            INSERT INTO todos (title, description, priority, completed, created_at, updated_at)
+            VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
+            RETURNING {TODO_COLUMNS}
+        ''', values))
+    
+    cursor = conn.execute('''
+        INSERT INTO todos (title, description, priority, completed, created_at, updated_at)
+        VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
+    ''', values)
+    return get_todo_row(conn, cursor.lastrowid)
+
+def update_todo_fields(conn, todo_id, fields):
+    """
+    指定した列だけを更新し、更新後の行を返す（タスクがない・削除済みなら None、コミットは呼び出し側）
+    fields のキーは EDITABLE_FIELDS に含まれる列名に限る（そのためSQLに埋め込んでも安全）
+    """
+    assignments = ', '.join(f'{name} = ?' for name in fields)
+    values = (*fields.values(), todo_id)
+    if SUPPORTS_RETURNING:
+        return fetch_returning(conn.execute(f'''
+            UPDATE todos
+            SET {assignments}, updated_at = CURRENT_TIMESTAMP
+            WHERE id = ? AND deleted_at IS NULL
+            RETURNING {TODO_COLUMNS}
+        ''', values))
+    
+    cursor = conn.execute(f'''
+        UPDATE todos
+        SET {assignments}, updated_at = CURRENT_TIMESTAMP
+        WHERE id = ? AND deleted_at IS NULL
+    ''', values)
+    return get_todo_row(conn, todo_id) if cursor.rowcount else None
+
+def soft_delete_todo(conn, todo_id):
+    """
+    タスクを論理削除し（deleted_at に削除日時を入れる）、削除した行を返す（タスクがなければ None）
+    行はしばらく残るため restore_todo() で元に戻せる。完全に消すのは片付けのスレッド（compaction.py）
+    """
+    if SUPPORTS_RETURNING:
+        return fetch_returning(conn.execute(f'''
+            UPDATE todos
+            SET deleted_at = CURRENT_TIMESTAMP
+            WHERE id = ? AND deleted_at IS NULL
+            RETURNING {TODO_COLUMNS}
+        ''', (todo_id,)))
+    
+    todo = get_todo_row(conn, todo_id)
+    if todo:
+        conn.execute('UPDATE todos SET deleted_at = CURRENT_TIMESTAMP WHERE id = ?', (todo_id,))
+    return todo
+
+def restore_todo(conn, todo_id):
+    """
+    論理削除したタスクを元に戻し、戻した行を返す（削除済みのタスクがない・完全に消えた後なら None）
+    """
+    if SUPPORTS_RETURNING:
+        return fetch_returning(conn.execute(f'''
+            UPDATE todos
+            SET deleted_at = NULL
+            WHERE id = ? AND deleted_at IS NOT NULL
+            RETURNING {TODO_COLUMNS}
+        ''', (todo_id,)))
+    
+    cursor = conn.execute('''
+        UPDATE todos SET deleted_at = NULL WHERE id = ? AND deleted_at IS NOT NULL
+    ''', (todo_id,))
+    return get_todo_row(conn, todo_id) if cursor.rowcount else None
+
+def run_write(fn, *args):
+    """
+    書き込み関数 fn(conn, *args) を実行してコミットし、結果を返す
+    設定の USE_WRITE_QUEUE が有効なら書き込みキューに渡し、他のリクエストの書き込みとまとめてコミットする
+    書き込み用の接続（1本だけ）はコミットが終わったらすぐにプールへ返し、
+    書き込みキュー・片付けのスレッド・他のリクエストを、このリクエストの終わりまで待たせない
+    """
+    db = get_database()
+    if db.use_write_queue:
+        return db.write_queue.execute(fn, *args)
+    
+    conn = db.write_pool.acquire()
+    try:
+        with conn:
+            return fn(conn, *args)
+    finally:
+        db.write_pool.release(conn)
+
+@bp.route('/')
 def index():
     """
     ToDoリスト表示ページ（メインページ）
-    データベースから全てのタスクを取得して表示
+    データベースからタスクを1ページ分ずつ取得して表示
     """
     if not init_db_if_not_exists():
         return render_template('error.html', 
-                             error_message="データベースが初期化されていません。先に 'python init_db.py' を実行してください。")
+                             error_message="データベースが初期化（または最新の構造に更新）されていません。先に 'python init_db.py' を実行してください。")
     
-    conn = get_db_connection()
+    # 前回から変更がなければ、データを読み直さずに 304 を返す
+    # ページには今日の日付を表示するため、日付が変わったら内容も変わる（Last-Modified は今日の0時より前にしない）
+    now = datetime.now().astimezone()
+    current_date = now.strftime('%Y年%m月%d日')
+    etag, last_modified = get_cache_validators(
+        current_date, not_before=now.replace(hour=0, minute=0, second=0, microsecond=0))
+    cached = not_modified_response(etag, last_modified)
+    if cached:
+        return cached
     
-    # タスクを取得（新しい順に並び替え）
-    todos = conn.execute('''
-        SELECT id, title, description, priority, completed, created_at, updated_at
-        FROM todos 
-        ORDER BY created_at DESC
-    ''').fetchall()
+    conn = get_read_connection()
     
-    # 統計情報を計算
-    total_todos = len(todos)
-    completed_todos = sum(1 for todo in todos if todo['completed'])
-    pending_todos = total_todos - completed_todos
+    # タスクを1ページ分取得（新しい順に並び替え）
+    per_page = get_per_page(request.args.get('per_page'))
+    todos, prev_cursor, next_cursor = fetch_todo_page(
+        conn,
+        after=decode_cursor(request.args.get('after')),
+        before=decode_cursor(request.args.get('before')),
+        per_page=per_page
+    )
     
-    conn.close()
+    # 統計情報はトリガーで更新される集計テーブルから読む（全件を数えない）
+    stats = read_stats(conn)
+    total_todos = stats['total']
+    completed_todos = stats['completed']
+    pending_todos = stats['pending']
     
     template_data = {
         'todos': todos,
+        'per_page': per_page,
+        'prev_cursor': prev_cursor,
+        'next_cursor': next_cursor,
         'total_todos': total_todos,
         'completed_todos': completed_todos,
         'pending_todos': pending_todos,
-        'current_date': datetime.now().strftime('%Y年%m月%d日'),
+        'current_date': current_date,
         'page_title': 'ToDoリスト - データベース連携'
     }
     
-    return render_template('index.html', **template_data)
+    response = make_response(render_template('index.html', **template_data))
+    return set_cache_validators(response, etag, last_modified)
 
-@app.route('/add')
+@bp.route('/search')
+def search():
+    """
+    タスク検索ページ
+    タイトル・説明を全文検索し、一致度の高い順に1ページ分ずつ表示する
+    """
+    query = request.args.get('q', '').strip()
+    try:
+        page = max(1, int(request.args.get('page', 1)))
+    except ValueError:
+        page = 1
+    per_page = get_per_page(request.args.get('per_page'))
+    
+    todos, has_next, used_fts = [], False, False
+    if query:
+        conn = get_read_connection()
+        todos, has_next, used_fts = search_todos(
+            conn, query, page=page, per_page=per_page, use_fts=fts_available(conn)
+        )
+    
+    template_data = {
+        'query': query,
+        'todos': todos,
+        'page': page,
+        'per_page': per_page,
+        'has_next': has_next,
+        'used_fts': used_fts,
+        'page_title': f'「{query}」の検索結果' if query else 'タスクを検索'
+    }
+    
+    return render_template('search.html', **template_data)
+
+@bp.route('/add')
 def add_form():
     """
     新しいタスク追加フォームページ
     """
     return render_template('add_todo.html', page_title='新しいタスクを追加')
 
-@app.route('/add', methods=['POST'])
+@bp.route('/add', methods=['POST'])
 def add_todo():
     """
     新しいタスク追加処理
@@ -93,56 +474,44 @@ def add_todo():
     # バリデーション
     if not title:
         flash('タスクのタイトルは必須です', 'error')
-        return redirect(url_for('add_form'))
+        return redirect(url_for('todos.add_form'))
     
     if len(title) > 200:
         flash('タイトルは200文字以内で入力してください', 'error')
-        return redirect(url_for('add_form'))
+        return redirect(url_for('todos.add_form'))
     
     # データベースに挿入
-    conn = get_db_connection()
     try:
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO todos (title, description, priority, completed, created_at, updated_at)
-            VALUES (?, ?, ?, 0, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
-        ''', (title, description if description else None, priority))
-        
-        conn.commit()
-        new_id = cursor.lastrowid
+        todo = run_write(insert_todo, title, description if description else None, priority)
+        new_id = todo['id']
         
         flash(f'タスク「{title}」を追加しました（ID: {new_id}）', 'success')
         
     except sqlite3.Error as e:
         flash(f'データベースエラー: {str(e)}', 'error')
-        conn.rollback()
-    finally:
-        conn.close()
     
-    return redirect(url_for('index'))
+    return redirect(url_for('todos.index'))
 
-@app.route('/edit/<int:todo_id>')
+@bp.route('/edit/<int:todo_id>')
 def edit_form(todo_id):
     """
     タスク編集フォームページ
     """
-    conn = get_db_connection()
+    conn = get_read_connection()
     
     todo = conn.execute('''
         SELECT id, title, description, priority, completed, created_at
         FROM todos 
-        WHERE id = ?
+        WHERE id = ? AND deleted_at IS NULL
     ''', (todo_id,)).fetchone()
     
-    conn.close()
-    
     if not todo:
         flash('指定されたタスクが見つかりません', 'error')
-        return redirect(url_for('index'))
+        return redirect(url_for('todos.index'))
     
     return render_template('edit_todo.html', todo=todo, page_title=f'タスクを編集 - {todo["title"]}')
 
-@app.route('/edit/<int:todo_id>', methods=['POST'])
+@bp.route('/edit/<int:todo_id>', methods=['POST'])
 def update_todo(todo_id):
     """
     タスク更新処理
@@ -156,128 +525,452 @@ def update_todo(todo_id):
     # バリデーション
     if not title:
         flash('タスクのタイトルは必須です', 'error')
-        return redirect(url_for('edit_form', todo_id=todo_id))
+        return redirect(url_for('todos.edit_form', todo_id=todo_id))
     
     if len(title) > 200:
         flash('タイトルは200文字以内で入力してください', 'error')
-        return redirect(url_for('edit_form', todo_id=todo_id))
+        return redirect(url_for('todos.edit_form', todo_id=todo_id))
     
     # データベースを更新
-    conn = get_db_connection()
     try:
-        cursor = conn.cursor()
-        cursor.execute('''
-            UPDATE todos 
-            SET title = ?, description = ?, priority = ?, completed = ?, updated_at = CURRENT_TIMESTAMP
-            WHERE id = ?
-        ''', (title, description if description else None, priority, completed, todo_id))
+        todo = run_write(update_todo_fields, todo_id, {
+            'title': title,
+            'description': description if description else None,
+            'priority': priority,
+            'completed': completed
+        })
+        get_row_cache().invalidate(todo_id)
         
-        if cursor.rowcount == 0:
+        if todo is None:
             flash('指定されたタスクが見つかりません', 'error')
         else:
-            conn.commit()
             status_text = "完了" if completed else "未完了"
             flash(f'タスク「{title}」を更新しました（{status_text}）', 'success')
             
     except sqlite3.Error as e:
         flash(f'データベースエラー: {str(e)}', 'error')
-        conn.rollback()
-    finally:
-        conn.close()
     
-    return redirect(url_for('index'))
+    return redirect(url_for('todos.index'))
 
-@app.route('/delete/<int:todo_id>', methods=['POST'])
+@bp.route('/delete/<int:todo_id>', methods=['POST'])
 def delete_todo(todo_id):
     """
-    タスク削除処理
+    タスク削除処理（論理削除。しばらくの間は「元に戻す」で復元できる）
     """
-    conn = get_db_connection()
     try:
-        # 削除前にタスク情報を取得
-        todo = conn.execute('SELECT title FROM todos WHERE id = ?', (todo_id,)).fetchone()
+        todo = run_write(soft_delete_todo, todo_id)
+        get_row_cache().invalidate(todo_id)
         
         if not todo:
             flash('指定されたタスクが見つかりません', 'error')
         else:
-            # タスクを削除
-            cursor = conn.cursor()
-            cursor.execute('DELETE FROM todos WHERE id = ?', (todo_id,))
-            conn.commit()
+            # 'undo' のメッセージには「元に戻す」ボタンが付く（base.html）
+            flash({'id': todo_id, 'title': todo['title']}, 'undo')
             
-            flash(f'タスク「{todo["title"]}」を削除しました', 'success')
+    except sqlite3.Error as e:
+        flash(f'データベースエラー: {str(e)}', 'error')
+    
+    return redirect(url_for('todos.index'))
+
+@bp.route('/restore/<int:todo_id>', methods=['POST'])
+def restore_todo_route(todo_id):
+    """
+    削除したタスクを元に戻す
+    """
+    try:
+        todo = run_write(restore_todo, todo_id)
+        get_row_cache().invalidate(todo_id)
+        
+        if not todo:
+            flash('元に戻せるタスクが見つかりません（削除から時間がたち、完全に削除された可能性があります）', 'error')
+        else:
+            flash(f'タスク「{todo["title"]}」を元に戻しました', 'success')
             
     except sqlite3.Error as e:
         flash(f'データベースエラー: {str(e)}', 'error')
-        conn.rollback()
-    finally:
-        conn.close()
     
-    return redirect(url_for('index'))
+    return redirect(url_for('todos.index'))
 
-@app.route('/toggle/<int:todo_id>', methods=['POST'])
+@bp.route('/toggle/<int:todo_id>', methods=['POST'])
 def toggle_todo(todo_id):
     """
     タスク完了状態の切り替え
     Ajax対応
     """
-    conn = get_db_connection()
     try:
-        # 現在の状態を取得
-        todo = conn.execute('SELECT title, completed FROM todos WHERE id = ?', (todo_id,)).fetchone()
+        # 完了状態はSQLの中で反転させる（読み取りと書き込みの間に他の更新が割り込まない）
+        new_completed = run_write(toggle_todo_completed, todo_id)
         
-        if not todo:
+        if new_completed is None:
             flash('指定されたタスクが見つかりません', 'error')
         else:
-            # 完了状態を切り替え
-            new_completed = 0 if todo['completed'] else 1
-            cursor = conn.cursor()
-            cursor.execute('''
-                UPDATE todos 
-                SET completed = ?, updated_at = CURRENT_TIMESTAMP 
-                WHERE id = ?
-            ''', (new_completed, todo_id))
-            conn.commit()
+            get_row_cache().invalidate(todo_id)
+            todo = get_todo_row(get_read_connection(), todo_id)
             
             status_text = "完了" if new_completed else "未完了"
-            flash(f'タスク「{todo["title"]}」を{status_text}に変更しました', 'success')
+            title = todo['title'] if todo else f'ID {todo_id}'
+            flash(f'タスク「{title}」を{status_text}に変更しました', 'success')
             
     except sqlite3.Error as e:
         flash(f'データベースエラー: {str(e)}', 'error')
-        conn.rollback()
-    finally:
-        conn.close()
     
-    return redirect(url_for('index'))
+    return redirect(url_for('todos.index'))
 
-@app.route('/about')
+def toggle_todo_completed(conn, todo_id):
+    """
+    完了状態をSQLの中で反転させる（読み取り→書き込みの間に他の更新が割り込まない）
+    戻り値: 反転後の完了状態（1/0）。タスクがなければ None
+    """
+    if SUPPORTS_RETURNING:
+        row = fetch_returning(conn.execute('''
+            UPDATE todos
+            SET completed = 1 - completed, updated_at = CURRENT_TIMESTAMP
+            WHERE id = ? AND deleted_at IS NULL
+            RETURNING completed
+        ''', (todo_id,)))
+        return row['completed'] if row else None
+    
+    cursor = conn.execute('''
+        UPDATE todos
+        SET completed = 1 - completed, updated_at = CURRENT_TIMESTAMP
+        WHERE id = ? AND deleted_at IS NULL
+    ''', (todo_id,))
+    if cursor.rowcount == 0:
+        return None
+    return conn.execute('SELECT completed FROM todos WHERE id = ?', (todo_id,)).fetchone()['completed']
+
+# 一括操作で使える操作の種類（delete は論理削除、restore で元に戻せる）
+BATCH_OPERATIONS = {
+    'toggle': toggle_todo_completed,
+    'delete': soft_delete_todo,
+    'restore': restore_todo,
+}
+
+def run_batch_operations(conn, operations):
+    """
+    一括操作を順に実行し、操作ごとの結果を返す（コミットは呼び出し側の run_write() が1回だけ行う）
+    """
+    results = []
+    for index, item in enumerate(operations):
+        op = item.get('op') if isinstance(item, dict) else None
+        todo_id = item.get('id') if isinstance(item, dict) else None
+        result = {'index': index, 'op': op, 'id': todo_id}
+        
+        if op not in BATCH_OPERATIONS or not isinstance(todo_id, int) or isinstance(todo_id, bool):
+            result.update(success=False, message='op（toggle/delete/restore）と数値の id が必要です')
+            results.append(result)
+            continue
+        
+        outcome = BATCH_OPERATIONS[op](conn, todo_id)
+        if outcome is None or outcome is False:
+            result.update(success=False, message='指定されたタスクが見つかりません')
+        elif op == 'toggle':
+            result.update(success=True, completed=bool(outcome))
+        else:
+            result.update(success=True)
+        results.append(result)
+    return results
+
+@bp.route('/api/todos/batch', methods=['POST'])
+def batch_todos():
+    """
+    複数タスクの完了切り替え・削除・元に戻す操作を1回のリクエスト・1回のトランザクションで実行する
+    リクエスト例: {"operations": [{"op": "toggle", "id": 1}, {"op": "delete", "id": 2}]}
+    結果は操作ごとに JSON で返す（リダイレクトやフラッシュメッセージは使わない）
+    """
+    payload = request.get_json(silent=True)
+    operations = payload.get('operations') if isinstance(payload, dict) else payload
+    
+    if not isinstance(operations, list) or not operations:
+        return jsonify({'success': False, 'message': 'operations に操作のリストを指定してください'}), 400
+    
+    if len(operations) > MAX_BATCH_OPERATIONS:
+        return jsonify({
+            'success': False,
+            'message': f'一度に実行できる操作は{MAX_BATCH_OPERATIONS}件までです'
+        }), 413
+    
+    try:
+        # 全操作が終わったら1回だけコミット（エラー時は全体をロールバック）
+        results = run_write(run_batch_operations, operations)
+    except sqlite3.Error as e:
+        return jsonify({'success': False, 'message': f'データベースエラー: {str(e)}'}), 500
+    
+    get_row_cache().invalidate(*(result['id'] for result in results if result['success']))
+    succeeded = sum(1 for result in results if result['success'])
+    return jsonify({
+        'success': True,
+        'message': f'{len(results)}件中{succeeded}件の操作を実行しました',
+        'succeeded': succeeded,
+        'failed': len(results) - succeeded,
+        'results': results
+    })
+
+# ===== JSON REST API（1回の通信で結果を返し、リダイレクトしない） =====
+
+# APIで更新できる列
+EDITABLE_FIELDS = ('title', 'description', 'priority', 'completed')
+
+def todo_to_dict(row):
+    """
+    データベースの行をJSONで返せる辞書に変換する
+    """
+    todo = dict(row)
+    todo['completed'] = bool(todo['completed'])
+    return todo
+
+def validate_todo_fields(data, partial=False):
+    """
+    APIで受け取った値を検証し、(保存する値の辞書, エラーメッセージ) を返す
+    partial=True（PATCH）の場合は、送られてきた項目だけを検証する
+    """
+    if not isinstance(data, dict):
+        return None, 'JSONオブジェクトを送信してください'
+    
+    fields = {}
+    if 'title' in data or not partial:
+        title = str(data.get('title') or '').strip()
+        if not title:
+            return None, 'タスクのタイトルは必須です'
+        if len(title) > 200:
+            return None, 'タイトルは200文字以内で入力してください'
+        fields['title'] = title
+    if 'description' in data or not partial:
+        fields['description'] = str(data.get('description') or '').strip() or None
+    if 'priority' in data or not partial:
+        fields['priority'] = data.get('priority') or 'medium'
+    if 'completed' in data or not partial:
+        fields['completed'] = 1 if data.get('completed') else 0
+    
+    if not fields:
+        return None, f"更新する項目（{', '.join(EDITABLE_FIELDS)}）を指定してください"
+    return fields, None
+
+def api_error(message, status):
+    """
+    APIのエラーレスポンスを作る
+    """
+    return jsonify({'success': False, 'message': message}), status
+
+@bp.route('/api/todos', methods=['GET'])
+def api_list_todos():
+    """
+    タスク一覧をJSONで返す（一覧ページと同じキーセット方式のページ送り）
+    """
+    conn = get_read_connection()
+    todos, prev_cursor, next_cursor = fetch_todo_page(
+        conn,
+        after=decode_cursor(request.args.get('after')),
+        before=decode_cursor(request.args.get('before')),
+        per_page=get_per_page(request.args.get('per_page'))
+    )
+    return jsonify({
+        'success': True,
+        'todos': [todo_to_dict(todo) for todo in todos],
+        'prev_cursor': prev_cursor,
+        'next_cursor': next_cursor,
+        'stats': read_stats(conn)
+    })
+
+@bp.route('/api/todos', methods=['POST'])
+def api_create_todo():
+    """
+    タスクを追加し、追加したタスクをJSONで返す（201 Created）
+    """
+    fields, error = validate_todo_fields(request.get_json(silent=True))
+    if error:
+        return api_error(error, 400)
+    
+    try:
+        todo = run_write(insert_todo, fields['title'], fields['description'],
+                         fields['priority'], fields['completed'])
+    except sqlite3.Error as e:
+        return api_error(f'データベースエラー: {str(e)}', 500)
+    
+    response = jsonify({
+        'success': True,
+        'todo': todo_to_dict(todo),
+        'stats': read_stats(get_read_connection()),
+        'message': f"タスク「{todo['title']}」を追加しました（ID: {todo['id']}）"
+    })
+    response.status_code = 201
+    response.headers['Location'] = url_for('todos.api_get_todo', todo_id=todo['id'])
+    return response
+
+@bp.route('/api/todos/<int:todo_id>', methods=['GET'])
+def api_get_todo(todo_id):
+    """
+    タスクを1件JSONで返す
+    """
+    todo = get_todo_row(get_read_connection(), todo_id)
+    if not todo:
+        return api_error('指定されたタスクが見つかりません', 404)
+    return jsonify({'success': True, 'todo': todo_to_dict(todo)})
+
+@bp.route('/api/todos/<int:todo_id>', methods=['PATCH'])
+def api_update_todo(todo_id):
+    """
+    送られてきた項目だけを更新し、更新後のタスクをJSONで返す
+    """
+    fields, error = validate_todo_fields(request.get_json(silent=True), partial=True)
+    if error:
+        return api_error(error, 400)
+    
+    try:
+        todo = run_write(update_todo_fields, todo_id, fields)
+    except sqlite3.Error as e:
+        return api_error(f'データベースエラー: {str(e)}', 500)
+    get_row_cache().invalidate(todo_id)
+    
+    if not todo:
+        return api_error('指定されたタスクが見つかりません', 404)
+    
+    status_text = "完了" if todo['completed'] else "未完了"
+    return jsonify({
+        'success': True,
+        'todo': todo_to_dict(todo),
+        'stats': read_stats(get_read_connection()),
+        'message': f"タスク「{todo['title']}」を更新しました（{status_text}）"
+    })
+
+@bp.route('/api/todos/<int:todo_id>', methods=['DELETE'])
+def api_delete_todo(todo_id):
+    """
+    タスクを論理削除し、削除したタスクをJSONで返す（POST /api/todos/<id>/restore で元に戻せる）
+    """
+    try:
+        todo = run_write(soft_delete_todo, todo_id)
+    except sqlite3.Error as e:
+        return api_error(f'データベースエラー: {str(e)}', 500)
+    get_row_cache().invalidate(todo_id)
+    
+    if not todo:
+        return api_error('指定されたタスクが見つかりません', 404)
+    
+    return jsonify({
+        'success': True,
+        'todo': todo_to_dict(todo),
+        'stats': read_stats(get_read_connection()),
+        'restore_url': url_for('todos.api_restore_todo', todo_id=todo_id),
+        'message': f"タスク「{todo['title']}」を削除しました"
+    })
+
+@bp.route('/api/todos/<int:todo_id>/restore', methods=['POST'])
+def api_restore_todo(todo_id):
+    """
+    論理削除したタスクを元に戻し、戻したタスクをJSONで返す
+    """
+    try:
+        todo = run_write(restore_todo, todo_id)
+    except sqlite3.Error as e:
+        return api_error(f'データベースエラー: {str(e)}', 500)
+    get_row_cache().invalidate(todo_id)
+    
+    if not todo:
+        return api_error('元に戻せるタスクが見つかりません（完全に削除された可能性があります）', 404)
+    
+    return jsonify({
+        'success': True,
+        'todo': todo_to_dict(todo),
+        'stats': read_stats(get_read_connection()),
+        'message': f"タスク「{todo['title']}」を元に戻しました"
+    })
+
+@bp.route('/import', methods=['POST'])
+def import_todos_route():
+    """
+    タスクの一括インポート（CSV または NDJSON）
+    リクエスト本文を少しずつ読みながら、IMPORT_CHUNK_SIZE 件ごとにまとめて保存する
+    形式は ?format=csv|ndjson または Content-Type で指定する
+    """
+    fmt = detect_format(request.args.get('format'), request.content_type)
+    if fmt is None:
+        return jsonify({
+            'success': False,
+            'message': '形式を ?format=csv または ?format=ndjson で指定してください'
+        }), 415
+    
+    try:
+        # チャンクごとに run_write() で保存する（1チャンクごとに書き込み用の接続を返すため、
+        # 大きなインポートの間も他のリクエストの書き込みや片付けが順番に割り込める）
+        result = import_todos(iter_records(request.stream, fmt),
+                              lambda rows: run_write(insert_todo_rows, rows),
+                              chunk_size=IMPORT_CHUNK_SIZE)
+    except ImportAborted as e:
+        if not e.result['imported']:
+            return jsonify({'success': False, 'message': f'インポートに失敗しました: {e}'}), 400
+        # 途中まではコミット済みのため、保存できた件数を 207（一部のみ成功）で返す
+        return jsonify({
+            'success': False,
+            'partial': True,
+            'message': f"インポートが途中で失敗しました（{e.result['imported']}件は保存済み）: {e}",
+            **e.result
+        }), 207
+    
+    return jsonify({
+        'success': True,
+        'message': f"{result['imported']}件のタスクをインポートしました",
+        **result
+    })
+
+@bp.route('/export')
+def export_todos_route():
+    """
+    タスクの一括エクスポート（CSV または NDJSON）
+    データベースから少しずつ読み出しながら送信するため、全件をメモリに載せない
+    """
+    fmt = request.args.get('format', 'csv').lower()
+    if fmt not in FORMATS:
+        return jsonify({'success': False, 'message': '形式は csv または ndjson を指定してください'}), 400
+    
+    def generate():
+        # stream_with_context により、送信が終わるまでリクエストの接続が保持される
+        yield from iter_export(get_read_connection(), fmt, batch_size=EXPORT_BATCH_SIZE)
+    
+    response = Response(stream_with_context(generate()), mimetype=FORMATS[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename=todos.{fmt}'
+    return response
+
+@bp.route('/debug/slow-queries')
+def debug_slow_queries():
+    """
+    記録された遅いSQL・全件読みのSQLを新しい順にJSONで返す（開発用、このパソコンからのアクセスのみ）
+    ?full_scan=1 で全件読みのSQLだけ、?limit=N で件数を絞り込む
+    """
+    if request.remote_addr not in ('127.0.0.1', '::1'):
+        abort(404)
+    
+    slow_query_log = get_slow_query_log()
+    limit = request.args.get('limit', type=int)
+    full_scan_only = request.args.get('full_scan') == '1'
+    entries = slow_query_log.entries(limit=limit, full_scan_only=full_scan_only)
+    return jsonify({
+        'threshold_ms': slow_query_log.threshold_ms,
+        'count': len(entries),
+        'queries': entries
+    })
+
+@bp.route('/about')
 def about():
     """
     Step 5の説明ページ
     """
     # データベース統計を取得
-    conn = get_db_connection()
+    conn = get_read_connection()
     
-    stats = {}
+    etag = None
     try:
-        # 基本統計
-        stats['total'] = conn.execute('SELECT COUNT(*) FROM todos').fetchone()[0]
-        stats['completed'] = conn.execute('SELECT COUNT(*) FROM todos WHERE completed = 1').fetchone()[0]
-        stats['pending'] = stats['total'] - stats['completed']
-        
-        # 優先度別統計
-        priority_stats = conn.execute('''
-            SELECT priority, COUNT(*) as count 
-            FROM todos 
-            GROUP BY priority
-        ''').fetchall()
+        # 前回から変更がなければ 304 を返す
+        etag, last_modified = get_cache_validators()
+        cached = not_modified_response(etag, last_modified)
+        if cached:
+            return cached
         
-        stats['by_priority'] = {row['priority']: row['count'] for row in priority_stats}
+        # 基本統計・優先度別統計（集計テーブルから読み取る）
+        stats = read_stats(conn)
         
     except sqlite3.Error:
         stats = {'total': 0, 'completed': 0, 'pending': 0, 'by_priority': {}}
-    finally:
-        conn.close()
     
     features = [
         {
@@ -317,45 +1010,63 @@ def about():
         'page_title': 'Step 5について - データベース連携'
     }
     
-    return render_template('about.html', **template_data)
+    response = make_response(render_template('about.html', **template_data))
+    if etag:
+        set_cache_validators(response, etag, last_modified)
+    return response
 
-@app.route('/health')
+def get_health_validators():
+    """
+    /health の ETag・Last-Modified（データのバージョン番号から作る。データベースが使えなければ None）
+    データが変わっていなければ、診断をやり直さずに 304 を返せる
+    """
+    try:
+        return get_cache_validators()
+    except sqlite3.Error:
+        return None
+
+@bp.route('/health')
+@cached_view(validators=get_health_validators)
 def health_check():
     """
     アプリケーションとデータベースの動作確認用エンドポイント
+    集計・ファイルサイズの取得などを行うため、結果は数秒間使い回す（監視には /livez・/readyz を使う）
     """
     db_status = "OK"
     db_info = {}
     
     try:
-        conn = get_db_connection()
-        
-        # データベース統計を取得
-        cursor = conn.cursor()
-        cursor.execute('SELECT COUNT(*) FROM todos')
-        total_count = cursor.fetchone()[0]
+        conn = get_read_connection()
         
-        cursor.execute('SELECT COUNT(*) FROM todos WHERE completed = 1')
-        completed_count = cursor.fetchone()[0]
+        # データベース統計を取得（集計テーブルから読み取る）
+        stats = read_stats(conn)
         
+        db = get_database()
+        size = db.size()
         db_info = {
-            'total_todos': total_count,
-            'completed_todos': completed_count,
-            'pending_todos': total_count - completed_count,
-            'database_file': os.path.abspath(DATABASE),
-            'database_size': f"{os.path.getsize(DATABASE) / 1024:.1f} KB" if os.path.exists(DATABASE) else "N/A"
+            'total_todos': stats['total'],
+            'completed_todos': stats['completed'],
+            'pending_todos': stats['pending'],
+            'database_file': os.path.abspath(db.path) if db.path else db.database,
+            'database_size': f"{size / 1024:.1f} KB" if size is not None else "N/A",
+            'pragma_profile': db.profile_name,
+            'connection_pool': db.get_stats(),
+            'write_queue': db.write_queue.get_stats() if db.use_write_queue else None,
+            'compaction': db.compactor.get_stats(),
+            'fragment_cache': get_row_cache().get_stats()
         }
         
-        conn.close()
-        
     except Exception as e:
         db_status = f"ERROR: {str(e)}"
     
-    return {
+    return jsonify({
         'status': 'OK',
         'message': 'Step5 データベース連携 アプリケーションが動作しています',
         'step': 5,
         'description': 'SQLite + CRUD操作 + 完全永続化',
+        'startup': current_app.extensions['startup'].as_dict(),
+        'compression': current_app.extensions['compression'].get_stats(),
+        'generated_at': datetime.now().isoformat(timespec='seconds'),
         'database': {
             'status': db_status,
             'info': db_info
@@ -369,17 +1080,107 @@ def health_check():
         },
         'endpoints': [
             {'url': '/', 'description': 'ToDoリスト表示'},
+            {'url': '/search?q=', 'description': 'タスク検索（全文検索）'},
             {'url': '/add', 'description': 'タスク追加フォーム（GET・POST）'},
             {'url': '/edit/<id>', 'description': 'タスク編集フォーム（GET・POST）'},
-            {'url': '/delete/<id>', 'description': 'タスク削除（POST）'},
+            {'url': '/delete/<id>', 'description': 'タスク削除（POST、論理削除）'},
+            {'url': '/restore/<id>', 'description': '削除したタスクを元に戻す（POST）'},
             {'url': '/toggle/<id>', 'description': '完了状態切り替え（POST）'},
+            {'url': '/api/todos', 'description': 'タスク一覧・追加（GET・POST、JSON）'},
+            {'url': '/api/todos/<id>', 'description': 'タスク取得・更新・削除（GET・PATCH・DELETE、JSON）'},
+            {'url': '/api/todos/<id>/restore', 'description': '削除したタスクを元に戻す（POST・JSON）'},
+            {'url': '/api/todos/batch', 'description': '完了切り替え・削除・元に戻すの一括実行（POST・JSON）'},
+            {'url': '/import', 'description': 'タスク一括インポート（POST・CSV/NDJSON）'},
+            {'url': '/export', 'description': 'タスク一括エクスポート（CSV/NDJSON）'},
             {'url': '/about', 'description': 'Step 5説明'},
-            {'url': '/health', 'description': 'ヘルスチェック'}
+            {'url': '/health', 'description': 'ヘルスチェック'},
+            {'url': '/metrics', 'description': 'メトリクス（SQLの回数・時間を含む、Prometheus形式）'},
+            {'url': '/livez', 'description': '死活監視（軽量）'},
+            {'url': '/readyz', 'description': '準備完了の確認（SELECT 1・テンプレート、結果は数秒ごとに更新）'},
+            {'url': '/debug/slow-queries', 'description': '遅いSQL・全件読みのSQLの記録（開発用）'}
         ]
-    }
+    })
+
+def create_app(config=None, startup=None):
+    """
+    アプリを作る（アプリケーションファクトリ）
+    config: 設定の辞書（DATABASE・READ_POOL_SIZE・WRITE_POOL_SIZE・PRAGMA_PROFILE など。既定値は config.py）
+    例: create_app({'DATABASE': ':memory:'}) でメモリ上のデータベースを使うアプリになる
+    同じプロセスで何度呼んでも、アプリごとに別の接続プール・キャッシュを持つ
+    """
+    startup = startup or StartupTimer()
+    
+    # Flaskアプリケーションの初期化
+    app = Flask(__name__)
+    
+    # フラッシュメッセージ用のシークレットキー（本番環境では必ず変更してください）
+    app.secret_key = 'step5-database-secret-key'
+    app.config.update(load_config(config))
+    
+    # テンプレートのコンパイル結果（バイトコード）を .jinja_cache に保存し、再起動後に使い回す
+    init_template_cache(app)
+    
+    # ビルド済みの CSS・JavaScript（ハッシュ値付きのファイル名・gzip）を /assets/ から長期キャッシュ付きで配信する
+    init_assets(app)
+    
+    # 遅いSQLの記録（ログファイルの相対パスはこのフォルダを基準にする。アプリごとに別の記録を持つ）
+    log_path = app.config['SLOW_QUERY_LOG']
+    slow_query_log = SlowQueryLog(threshold_ms=app.config['SLOW_QUERY_MS'],
+                                  log_path=os.path.join(app.root_path, log_path) if log_path else None)
+    app.extensions['slow_query_log'] = slow_query_log
+    
+    # 接続プールと書き込みキュー（最初の書き込みで書き込みスレッドが起動し、書き込み用の接続を順番に借りる）
+    # SQLの実行時間（Server-Timing の db）と遅いSQLの記録は、このアプリの接続だけに付ける
+    db = TodoDatabase(app.config, timing_listener=record_sql_timing, statement_listener=slow_query_log.record)
+    app.extensions['todo_db'] = db
+    if db.in_memory:
+        # メモリ上のデータベースは起動のたびに空のため、ここでテーブルを作る
+        init_database(db.database, with_samples=app.config['SAMPLE_DATA'],
+                      pragma_profile=app.config['PRAGMA_PROFILE'])
+    app.teardown_appcontext(release_db_connection)
+    
+    # 削除済みのタスクの片付けと incremental_vacuum（最初のリクエストでスレッドを起動する。
+    # 本番用のサーバーではプロセスを分けた後に起動させるため、create_app() の中では起動しない）
+    app.before_request(db.compactor.start)
+    
+    # リクエスト数・応答時間などを /metrics で公開する
+    init_metrics(app)
+    
+    # HTML・JSON などのレスポンスを gzip で圧縮して送る（環境変数 GZIP_LEVEL・GZIP_MIN_SIZE で調整）
+    init_compression(app)
+    
+    # 一覧の各行のHTMLを、行に表示する項目の内容ごとに使い回す
+    # 更新日時は秒単位のため、更新日時だけでは同じ秒に2回更新された行を見分けられない。
+    # invalidate() は書き込んだプロセスのキャッシュしか捨てられないので、別のワーカーでも古いHTMLを使わないよう、
+    # 表示する項目そのものから version を作る
+    init_fragment_cache(app, ROW_CACHE_NAME, '_todo_row.html', 'todo',
+                        version=fingerprint_fields('title', 'description', 'priority', 'completed',
+                                                   'created_at', 'updated_at'))
+    
+    # 監視用の /livez（死活）と /readyz（データベース・テンプレートの確認、結果は数秒ごとに更新）
+    init_probes(app, templates=('base.html', 'index.html', '_todo_row.html', 'error.html'),
+                checks={'database': db.check})
+    
+    app.register_blueprint(bp)
+    
+    # テンプレートを事前に読み込み（ウォームアップ）、起動時間の内訳を表示する
+    finish_startup(app, startup)
+    return app
+
+# 本番用のサーバーが読み込む、既定の設定のアプリを作るファイル
+WSGI_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'wsgi.py')
 
 # このファイルが直接実行された場合のみWebサーバーを起動
+# （import しただけではアプリを作らない。既定の設定のアプリは wsgi.py、それ以外は create_app(config) で作る）
 if __name__ == '__main__':
+    if '--production' in sys.argv[1:]:
+        # 本番用のサーバー（複数のプロセス × 複数のスレッド）で起動する（例: python app.py --production --workers 4）
+        # アプリはワーカーごとに wsgi.py から作る（データベースの接続やスレッドをプロセスの間で共有しない）
+        serve_main(WSGI_FILE, sys.argv[1:])
+        sys.exit(0)
+
+    app = create_app(startup=startup)
+
     print("🚀 Flask Step5 データベース連携 サーバーを起動します...")
     print("📍 アクセスURL: http://localhost:5000")
     print("💾 新機能: SQLiteデータベース、CRUD操作、完全永続化")
@@ -0,0 +1,225 @@
+"""
+Step 5: タスクの一括インポート・エクスポート
+大量のデータを少しずつ読み書きし、全件をメモリに載せずに処理する仕組み
+"""
+
+import csv
+import io
+import json
+import sqlite3
+from datetime import datetime
+
+from slow_query_log import EXPECTED_FULL_SCAN
+
+# インポート・エクスポートで扱う列（エクスポートでは id も出力する）
+IMPORT_COLUMNS = ('title', 'description', 'priority', 'completed', 'created_at', 'updated_at')
+EXPORT_COLUMNS = ('id',) + IMPORT_COLUMNS
+
+# 受け付ける優先度
+PRIORITIES = ('high', 'medium', 'low')
+
+# 日時の形式（CURRENT_TIMESTAMP と同じ。一覧のページ送りはこの文字列の順番で並べるため、ほかの形式は受け付けない）
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# 対応しているファイル形式と Content-Type
+FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+class ImportRowError(ValueError):
+    """
+    インポートする1行の内容が不正な場合のエラー
+    """
+
+
+class ImportAborted(Exception):
+    """
+    インポートが途中で失敗した場合のエラー
+    それまでのチャンクはコミット済みのため、保存できた件数を result に持つ
+    """
+
+    def __init__(self, error, result):
+        super().__init__(str(error))
+        self.error = error      # 元のエラー（sqlite3.Error・UnicodeDecodeError・csv.Error）
+        self.result = result    # {'imported': 保存済みの件数, 'skipped': ..., 'errors': [...]}
+
+
+def detect_format(format_param, content_type):
+    """
+    ?format= パラメータまたは Content-Type から形式（csv / ndjson）を判定する
+    """
+    if format_param:
+        return format_param.lower() if format_param.lower() in FORMATS else None
+    content_type = (content_type or '').split(';')[0].strip().lower()
+    if content_type in ('text/csv', 'application/csv'):
+        return 'csv'
+    if content_type in ('application/x-ndjson', 'application/ndjson', 'application/jsonl'):
+        return 'ndjson'
+    return None
+
+
+def parse_completed(value):
+    """
+    完了状態の表記（1/0, true/false など）を 1 または 0 に変換する
+    """
+    if isinstance(value, bool):
+        return int(value)
+    text = str(value if value is not None else '').strip().lower()
+    if text in ('', '0', 'false', 'no'):
+        return 0
+    if text in ('1', 'true', 'yes'):
+        return 1
+    raise ImportRowError(f'completed の値が不正です: {value}')
+
+
+def parse_timestamp(value, name):
+    """
+    日時の表記を検証し、TIMESTAMP_FORMAT の形式（桁をそろえた文字列）に変換する（空なら None）
+    """
+    text = str(value if value is not None else '').strip()
+    if not text:
+        return None
+    try:
+        return datetime.strptime(text, TIMESTAMP_FORMAT).strftime(TIMESTAMP_FORMAT)
+    except ValueError:
+        raise ImportRowError(f'{name} の値が不正です（YYYY-MM-DD HH:MM:SS の形式で指定してください）: {text}') from None
+
+
+def normalize_record(record):
+    """
+    1件分の辞書を検証し、INSERT 用のタプルに変換する
+    """
+    if not isinstance(record, dict):
+        raise ImportRowError('1行に1つのJSONオブジェクトが必要です')
+
+    title = str(record.get('title') or '').strip()
+    if not title:
+        raise ImportRowError('タスクのタイトルは必須です')
+    if len(title) > 200:
+        raise ImportRowError('タイトルは200文字以内で入力してください')
+
+    description = str(record.get('description') or '').strip() or None
+
+    priority = str(record.get('priority') or 'medium').strip()
+    if priority not in PRIORITIES:
+        raise ImportRowError(f'優先度の値が不正です: {priority}')
+
+    completed = parse_completed(record.get('completed'))
+
+    # 日時が空の場合は INSERT 時に CURRENT_TIMESTAMP を使う
+    created_at = parse_timestamp(record.get('created_at'), 'created_at')
+    updated_at = parse_timestamp(record.get('updated_at'), 'updated_at') or created_at
+
+    return (title, description, priority, completed, created_at, updated_at)
+
+
+def iter_records(stream, fmt):
+    """
+    アップロードされたデータを1行ずつ読み、(行番号, 辞書) を順に返す
+    ストリームを少しずつ読むため、ファイル全体をメモリに載せない
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if fmt == 'csv':
+        reader = csv.DictReader(text)
+        for record in reader:
+            yield reader.line_num, record
+    else:
+        for line_number, line in enumerate(text, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield line_number, json.loads(line)
+            except json.JSONDecodeError as e:
+                yield line_number, ImportRowError(f'JSONの形式が不正です: {e.msg}')
+
+
+def insert_todo_rows(conn, rows):
+    """
+    normalize_record() で変換した行を executemany でまとめて INSERT する（コミットは呼び出し側）
+    """
+    conn.executemany('''
+        INSERT INTO todos (title, description, priority, completed, created_at, updated_at)
+        VALUES (?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP), COALESCE(?, CURRENT_TIMESTAMP))
+    ''', rows)
+    return len(rows)
+
+
+def import_todos(records, write_chunk, chunk_size=1000, max_errors=20):
+    """
+    レコードを chunk_size 件ずつまとめ、write_chunk(行のリスト) で保存する
+    write_chunk は1チャンクを1回のトランザクションでコミットする関数（例: run_write(insert_todo_rows, rows)）
+    チャンクごとに1回だけコミットするため、1件ずつ保存するより大幅に速い
+
+    戻り値: {'imported': 追加件数, 'skipped': スキップ件数, 'errors': [エラー内容]}
+    途中で失敗した場合は ImportAborted（それまでにコミットした件数は e.result['imported']）
+    """
+    result = {'imported': 0, 'skipped': 0, 'errors': []}
+    chunk = []
+
+    def flush():
+        write_chunk(list(chunk))
+        result['imported'] += len(chunk)
+        chunk.clear()
+
+    try:
+        for line_number, record in records:
+            try:
+                if isinstance(record, ImportRowError):
+                    raise record
+                chunk.append(normalize_record(record))
+            except ImportRowError as e:
+                result['skipped'] += 1
+                if len(result['errors']) < max_errors:
+                    result['errors'].append({'line': line_number, 'message': str(e)})
+                continue
+
+            if len(chunk) >= chunk_size:
+                flush()
+
+        if chunk:
+            flush()
+    except (sqlite3.Error, UnicodeDecodeError, csv.Error) as e:
+        # 失敗したチャンクは取り消されるが、それより前のチャンクは保存済み
+        raise ImportAborted(e, result) from e
+
+    return result
+
+
+def iter_export(conn, fmt, batch_size=500):
+    """
+    タスク（削除済みを除く）を batch_size 件ずつ読み出し、CSV または NDJSON の文字列として順に返す
+    カーソルから少しずつ取り出すため、全件をメモリに載せない
+    """
+    # ID の順に全件を読む（全件読みは承知の上なので、遅いSQLの記録では警告しない）
+    cursor = conn.execute(f'''
+        SELECT {', '.join(EXPORT_COLUMNS)}
+        FROM todos
+        WHERE deleted_at IS NULL
+        ORDER BY id {EXPECTED_FULL_SCAN}
+    ''')
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer) if fmt == 'csv' else None
+    if writer:
+        writer.writerow(EXPORT_COLUMNS)
+
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        for row in rows:
+            if writer:
+                writer.writerow(tuple(row))
+            else:
+                buffer.write(json.dumps(dict(zip(EXPORT_COLUMNS, row)), ensure_ascii=False))
+                buffer.write('\n')
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+    remaining = buffer.getvalue()
+    if remaining:
+        yield remaining
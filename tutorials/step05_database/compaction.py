@@ -0,0 +1,197 @@
+"""
+Step 5: 削除済みのタスク（墓標）の片付けと、空き領域の返却（コンパクション）
+タスクの削除は deleted_at に削除日時を入れるだけ（論理削除）なので、削除した行はファイルに残り続けます。
+
+バックグラウンドのスレッドが一定間隔で次の2つを行います。
+1. 削除してから TOMBSTONE_RETENTION 秒たった行を、古い順に少しずつ完全に削除する
+2. auto_vacuum = INCREMENTAL のデータベースでは、PRAGMA incremental_vacuum で
+   空いたページをファイルの末尾から切り詰め、ファイルを小さくする
+
+どちらも小分け（COMPACTION_BATCH_SIZE 件・VACUUM_PAGES ページずつ）にして、
+1回ごとに書き込み用の接続をプールへ返すため、リクエストの書き込みを長く待たせません。
+"""
+
+import sqlite3
+import threading
+import time
+
+# PRAGMA auto_vacuum の値と名前（2: INCREMENTAL のときだけ incremental_vacuum で切り詰められる）
+AUTO_VACUUM_MODES = {0: 'none', 1: 'full', 2: 'incremental'}
+AUTO_VACUUM_INCREMENTAL = 2
+
+
+def auto_vacuum_mode(conn):
+    """
+    データベースの auto_vacuum の設定（0: NONE, 1: FULL, 2: INCREMENTAL）を返す
+    """
+    return conn.execute('PRAGMA auto_vacuum').fetchone()[0]
+
+
+def count_tombstones(conn):
+    """
+    削除済みでまだ残っている行の数（削除済みの行だけの部分インデックスで数える）
+    """
+    return conn.execute('SELECT COUNT(*) FROM todos WHERE deleted_at IS NOT NULL').fetchone()[0]
+
+
+def purge_tombstones(conn, older_than, limit):
+    """
+    削除してから older_than 秒以上たった行を、古い順に最大 limit 件完全に削除する（コミットは呼び出し側）
+    戻り値: 削除した件数
+    """
+    return conn.execute('''
+        DELETE FROM todos
+        WHERE id IN (
+            SELECT id FROM todos
+            WHERE deleted_at IS NOT NULL AND deleted_at <= datetime('now', ?)
+            ORDER BY deleted_at
+            LIMIT ?
+        )
+    ''', (f'-{int(older_than)} seconds', limit)).rowcount
+
+
+class Compactor:
+    """
+    削除済みの行の片付けと incremental_vacuum を行うバックグラウンドのスレッド
+
+    スレッドは最初のリクエストで start() が呼ばれたときに起動する
+    （本番用のサーバーでプロセスを分けた後、各プロセスで起動するため）
+    interval が 0 以下なら起動しない（run_once() を直接呼ぶことはできる）
+    """
+
+    def __init__(self, pool, interval=60.0, retention=600.0, batch_size=500, vacuum_pages=256):
+        self._pool = pool
+        self.interval = interval          # 片付けを行う間隔（秒）
+        self.retention = retention        # 削除してから完全に消すまでの秒数（この間は元に戻せる）
+        self.batch_size = batch_size      # 1回のトランザクションで完全に削除する最大件数
+        self.vacuum_pages = vacuum_pages  # 1回の incremental_vacuum で切り詰める最大ページ数
+
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._stats = {
+            'runs': 0,              # 片付けを行った回数
+            'purged': 0,            # 完全に削除した行の数
+            'vacuumed_pages': 0,    # incremental_vacuum で切り詰めたページ数
+            'tombstones': None,     # 前回の片付けの後に残っていた削除済みの行の数
+            'freelist_pages': None, # 前回の片付けの後の空きページ数
+            'auto_vacuum': None,
+            'last_run': None,
+            'last_duration_ms': None,
+            'last_error': None,
+        }
+
+    def start(self):
+        """
+        片付けのスレッドを起動する（起動済み・interval が 0 以下なら何もしない）
+        """
+        if self.interval <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name='sqlite-compactor', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=5.0):
+        """
+        片付けのスレッドを止める（実行中の1回分が終わるまで待つ）
+        """
+        thread = self._thread
+        if thread is None:
+            return
+        self._stopping.set()
+        thread.join(timeout)
+
+    def run_once(self, retention=None):
+        """
+        片付けを1回行い、{'purged': 完全に削除した件数, 'vacuumed_pages': 切り詰めたページ数} を返す
+        retention: 削除してから完全に消すまでの秒数（None なら設定の値）
+        """
+        retention = self.retention if retention is None else retention
+        started = time.perf_counter()
+
+        # 1. 削除済みの行を batch_size 件ずつ完全に削除する（1回ごとに接続を返す）
+        purged = 0
+        while not self._stopping.is_set():
+            count = self._with_connection(self._purge_batch, retention)
+            purged += count
+            if count < self.batch_size:
+                break
+
+        # 2. 空きページをファイルの末尾から切り詰める（INCREMENTAL のデータベースのみ）
+        mode, freelist = self._with_connection(
+            lambda conn: (auto_vacuum_mode(conn), conn.execute('PRAGMA freelist_count').fetchone()[0])
+        )
+        vacuumed = 0
+        if mode == AUTO_VACUUM_INCREMENTAL:
+            while freelist > 0 and not self._stopping.is_set():
+                remaining = self._with_connection(self._vacuum_step, min(freelist, self.vacuum_pages))
+                if remaining >= freelist:
+                    # 切り詰められなかった（他の接続が読み取り中など）場合は次の回に任せる
+                    break
+                vacuumed += freelist - remaining
+                freelist = remaining
+            if vacuumed:
+                # WALモードでは、切り詰めはチェックポイントで本体のファイルに反映される
+                # PASSIVE は読み書き中のリクエストを待たず、できる範囲だけ反映する
+                self._with_connection(lambda conn: conn.execute('PRAGMA wal_checkpoint(PASSIVE)').fetchall())
+
+        tombstones = self._with_connection(count_tombstones)
+        with self._lock:
+            self._stats['runs'] += 1
+            self._stats['purged'] += purged
+            self._stats['vacuumed_pages'] += vacuumed
+            self._stats['tombstones'] = tombstones
+            self._stats['freelist_pages'] = freelist
+            self._stats['auto_vacuum'] = AUTO_VACUUM_MODES.get(mode, mode)
+            self._stats['last_run'] = time.strftime('%Y-%m-%dT%H:%M:%S')
+            self._stats['last_duration_ms'] = round((time.perf_counter() - started) * 1000, 2)
+            self._stats['last_error'] = None
+        return {'purged': purged, 'vacuumed_pages': vacuumed}
+
+    def get_stats(self):
+        """
+        片付けの統計情報を返す（/health で表示）
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        stats['running'] = self._thread is not None and self._thread.is_alive()
+        stats['interval'] = self.interval
+        stats['retention'] = self.retention
+        return stats
+
+    def _with_connection(self, fn, *args):
+        """
+        書き込み用の接続を借りて fn(conn, *args) を実行し、すぐに返す
+        """
+        conn = self._pool.acquire()
+        try:
+            return fn(conn, *args)
+        finally:
+            self._pool.release(conn)
+
+    def _purge_batch(self, conn, retention):
+        with conn:
+            return purge_tombstones(conn, retention, self.batch_size)
+
+    def _vacuum_step(self, conn, pages):
+        """
+        空きページを最大 pages ページ切り詰め、残りの空きページ数を返す
+        トランザクションの外で実行するため、1回ごとに自動でコミットされる
+        """
+        conn.execute(f'PRAGMA incremental_vacuum({int(pages)})').fetchall()
+        return conn.execute('PRAGMA freelist_count').fetchone()[0]
+
+    def _run(self):
+        """
+        片付けのスレッドの本体（interval 秒ごとに run_once() を呼ぶ）
+        """
+        while not self._stopping.wait(self.interval):
+            try:
+                self.run_once()
+            except sqlite3.Error as e:
+                # データベースが使えない間も次の回で再試行する
+                with self._lock:
+                    self._stats['last_error'] = str(e)
@@ -0,0 +1,145 @@
+"""
+Step 5: アプリとデータベースの設定
+create_app(config) と init_db.py が同じ設定（接続先・接続プールの大きさ・PRAGMA の組み合わせ）を使う
+
+接続先（DATABASE）には次のどれかを指定できます。
+- ファイルのパス: 'todo_app.db'（既定は step05_database フォルダの todo_app.db）
+- SQLite の URI: 'file:todo_app.db?cache=private' など
+- メモリ上のデータベース: ':memory:'（アプリごとに別のデータベースになり、終了すると消える。テスト用）
+  'file:名前?mode=memory&cache=shared' のように名前を付けると、同じ名前のアプリどうしで共有できる
+"""
+
+import itertools
+import os
+from urllib.parse import urlsplit
+from urllib.request import url2pathname
+
+# データベースファイルのパス（環境変数 STEP5_DATABASE で変更できる）
+# どのフォルダから起動しても同じファイルを使うよう、このフォルダを基準にする
+DEFAULT_DATABASE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'todo_app.db')
+
+# PRAGMA の組み合わせ（プロファイル）
+# journal_mode はデータベースに記録されるため init_db.py で一度だけ設定し、
+# writer・reader は接続を作るたびに書き込み用・読み取り用の接続で実行する
+PRAGMA_PROFILES = {
+    # 既定: WALモード。書き込み中でも読み取りは待たず、コミットごとのディスクへの書き出しを減らす
+    'wal': {
+        'journal_mode': 'WAL',
+        'writer': ('PRAGMA synchronous = NORMAL',),
+        'reader': (),
+    },
+    # 停電・OSの異常終了でも直前のコミットを失わない（書き込みは遅くなる）
+    'durable': {
+        'journal_mode': 'WAL',
+        'writer': ('PRAGMA synchronous = FULL',),
+        'reader': (),
+    },
+    # テスト・ベンチマーク用: ディスクへの書き出しを待たない（異常終了するとデータが壊れることがある）
+    'fast': {
+        'journal_mode': 'WAL',
+        'writer': ('PRAGMA synchronous = OFF', 'PRAGMA temp_store = MEMORY'),
+        'reader': ('PRAGMA temp_store = MEMORY',),
+    },
+    # メモリ上のデータベース用（共有キャッシュでは読み取りがテーブル単位のロックを待たないようにする）
+    'memory': {
+        'journal_mode': 'MEMORY',
+        'writer': ('PRAGMA synchronous = OFF',),
+        'reader': ('PRAGMA read_uncommitted = 1',),
+    },
+}
+
+# 設定の既定値（create_app(config) に渡した辞書で上書きする）
+DEFAULT_CONFIG = {
+    'DATABASE': os.environ.get('STEP5_DATABASE', DEFAULT_DATABASE),
+    # 読み取り用の接続プールの最大接続数（同時に処理できるGETリクエスト数の目安）
+    'READ_POOL_SIZE': 8,
+    # 書き込み用の接続数（SQLiteは同時に1つしか書き込めないため、1本を順番に使う）
+    'WRITE_POOL_SIZE': 1,
+    # PRAGMA_PROFILES の名前（None: メモリ上のデータベースなら 'memory'、それ以外は 'wal'）
+    'PRAGMA_PROFILE': None,
+    # 書き込みキュー（グループコミット）を使うか（環境変数 STEP5_WRITE_QUEUE=1 で有効化）
+    'USE_WRITE_QUEUE': os.environ.get('STEP5_WRITE_QUEUE') == '1',
+    # メモリ上のデータベースを作るときにサンプルデータを入れるか
+    'SAMPLE_DATA': True,
+    # 削除済みのタスクを片付ける間隔（秒、0 で片付けのスレッドを起動しない）
+    'COMPACTION_INTERVAL': float(os.environ.get('STEP5_COMPACTION_INTERVAL', '60')),
+    # 削除してから完全に消すまでの秒数（この間は「元に戻す」で復元できる）
+    'TOMBSTONE_RETENTION': 600,
+    # 片付けで1回のトランザクションに完全に削除する件数・1回の incremental_vacuum で切り詰めるページ数
+    'COMPACTION_BATCH_SIZE': 500,
+    'VACUUM_PAGES': 256,
+    # これ以上時間のかかったSQLを遅いSQLとして記録する（ミリ秒、環境変数 STEP5_SLOW_QUERY_MS で変更できる）
+    'SLOW_QUERY_MS': float(os.environ.get('STEP5_SLOW_QUERY_MS', '50')),
+    # 遅いSQLのログファイル（相対パスは step05_database フォルダが基準。None でファイルには書かない）
+    'SLOW_QUERY_LOG': os.environ.get('STEP5_SLOW_QUERY_LOG', 'slow_queries.log'),
+}
+
+# ':memory:' を指定したアプリごとに別の名前を付けるための連番
+_memory_names = itertools.count(1)
+
+
+def is_uri(database):
+    return database.startswith('file:')
+
+
+def is_memory_database(database):
+    """
+    メモリ上のデータベースか（':memory:'・'file::memory:'・mode=memory の URI）
+    """
+    if database == ':memory:':
+        return True
+    if not is_uri(database):
+        return False
+    path, _, query = database[len('file:'):].partition('?')
+    return path == ':memory:' or 'mode=memory' in query.split('&')
+
+
+def resolve_database(database):
+    """
+    ':memory:' を、複数の接続から使える共有キャッシュの URI（アプリごとに別の名前）に置き換える
+    （そのままの ':memory:' は接続ごとに別のデータベースになり、接続プールで使えないため）
+    """
+    if database == ':memory:':
+        return f'file:step5-memory-{os.getpid()}-{next(_memory_names)}?mode=memory&cache=shared'
+    return database
+
+
+def database_path(database):
+    """
+    データベースファイルのパスを返す（メモリ上のデータベースなら None）
+    """
+    if is_memory_database(database):
+        return None
+    if is_uri(database):
+        return url2pathname(urlsplit(database).path)
+    return database
+
+
+def pragma_profile_name(config):
+    """
+    設定の PRAGMA_PROFILE の名前（None なら接続先に合わせて 'memory' か 'wal'）
+    """
+    name = config.get('PRAGMA_PROFILE')
+    if name is None:
+        name = 'memory' if is_memory_database(config['DATABASE']) else 'wal'
+    if name not in PRAGMA_PROFILES:
+        raise ValueError(f"PRAGMA_PROFILE は {', '.join(PRAGMA_PROFILES)} のどれかを指定してください: {name}")
+    return name
+
+
+def get_pragma_profile(config):
+    """
+    設定の PRAGMA_PROFILE からプロファイルを取り出す
+    """
+    return PRAGMA_PROFILES[pragma_profile_name(config)]
+
+
+def load_config(overrides=None):
+    """
+    既定値に overrides を重ねた設定を返す（DATABASE の ':memory:' はここで URI に置き換える）
+    """
+    config = dict(DEFAULT_CONFIG)
+    config.update(overrides or {})
+    config['DATABASE'] = resolve_database(config['DATABASE'])
+    get_pragma_profile(config)  # 名前の誤りを起動時に知らせる
+    return config
@@ -0,0 +1,109 @@
+"""
+Step 5: アプリごとのデータベース（接続先・接続プール・書き込みキュー）
+create_app(config) がアプリごとに1つ作り、app.extensions['todo_db'] に保存する
+同じプロセスで複数のアプリを作っても、接続先やプールが混ざらない
+"""
+
+import os
+import sqlite3
+
+from compaction import Compactor
+from config import PRAGMA_PROFILES, database_path, is_memory_database, pragma_profile_name
+from db_pool import ConnectionPool
+from db_tracing import TracedConnection
+from write_queue import WriteQueue
+
+
+class TodoDatabase:
+    """
+    1つのアプリが使うデータベースの接続をまとめて持つ
+
+    - write_pool: 書き込み専用の接続（WRITE_POOL_SIZE 本）
+    - read_pool: 読み取り専用の接続（READ_POOL_SIZE 本）
+    - write_queue: 書き込みキュー（最初の書き込みで書き込みスレッドが起動する）
+    - compactor: 削除済みの行の片付けと incremental_vacuum（最初のリクエストでスレッドが起動する）
+    - メモリ上のデータベースは最後の接続を閉じると消えるため、アプリが動いている間は接続を1本開いたままにする
+    - timing_listener: このデータベースの接続でSQLを実行するたびに、秒数とSQL文の数を渡して呼ぶ関数
+    - statement_listener: このデータベースの接続で実行したSQL文ごとに呼ぶ関数（遅いSQLの記録など）
+    """
+
+    def __init__(self, config, factory=TracedConnection, timing_listener=None, statement_listener=None):
+        self.database = config['DATABASE']
+        self.path = database_path(self.database)
+        self.use_write_queue = config['USE_WRITE_QUEUE']
+        self.profile_name = pragma_profile_name(config)
+        profile = PRAGMA_PROFILES[self.profile_name]
+
+        self.in_memory = is_memory_database(self.database)
+        self.keeper = None
+        if self.in_memory:
+            self.keeper = sqlite3.connect(self.database, uri=True, check_same_thread=False)
+
+        # 接続プール（接続を閉じずに使い回し、毎回の接続コストを省く）
+        # GETのページは読み取り専用の接続（mode=ro）、追加・更新・削除は書き込み専用の接続を使う
+        self.timing_listener = timing_listener
+        self.statement_listener = statement_listener
+        self.write_pool = ConnectionPool(self.database, max_size=config['WRITE_POOL_SIZE'], factory=factory,
+                                         pragmas=profile['writer'], on_connect=self._on_connect)
+        self.read_pool = ConnectionPool(self.database, max_size=config['READ_POOL_SIZE'], factory=factory,
+                                        read_only=True, pragmas=profile['reader'], on_connect=self._on_connect)
+        self.write_queue = WriteQueue(self.write_pool)
+        self.compactor = Compactor(self.write_pool, interval=config['COMPACTION_INTERVAL'],
+                                   retention=config['TOMBSTONE_RETENTION'],
+                                   batch_size=config['COMPACTION_BATCH_SIZE'],
+                                   vacuum_pages=config['VACUUM_PAGES'])
+
+        # スキーマが最新であることを確認済みかどうか（確認は一度だけ行う）
+        self.schema_checked = False
+
+    def _on_connect(self, conn):
+        """
+        新しい接続に、このアプリのSQLの記録先を付ける（他のアプリの接続とは混ざらない）
+        """
+        if self.timing_listener is not None:
+            conn.timing_listener = self.timing_listener
+        if self.statement_listener is not None:
+            conn.statement_listener = self.statement_listener
+
+    def exists(self):
+        """
+        データベースがあるか（メモリ上のデータベースはアプリが動いている間は常にある）
+        """
+        return self.in_memory or os.path.exists(self.path)
+
+    def size(self):
+        """
+        データベースファイルの大きさ（バイト、ファイルがなければ None）
+        """
+        if self.in_memory or not os.path.exists(self.path):
+            return None
+        return os.path.getsize(self.path)
+
+    def check(self):
+        """
+        読み取り専用の接続で SELECT 1 を実行できるか確認する（/readyz 用）
+        リクエストの接続（flask.g）は使わず、プールから直接借りてすぐに返す
+        """
+        conn = self.read_pool.acquire()
+        try:
+            conn.execute('SELECT 1').fetchone()
+        finally:
+            self.read_pool.release(conn)
+
+    def close(self):
+        """
+        書き込み・片付けのスレッドを止め、すべての接続を閉じる（メモリ上のデータベースはここで消える）
+        """
+        self.compactor.stop()
+        self.write_queue.stop()
+        self.write_pool.close_all()
+        self.read_pool.close_all()
+        if self.keeper is not None:
+            self.keeper.close()
+            self.keeper = None
+
+    def get_stats(self):
+        return {
+            'read': self.read_pool.get_stats(),
+            'write': self.write_pool.get_stats(),
+        }
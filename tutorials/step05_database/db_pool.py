@@ -0,0 +1,193 @@
+"""
+Step 5: SQLite接続プール
+リクエストごとに接続を開き直すコストを省くための、上限付き・スレッド対応の接続プール
+"""
+
+import os
+import queue
+import sqlite3
+import threading
+import time
+from urllib.request import pathname2url
+
+
+class PoolTimeoutError(sqlite3.OperationalError):
+    """
+    プールの接続がすべて使用中で、待ち時間内に空かなかった場合のエラー
+    """
+
+
+def read_only_uri(database):
+    """
+    読み取り専用で開くための URI を作る
+    - ファイルのパス: file:todo_app.db?mode=ro の形式（Windows のパスも URI に変換する）
+    - URI: 末尾に mode=ro を加える（メモリ上のデータベースは mode=memory のままにし、PRAGMA query_only だけで守る）
+    """
+    if not database.startswith('file:'):
+        return f'file:{pathname2url(os.path.abspath(database))}?mode=ro'
+    path, _, query = database.partition('?')
+    params = query.split('&') if query else []
+    if path == 'file::memory:' or any(param.startswith('mode=') for param in params):
+        return database
+    return f"{path}?{'&'.join(params + ['mode=ro'])}"
+
+
+class ConnectionPool:
+    """
+    SQLite接続を使い回すための接続プール
+
+    - 最大 max_size 本まで接続を作成し、それ以上は空きが出るまで待つ
+    - 接続は閉じずにプールへ戻すため、各接続のプリペアドステートメント
+      キャッシュ（cached_statements）が温まった状態で再利用される
+    - check_same_thread=False で作成し、スレッドをまたいで安全に受け渡す
+      （1本の接続を同時に使うのは常に1リクエストだけ）
+    - database にはファイルのパスか SQLite の URI（file:...）を指定する
+    - read_only=True の場合は読み取り専用（mode=ro の URI と PRAGMA query_only）で開く
+      （書き込みのロックを取らないため、WALモードでは書き込み中でも待たずに読める）
+    - pragmas には、接続を作るたびに実行する PRAGMA 文を指定できる
+    - on_connect には、接続を作るたびに on_connect(接続) の形で呼ぶ関数を指定できる
+    """
+
+    def __init__(self, database, max_size=5, timeout=10.0, cached_statements=256,
+                 factory=sqlite3.Connection, read_only=False, pragmas=(), on_connect=None):
+        self.database = database
+        self.max_size = max_size
+        self.timeout = timeout
+        self.cached_statements = cached_statements
+        self.factory = factory  # 接続のクラス（SQLの計測用に差し替えられる）
+        self.read_only = read_only
+        self.pragmas = tuple(pragmas)
+        self.on_connect = on_connect  # アプリごとの設定（SQLの記録先など）を接続に付ける
+
+        # 最後に返却された接続から使う（LIFO）とキャッシュが温かい接続を優先できる
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        # 接続が返却された・破棄されて空きができたことを、待っているスレッドに知らせる
+        self._freed = threading.Condition(self._lock)
+        self._open = 0
+        self._stats = {
+            'hits': 0,       # 空き接続をそのまま再利用できた回数
+            'misses': 0,     # 新しく接続を作成した回数
+            'waits': 0,      # 上限に達して空きを待った回数
+            'timeouts': 0,   # 待ち時間内に空かなかった回数
+        }
+
+    def _connect(self):
+        """
+        新しい接続を作成する
+        """
+        database, uri = self.database, self.database.startswith('file:')
+        if self.read_only:
+            database, uri = read_only_uri(self.database), True
+        conn = sqlite3.connect(
+            database,
+            timeout=self.timeout,
+            check_same_thread=False,
+            cached_statements=self.cached_statements,
+            factory=self.factory,
+            uri=uri,
+        )
+        conn.row_factory = sqlite3.Row  # 辞書形式でデータを取得
+        if self.read_only:
+            # 誤って書き込むSQLを実行してもエラーにする
+            conn.execute('PRAGMA query_only = ON')
+        for pragma in self.pragmas:
+            conn.execute(pragma)
+        if self.on_connect is not None:
+            self.on_connect(conn)
+        return conn
+
+    def acquire(self):
+        """
+        プールから接続を1本借りる
+        上限に達していれば、空き接続が返却されるか、壊れた接続の破棄で新しく作れるようになるまで待つ
+        """
+        deadline = None
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+                with self._lock:
+                    self._stats['hits'] += 1
+                return conn
+            except queue.Empty:
+                pass
+
+            with self._lock:
+                if self._open < self.max_size:
+                    self._open += 1
+                    self._stats['misses'] += 1
+                    break
+                if self._idle.qsize():
+                    # 確認してからロックを取るまでの間に返却された
+                    continue
+                if deadline is None:
+                    self._stats['waits'] += 1
+                    deadline = time.monotonic() + self.timeout
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats['timeouts'] += 1
+                    raise PoolTimeoutError(
+                        f'接続プールが満杯です（最大{self.max_size}本、{self.timeout}秒待機）'
+                    )
+                # 上限に達しているので、他のリクエストが返却・破棄するまで待つ
+                self._freed.wait(remaining)
+
+        try:
+            return self._connect()
+        except Exception:
+            with self._lock:
+                self._open -= 1
+                self._freed.notify()
+            raise
+
+    def release(self, conn):
+        """
+        借りた接続をプールへ返却する
+        未確定のトランザクションが残っていればロールバックしてから戻す
+        """
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            # 壊れた接続は再利用せずに破棄する
+            self._discard(conn)
+            return
+        with self._lock:
+            self._idle.put(conn)
+            self._freed.notify()
+
+    def _discard(self, conn):
+        """
+        接続を閉じてプールの管理対象から外す
+        """
+        try:
+            conn.close()
+        finally:
+            with self._lock:
+                self._open -= 1
+                # 空いた分で、待っているスレッドが新しい接続を作れる
+                self._freed.notify()
+
+    def close_all(self):
+        """
+        待機中の接続をすべて閉じる（アプリ終了時など）
+        """
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(conn)
+
+    def get_stats(self):
+        """
+        プールの統計情報を返す（/health で表示）
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats['open_connections'] = self._open
+        stats['idle_connections'] = self._idle.qsize()
+        stats['in_use_connections'] = stats['open_connections'] - stats['idle_connections']
+        stats['max_size'] = self.max_size
+        stats['read_only'] = self.read_only
+        return stats
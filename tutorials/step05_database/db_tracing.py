@@ -0,0 +1,149 @@
+"""
+Step 5: SQLの実行回数と実行時間の計測
+接続プールが作る接続を TracedConnection にすると、SQLを実行するたびに接続の timing_listener
+（なければ set_listener() で登録した関数）が呼ばれます
+（app.py では create_app() でアプリの接続ごとに登録し、その時間をリクエストごとに積み上げて /metrics と Server-Timing に出力します）
+"""
+
+import sqlite3
+import time
+
+
+def _ignore(*args):
+    pass
+
+
+# SQLを実行するたびに listener(秒数, SQL文の数) が呼ばれる
+# 接続の timing_listener 属性に関数を入れると、その接続ではこちらの代わりにその関数が呼ばれる
+_listener = _ignore
+
+# SQL文1つの実行が終わるたびに statement_listener(接続, SQL, パラメータ, 秒数, executemany か) が呼ばれる
+# （秒数は実行と結果の取り出しの合計）
+# 接続の statement_listener 属性に関数を入れると、その接続ではこちらの代わりにその関数が呼ばれる
+_statement_listener = _ignore
+
+
+def set_listener(listener):
+    """
+    SQLの実行時間を受け取る関数を登録する（None で解除）
+    """
+    global _listener
+    _listener = listener or _ignore
+
+
+def set_statement_listener(listener):
+    """
+    SQL文ごとの実行結果（SQL・パラメータ・合計時間）を受け取る関数を登録する（None で解除）
+    """
+    global _statement_listener
+    _statement_listener = listener or _ignore
+
+
+class TracedCursor(sqlite3.Cursor):
+    """
+    SQLの実行と結果の取り出しにかかった時間を計るカーソル
+    結果を最後まで取り出した時点（またはカーソルが不要になった時点）で、SQL文1つ分の合計時間を報告する
+    """
+
+    _statement = None  # 実行中のSQL文 [SQL, パラメータ, 合計秒数, executemany か]
+
+    def _timed(self, method, statements, *args):
+        started = time.perf_counter()
+        try:
+            return method(self, *args)
+        finally:
+            elapsed = time.perf_counter() - started
+            (getattr(self.connection, 'timing_listener', None) or _listener)(elapsed, statements)
+            if self._statement is not None:
+                self._statement[2] += elapsed
+
+    def _start(self, sql, parameters, many):
+        self._finish()
+        self._statement = [sql, parameters, 0.0, many]
+
+    def _finish(self):
+        statement = self._statement
+        if statement is not None:
+            self._statement = None
+            listener = getattr(self.connection, 'statement_listener', None) or _statement_listener
+            listener(self.connection, *statement)
+
+    def execute(self, sql, parameters=()):
+        self._start(sql, parameters, False)
+        return self._timed(sqlite3.Cursor.execute, 1, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        # パラメータの一覧はジェネレーターのこともあるため、報告には渡さない
+        self._start(sql, None, True)
+        return self._timed(sqlite3.Cursor.executemany, 1, sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        self._start(sql_script, None, False)
+        return self._timed(sqlite3.Cursor.executescript, 1, sql_script)
+
+    def fetchone(self):
+        row = self._timed(sqlite3.Cursor.fetchone, 0)
+        if row is None:
+            self._finish()
+        return row
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        rows = self._timed(sqlite3.Cursor.fetchmany, 0, size)
+        if len(rows) < size:
+            self._finish()
+        return rows
+
+    def fetchall(self):
+        rows = self._timed(sqlite3.Cursor.fetchall, 0)
+        self._finish()
+        return rows
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        try:
+            self._finish()
+        except Exception:
+            pass
+
+
+class TracedConnection(sqlite3.Connection):
+    """
+    TracedCursor を使う接続（sqlite3.connect(..., factory=TracedConnection) で作る）
+    conn.execute() などの近道も TracedCursor を通すことで、すべてのSQLが計測される
+    """
+
+    # この接続のSQLの実行時間の記録先（None なら set_listener() で登録した関数）
+    timing_listener = None
+    # この接続のSQL文ごとの記録先（None なら set_statement_listener() で登録した関数）
+    statement_listener = None
+
+    def cursor(self, factory=TracedCursor):
+        return super().cursor(factory)
+
+    def execute(self, *args):
+        return self.cursor().execute(*args)
+
+    def executemany(self, *args):
+        return self.cursor().executemany(*args)
+
+    def executescript(self, *args):
+        return self.cursor().executescript(*args)
+
+    # コミット（ディスクへの書き込み）の時間も SQLite の時間に含める
+    # （with conn: の終わりのコミットも計測するため __exit__ も差し替える）
+    def _timed(self, method, *args):
+        started = time.perf_counter()
+        try:
+            return method(self, *args)
+        finally:
+            (self.timing_listener or _listener)(time.perf_counter() - started, 0)
+
+    def commit(self):
+        return self._timed(sqlite3.Connection.commit)
+
+    def __exit__(self, *exc_info):
+        return self._timed(sqlite3.Connection.__exit__, *exc_info)
@@ -3,40 +3,88 @@ Step 5: データベース初期化スクリプト
 SQLiteデータベースとテーブルの作成
 """
 
+import argparse
 import sqlite3
 import os
+import time
 from datetime import datetime
 
-def init_database():
+from compaction import AUTO_VACUUM_INCREMENTAL, AUTO_VACUUM_MODES, auto_vacuum_mode, count_tombstones
+from config import DEFAULT_CONFIG, PRAGMA_PROFILES, database_path, get_pragma_profile, is_memory_database, is_uri
+from migrations import migrate, get_schema_version
+from stats import check_stats, rebuild_stats
+from search import fts_available, rebuild_search_index
+from seed_data import DEFAULT_CHUNK_SIZE, bulk_load
+
+# データベースの接続先（app.py と同じ設定。環境変数 STEP5_DATABASE で変更できる）
+DATABASE = DEFAULT_CONFIG['DATABASE']
+
+def connect(db_path):
+    """
+    ファイルのパスまたは SQLite の URI（file:...）で接続する
+    """
+    return sqlite3.connect(db_path, uri=is_uri(db_path))
+
+def database_exists(db_path):
+    """
+    データベースがあるか（メモリ上のデータベースは、接続している間は常にある）
+    """
+    path = database_path(db_path)
+    return path is None or os.path.exists(path)
+
+def init_database(db_path=DATABASE, reset=False, with_samples=True, pragma_profile=None):
     """
     データベースとテーブルを初期化する
+    既存のデータベースはデータを残したままマイグレーションで最新の構造に更新する
+    with_samples=False の場合は、空のデータベースでもサンプルデータを入れない
+    pragma_profile: config.PRAGMA_PROFILES の名前（ジャーナルモードを決める。None なら接続先に合わせて選ぶ）
     """
-    # データベースファイルのパス
-    db_path = 'todo_app.db'
+    path = database_path(db_path)
+    profile = get_pragma_profile({'DATABASE': db_path, 'PRAGMA_PROFILE': pragma_profile})
     
-    # 既存のデータベースファイルがあれば削除（開発時のみ）
-    if os.path.exists(db_path):
-        print(f"⚠️  既存のデータベースファイル {db_path} を削除します...")
-        os.remove(db_path)
+    # reset=True の場合のみ既存のデータベースファイルを削除（開発時のみ）
+    if reset and path and os.path.exists(path):
+        print(f"⚠️  既存のデータベースファイル {path} を削除します...")
+        os.remove(path)
     
     # SQLiteデータベースに接続（ファイルが存在しなければ自動作成）
-    print(f"📊 データベースファイル {db_path} を作成します...")
-    conn = sqlite3.connect(db_path)
+    if path is None:
+        print("📊 メモリ上のデータベースを作成します...")
+    elif os.path.exists(path):
+        print(f"📊 既存のデータベースファイル {path} を更新します...")
+    else:
+        print(f"📊 データベースファイル {path} を作成します...")
+    conn = connect(db_path)
     cursor = conn.cursor()
     
-    # todosテーブルの作成
-    print("📝 todosテーブルを作成します...")
-    cursor.execute('''
-        CREATE TABLE todos (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            title TEXT NOT NULL,
-            description TEXT,
-            priority TEXT DEFAULT 'medium',
-            completed BOOLEAN DEFAULT 0,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
+    # 新しいデータベースは、削除で空いたページを少しずつファイルから切り詰められるようにする
+    # （auto_vacuum はテーブルを作る前にしか変えられない。既存のデータベースは --vacuum で切り替える）
+    if conn.execute('SELECT COUNT(*) FROM sqlite_master').fetchone()[0] == 0:
+        conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+    elif auto_vacuum_mode(conn) != AUTO_VACUUM_INCREMENTAL:
+        print("💡 python init_db.py --vacuum で、削除後の空き領域を自動で返す設定（auto_vacuum = INCREMENTAL）に切り替えられます")
+    
+    # マイグレーションを適用してテーブル・インデックスを最新にする
+    print(f"📝 スキーマを確認します（現在のバージョン: {get_schema_version(conn)}）...")
+    migrate(conn)
+    
+    # ジャーナルモードを設定する（ファイルに記録されるため一度でよい）
+    # WALモードでは、アプリの読み取り専用の接続が書き込み中でも待たずに読めるようになる
+    journal_mode = conn.execute(f"PRAGMA journal_mode = {profile['journal_mode']}").fetchone()[0]
+    print(f"📒 ジャーナルモード: {journal_mode}")
+    
+    # 既にデータがある場合はサンプルデータを入れない
+    cursor.execute('SELECT COUNT(*) FROM todos')
+    if cursor.fetchone()[0] > 0:
+        conn.close()
+        print(f"🎉 データベースの更新が完了しました（既存データはそのまま残っています）")
+        print_location(db_path)
+        return db_path
+    
+    if not with_samples:
+        conn.close()
+        print(f"🎉 データベースの初期化が完了しました（サンプルデータなし）")
+        return db_path
     
     # サンプルデータの挿入
     print("🎯 サンプルデータを挿入します...")
@@ -92,21 +140,46 @@ def init_database():
     conn.close()
     
     print(f"🎉 データベースの初期化が完了しました！")
-    print(f"📁 データベースファイル: {os.path.abspath(db_path)}")
+    print_location(db_path)
     
     return db_path
 
-def show_table_info():
+def print_location(db_path):
+    path = database_path(db_path)
+    if path is not None:
+        print(f"📁 データベースファイル: {os.path.abspath(path)}")
+
+def generate_dataset(db_path=DATABASE, rows=100000, seed=0, chunk_size=DEFAULT_CHUNK_SIZE, pragma_profile=None):
     """
-    テーブル情報を表示する（学習用）
+    性能確認用の合成データを rows 件追加する（既存のタスクは残したまま後ろに追加）
+    同じ seed を指定すれば、何度作っても同じデータになる
     """
-    db_path = 'todo_app.db'
+    init_database(db_path, with_samples=False, pragma_profile=pragma_profile)
+    print()
+    print(f"🎲 合成データを {rows:,}件 生成して追加します（seed={seed}、{chunk_size:,}件ずつ）...")
+    
+    conn = connect(db_path)
+    try:
+        result = bulk_load(conn, rows, seed=seed, chunk_size=chunk_size)
+        total = conn.execute('SELECT COUNT(*) FROM todos').fetchone()[0]
+    finally:
+        conn.close()
     
-    if not os.path.exists(db_path):
+    rate = result['rows'] / result['elapsed'] if result['elapsed'] else 0
+    print(f"✅ {result['rows']:,}件を追加しました（登録 {result['elapsed']:.2f}秒・{rate:,.0f} 件/秒、"
+          f"索引の作り直しを含めて {result['total_elapsed']:.2f}秒）")
+    print(f"📁 データベース: {db_path}（合計 {total:,}件）")
+    return result
+
+def show_table_info(db_path=DATABASE):
+    """
+    テーブル情報を表示する（学習用）
+    """
+    if not database_exists(db_path):
         print("❌ データベースファイルが見つかりません。先にinit_database()を実行してください。")
         return
     
-    conn = sqlite3.connect(db_path)
+    conn = connect(db_path)
     cursor = conn.cursor()
     
     print("\n📊 テーブル構造:")
@@ -128,7 +201,7 @@ def show_table_info():
     print("=" * 50)
     
     # データを表示
-    cursor.execute("SELECT id, title, priority, completed, created_at FROM todos LIMIT 5")
+    cursor.execute("SELECT id, title, priority, completed, created_at FROM todos WHERE deleted_at IS NULL LIMIT 5")
     rows = cursor.fetchall()
     
     for row in rows:
@@ -142,17 +215,147 @@ def show_table_info():
     
     conn.close()
 
+def verify_stats(db_path=DATABASE, rebuild=False):
+    """
+    集計テーブル todo_stats が実際の件数と一致しているかを確認する
+    rebuild=True の場合は、一致しているかどうかに関係なく作り直す
+    戻り値: 最終的に一致していれば True
+    """
+    if not database_exists(db_path):
+        print("❌ データベースファイルが見つかりません。先に python init_db.py を実行してください。")
+        return False
+    
+    conn = connect(db_path)
+    try:
+        print("🔍 集計テーブル todo_stats を実際の件数と照合します...")
+        differences = check_stats(conn)
+        if differences:
+            for name, (stored, actual) in sorted(differences.items()):
+                print(f"  ⚠️  {name}: 集計テーブル {stored} / 実際 {actual}")
+        else:
+            print("  ✅ 集計テーブルは実際の件数と一致しています")
+        
+        if rebuild or differences:
+            if not rebuild:
+                print("💡 作り直すには python init_db.py --rebuild-stats を実行してください")
+                return False
+            stats = rebuild_stats(conn)
+            print(f"🔧 集計テーブルを作り直しました（総数 {stats['total']} / 完了 {stats['completed']}）")
+        return True
+    finally:
+        conn.close()
+
+def rebuild_fts(db_path=DATABASE):
+    """
+    全文検索の索引 todos_fts を todos テーブルから作り直す
+    戻り値: 作り直せた場合は True
+    """
+    if not database_exists(db_path):
+        print("❌ データベースファイルが見つかりません。先に python init_db.py を実行してください。")
+        return False
+    
+    conn = connect(db_path)
+    try:
+        if not fts_available(conn):
+            print("⚠️  全文検索テーブル todos_fts がありません（このSQLiteはFTS5のtrigramに未対応です）")
+            return False
+        started = time.perf_counter()
+        rebuild_search_index(conn)
+        count = conn.execute('SELECT COUNT(*) FROM todos').fetchone()[0]
+        print(f"🔧 全文検索の索引を作り直しました（{count}件、{time.perf_counter() - started:.2f}秒）")
+        return True
+    finally:
+        conn.close()
+
+def vacuum_database(db_path=DATABASE):
+    """
+    auto_vacuum を INCREMENTAL に切り替え、VACUUM でデータベースを作り直す
+    以後は削除で空いたページを、アプリの片付けのスレッドが incremental_vacuum で少しずつ返す
+    VACUUM はデータベース全体を書き直すため、アプリを止めてから実行する
+    戻り値: 実行できた場合は True
+    """
+    if not database_exists(db_path):
+        print("❌ データベースファイルが見つかりません。先に python init_db.py を実行してください。")
+        return False
+    
+    path = database_path(db_path)
+    conn = connect(db_path)
+    try:
+        # 削除日時の列（deleted_at）などを使うため、先にスキーマを最新にする
+        migrate(conn)
+        before = os.path.getsize(path)
+        mode = auto_vacuum_mode(conn)
+        tombstones = count_tombstones(conn)
+        print(f"🧹 VACUUM を実行します（auto_vacuum: {AUTO_VACUUM_MODES.get(mode, mode)} → incremental、"
+              f"削除済みで残っている行: {tombstones}件）...")
+        started = time.perf_counter()
+        conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        conn.execute('VACUUM')
+        # WALモードでは書き直した内容がまず -wal ファイルに入るため、本体のファイルへ反映させる
+        conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        after = os.path.getsize(path)
+        print(f"✅ {before / 1024:.1f} KB → {after / 1024:.1f} KB（{time.perf_counter() - started:.2f}秒）")
+        return True
+    finally:
+        conn.close()
+
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Step 5: データベース初期化・更新スクリプト')
+    parser.add_argument('--reset', action='store_true',
+                        help='既存のデータベースを削除して作り直す（データは消えます）')
+    parser.add_argument('--check-stats', action='store_true',
+                        help='集計テーブル todo_stats が実際の件数と一致しているか確認する')
+    parser.add_argument('--rebuild-stats', action='store_true',
+                        help='集計テーブル todo_stats を todos テーブルから作り直す')
+    parser.add_argument('--rebuild-fts', action='store_true',
+                        help='全文検索の索引 todos_fts を todos テーブルから作り直す')
+    parser.add_argument('--vacuum', action='store_true',
+                        help='auto_vacuum を INCREMENTAL に切り替え、VACUUM でファイルを作り直す（アプリを止めてから実行）')
+    parser.add_argument('--rows', type=int, default=None,
+                        help='サンプルデータの代わりに、指定した件数の合成データを追加する')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='合成データの乱数シード（同じ値なら同じデータになる、既定: 0）')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                        help=f'合成データを1回のINSERTでまとめて登録する件数（既定: {DEFAULT_CHUNK_SIZE}）')
+    parser.add_argument('--database', '--path', dest='path', default=DATABASE,
+                        help=f'データベースファイルのパス または SQLite の URI（既定: {DATABASE}）')
+    parser.add_argument('--pragma-profile', choices=sorted(PRAGMA_PROFILES), default=None,
+                        help='PRAGMA の組み合わせ（アプリの PRAGMA_PROFILE と同じ。既定: wal）')
+    args = parser.parse_args()
+    
+    if is_memory_database(args.path):
+        parser.error('メモリ上のデータベースはこのスクリプトの終了とともに消えるため、'
+                     'アプリの起動時に create_app() が初期化します')
+    
+    if args.vacuum:
+        raise SystemExit(0 if vacuum_database(args.path) else 1)
+    
+    if args.rebuild_fts:
+        raise SystemExit(0 if rebuild_fts(args.path) else 1)
+    
+    if args.check_stats or args.rebuild_stats:
+        ok = verify_stats(args.path, rebuild=args.rebuild_stats)
+        raise SystemExit(0 if ok else 1)
+    
+    if args.rows is not None:
+        path = database_path(args.path)
+        if args.reset and os.path.exists(path):
+            print(f"⚠️  既存のデータベースファイル {path} を削除します...")
+            os.remove(path)
+        generate_dataset(args.path, rows=args.rows, seed=args.seed, chunk_size=args.chunk_size,
+                         pragma_profile=args.pragma_profile)
+        raise SystemExit(0)
+    
     print("🚀 Step 5: データベース初期化を開始します...")
     print()
     
     # データベース初期化
-    db_file = init_database()
+    db_file = init_database(args.path, reset=args.reset, pragma_profile=args.pragma_profile)
     
     print()
     
     # テーブル情報表示
-    show_table_info()
+    show_table_info(db_file)
     
     print("💡 次のステップ:")
     print("  1. python app.py を実行してFlaskアプリを起動")
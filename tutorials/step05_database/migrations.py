@@ -0,0 +1,366 @@
+"""
+Step 5: データベースのマイグレーション（スキーマの段階的な更新）
+既存のデータを残したまま、テーブルやインデックスを順番に追加していく仕組み
+
+適用済みのバージョン番号は SQLite の PRAGMA user_version に記録されるため、
+何度実行しても未適用のマイグレーションだけが実行されます。
+"""
+
+import sqlite3
+import time
+
+# マイグレーション一覧（version の昇順に並べ、一度公開したものは書き換えない）
+MIGRATIONS = [
+    {
+        'version': 1,
+        'description': 'todosテーブルの作成',
+        'statements': [
+            '''
+            CREATE TABLE IF NOT EXISTS todos (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                title TEXT NOT NULL,
+                description TEXT,
+                priority TEXT DEFAULT 'medium',
+                completed BOOLEAN DEFAULT 0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            ''',
+        ],
+    },
+    {
+        'version': 2,
+        'description': '作成日時のインデックス（一覧の並び替え・ページ送り用）',
+        'statements': [
+            # id は rowid なので、このインデックスだけで (created_at, id) 順に辿れる
+            'CREATE INDEX IF NOT EXISTS idx_todos_created_at ON todos (created_at)',
+        ],
+    },
+    {
+        'version': 3,
+        'description': '完了状態・優先度のインデックス（集計・絞り込み用）',
+        'statements': [
+            'CREATE INDEX IF NOT EXISTS idx_todos_completed ON todos (completed)',
+            'CREATE INDEX IF NOT EXISTS idx_todos_priority ON todos (priority)',
+        ],
+    },
+    {
+        'version': 4,
+        'description': '集計テーブル todo_stats とトリガー（件数を毎回数えずに済ませる）',
+        'statements': [
+            '''
+            CREATE TABLE IF NOT EXISTS todo_stats (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL DEFAULT 0
+            ) WITHOUT ROWID
+            ''',
+            # 既存データから初期値を計算する
+            'DELETE FROM todo_stats',
+            "INSERT INTO todo_stats (name, value) SELECT 'total', COUNT(*) FROM todos",
+            "INSERT INTO todo_stats (name, value) SELECT 'completed', COUNT(*) FROM todos WHERE completed = 1",
+            '''
+            INSERT INTO todo_stats (name, value)
+            SELECT 'priority:' || IFNULL(priority, ''), COUNT(*) FROM todos GROUP BY priority
+            ''',
+            # 追加・削除・更新のたびに件数を増減させるトリガー
+            '''
+            CREATE TRIGGER IF NOT EXISTS todos_stats_insert AFTER INSERT ON todos
+            BEGIN
+                UPDATE todo_stats SET value = value + 1 WHERE name = 'total';
+                UPDATE todo_stats SET value = value + 1 WHERE name = 'completed' AND NEW.completed = 1;
+                INSERT INTO todo_stats (name, value) VALUES ('priority:' || IFNULL(NEW.priority, ''), 1)
+                    ON CONFLICT (name) DO UPDATE SET value = value + 1;
+            END
+            ''',
+            '''
+            CREATE TRIGGER IF NOT EXISTS todos_stats_delete AFTER DELETE ON todos
+            BEGIN
+                UPDATE todo_stats SET value = value - 1 WHERE name = 'total';
+                UPDATE todo_stats SET value = value - 1 WHERE name = 'completed' AND OLD.completed = 1;
+                UPDATE todo_stats SET value = value - 1 WHERE name = 'priority:' || IFNULL(OLD.priority, '');
+            END
+            ''',
+            '''
+            CREATE TRIGGER IF NOT EXISTS todos_stats_update_completed AFTER UPDATE OF completed ON todos
+            WHEN (OLD.completed = 1) IS NOT (NEW.completed = 1)
+            BEGIN
+                UPDATE todo_stats
+                SET value = value + CASE WHEN NEW.completed = 1 THEN 1 ELSE -1 END
+                WHERE name = 'completed';
+            END
+            ''',
+            '''
+            CREATE TRIGGER IF NOT EXISTS todos_stats_update_priority AFTER UPDATE OF priority ON todos
+            WHEN OLD.priority IS NOT NEW.priority
+            BEGIN
+                UPDATE todo_stats SET value = value - 1 WHERE name = 'priority:' || IFNULL(OLD.priority, '');
+                INSERT INTO todo_stats (name, value) VALUES ('priority:' || IFNULL(NEW.priority, ''), 1)
+                    ON CONFLICT (name) DO UPDATE SET value = value + 1;
+            END
+            ''',
+        ],
+    },
+    {
+        'version': 5,
+        'description': '全文検索テーブル todos_fts（trigram）とトリガー',
+        # FTS5・trigram が使えないSQLiteでは作成せず、検索は LIKE で代用する
+        'requires': 'fts5_trigram',
+        'statements': [
+            # content='todos' により本文は todos から参照し、検索用の索引だけを持つ
+            '''
+            CREATE VIRTUAL TABLE IF NOT EXISTS todos_fts USING fts5(
+                title,
+                description,
+                content = 'todos',
+                content_rowid = 'id',
+                tokenize = 'trigram'
+            )
+            ''',
+            "INSERT INTO todos_fts (todos_fts) VALUES ('rebuild')",
+            '''
+            CREATE TRIGGER IF NOT EXISTS todos_fts_insert AFTER INSERT ON todos
+            BEGIN
+                INSERT INTO todos_fts (rowid, title, description)
+                VALUES (NEW.id, NEW.title, NEW.description);
+            END
+            ''',
+            '''
+            CREATE TRIGGER IF NOT EXISTS todos_fts_delete AFTER DELETE ON todos
+            BEGIN
+                INSERT INTO todos_fts (todos_fts, rowid, title, description)
+                VALUES ('delete', OLD.id, OLD.title, OLD.description);
+            END
+            ''',
+            '''
+            CREATE TRIGGER IF NOT EXISTS todos_fts_update AFTER UPDATE OF title, description ON todos
+            BEGIN
+                INSERT INTO todos_fts (todos_fts, rowid, title, description)
+                VALUES ('delete', OLD.id, OLD.title, OLD.description);
+                INSERT INTO todos_fts (rowid, title, description)
+                VALUES (NEW.id, NEW.title, NEW.description);
+            END
+            ''',
+        ],
+    },
+    {
+        'version': 6,
+        'description': 'データのバージョン番号と最終更新時刻（ETag・Last-Modified 用）',
+        'statements': [
+            "INSERT OR IGNORE INTO todo_stats (name, value) VALUES ('data_version', 1)",
+            "INSERT OR IGNORE INTO todo_stats (name, value) VALUES ('last_modified', CAST(strftime('%s', 'now') AS INTEGER))",
+            # todos が変更されるたびにバージョン番号を1つ進め、変更時刻を記録する
+            '''
+            CREATE TRIGGER IF NOT EXISTS todos_version_insert AFTER INSERT ON todos
+            BEGIN
+                UPDATE todo_stats SET value = value + 1 WHERE name = 'data_version';
+                UPDATE todo_stats SET value = CAST(strftime('%s', 'now') AS INTEGER) WHERE name = 'last_modified';
+            END
+            ''',
+            '''
+            CREATE TRIGGER IF NOT EXISTS todos_version_update AFTER UPDATE ON todos
+            BEGIN
+                UPDATE todo_stats SET value = value + 1 WHERE name = 'data_version';
+                UPDATE todo_stats SET value = CAST(strftime('%s', 'now') AS INTEGER) WHERE name = 'last_modified';
+            END
+            ''',
+            '''
+            CREATE TRIGGER IF NOT EXISTS todos_version_delete AFTER DELETE ON todos
+            BEGIN
+                UPDATE todo_stats SET value = value + 1 WHERE name = 'data_version';
+                UPDATE todo_stats SET value = CAST(strftime('%s', 'now') AS INTEGER) WHERE name = 'last_modified';
+            END
+            ''',
+        ],
+    },
+    {
+        'version': 7,
+        'description': '論理削除（deleted_at）と、削除していない行だけの部分インデックス',
+        'statements': [
+            # 削除日時（NULL: 削除されていない）。削除は deleted_at を入れるだけなので、元に戻すのも1行の UPDATE で済む
+            'ALTER TABLE todos ADD COLUMN deleted_at TIMESTAMP',
+            # 一覧・集計は削除していない行だけを読むため、インデックスにも削除していない行だけを入れる
+            'DROP INDEX IF EXISTS idx_todos_created_at',
+            'DROP INDEX IF EXISTS idx_todos_completed',
+            'DROP INDEX IF EXISTS idx_todos_priority',
+            'CREATE INDEX IF NOT EXISTS idx_todos_live_created_at ON todos (created_at) WHERE deleted_at IS NULL',
+            'CREATE INDEX IF NOT EXISTS idx_todos_live_completed ON todos (completed) WHERE deleted_at IS NULL',
+            'CREATE INDEX IF NOT EXISTS idx_todos_live_priority ON todos (priority) WHERE deleted_at IS NULL',
+            # 削除済みの行（墓標）を削除日時の古い順に探す（完全に消す処理用）
+            'CREATE INDEX IF NOT EXISTS idx_todos_deleted_at ON todos (deleted_at) WHERE deleted_at IS NOT NULL',
+            # 件数は削除していない行だけを数える
+            # 論理削除・元に戻す操作で件数を増減させ、削除済みの行の更新・完全な削除では数えない
+            'DROP TRIGGER IF EXISTS todos_stats_delete',
+            'DROP TRIGGER IF EXISTS todos_stats_update_completed',
+            'DROP TRIGGER IF EXISTS todos_stats_update_priority',
+            '''
+            CREATE TRIGGER IF NOT EXISTS todos_stats_delete AFTER DELETE ON todos
+            WHEN OLD.deleted_at IS NULL
+            BEGIN
+                UPDATE todo_stats SET value = value - 1 WHERE name = 'total';
+                UPDATE todo_stats SET value = value - 1 WHERE name = 'completed' AND OLD.completed = 1;
+                UPDATE todo_stats SET value = value - 1 WHERE name = 'priority:' || IFNULL(OLD.priority, '');
+            END
+            ''',
+            '''
+            CREATE TRIGGER IF NOT EXISTS todos_stats_soft_delete AFTER UPDATE OF deleted_at ON todos
+            WHEN OLD.deleted_at IS NULL AND NEW.deleted_at IS NOT NULL
+            BEGIN
+                UPDATE todo_stats SET value = value - 1 WHERE name = 'total';
+                UPDATE todo_stats SET value = value - 1 WHERE name = 'completed' AND OLD.completed = 1;
+                UPDATE todo_stats SET value = value - 1 WHERE name = 'priority:' || IFNULL(OLD.priority, '');
+            END
+            ''',
+            '''
+            CREATE TRIGGER IF NOT EXISTS todos_stats_restore AFTER UPDATE OF deleted_at ON todos
+            WHEN OLD.deleted_at IS NOT NULL AND NEW.deleted_at IS NULL
+            BEGIN
+                UPDATE todo_stats SET value = value + 1 WHERE name = 'total';
+                UPDATE todo_stats SET value = value + 1 WHERE name = 'completed' AND NEW.completed = 1;
+                INSERT INTO todo_stats (name, value) VALUES ('priority:' || IFNULL(NEW.priority, ''), 1)
+                    ON CONFLICT (name) DO UPDATE SET value = value + 1;
+            END
+            ''',
+            '''
+            CREATE TRIGGER IF NOT EXISTS todos_stats_update_completed AFTER UPDATE OF completed ON todos
+            WHEN (OLD.completed = 1) IS NOT (NEW.completed = 1)
+                AND OLD.deleted_at IS NULL AND NEW.deleted_at IS NULL
+            BEGIN
+                UPDATE todo_stats
+                SET value = value + CASE WHEN NEW.completed = 1 THEN 1 ELSE -1 END
+                WHERE name = 'completed';
+            END
+            ''',
+            '''
+            CREATE TRIGGER IF NOT EXISTS todos_stats_update_priority AFTER UPDATE OF priority ON todos
+            WHEN OLD.priority IS NOT NEW.priority
+                AND OLD.deleted_at IS NULL AND NEW.deleted_at IS NULL
+            BEGIN
+                UPDATE todo_stats SET value = value - 1 WHERE name = 'priority:' || IFNULL(OLD.priority, '');
+                INSERT INTO todo_stats (name, value) VALUES ('priority:' || IFNULL(NEW.priority, ''), 1)
+                    ON CONFLICT (name) DO UPDATE SET value = value + 1;
+            END
+            ''',
+            # 削除済みの行を完全に消しても画面の内容は変わらないため、データのバージョン番号は進めない
+            'DROP TRIGGER IF EXISTS todos_version_delete',
+            '''
+            CREATE TRIGGER IF NOT EXISTS todos_version_delete AFTER DELETE ON todos
+            WHEN OLD.deleted_at IS NULL
+            BEGIN
+                UPDATE todo_stats SET value = value + 1 WHERE name = 'data_version';
+                UPDATE todo_stats SET value = CAST(strftime('%s', 'now') AS INTEGER) WHERE name = 'last_modified';
+            END
+            ''',
+        ],
+    },
+]
+
+# 最新のスキーマバージョン
+LATEST_VERSION = MIGRATIONS[-1]['version']
+
+
+def get_schema_version(conn):
+    """
+    データベースに記録されている適用済みバージョンを返す
+    """
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def fts5_trigram_available(conn):
+    """
+    FTS5 の trigram トークナイザーが使えるか（SQLite 3.34.0 以降かつ FTS5 有効）を調べる
+    """
+    try:
+        conn.execute("CREATE VIRTUAL TABLE temp.fts_probe USING fts5(x, tokenize = 'trigram')")
+        conn.execute('DROP TABLE temp.fts_probe')
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+
+# マイグレーションの 'requires' に指定できる前提条件
+REQUIREMENTS = {
+    'fts5_trigram': fts5_trigram_available,
+}
+
+
+def count_todos(conn):
+    """
+    todosテーブルの行数を返す（テーブルがなければ 0）
+    """
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'todos'"
+    ).fetchone()
+    if not exists:
+        return 0
+    return conn.execute('SELECT COUNT(*) FROM todos').fetchone()[0]
+
+
+def apply_migration(conn, migration):
+    """
+    マイグレーションを1つ、トランザクションの中で適用する
+    途中で失敗した場合はロールバックされ、バージョンも進まない
+    戻り値: 中身を適用した場合は True、前提条件を満たさずスキップした場合は False
+    """
+    # 前提条件を満たさない場合は、バージョンだけ進めて中身は適用しない
+    requirement = migration.get('requires')
+    statements = migration['statements']
+    if requirement and not REQUIREMENTS[requirement](conn):
+        statements = []
+    
+    # 自動コミットを止め、BEGIN〜COMMIT を自分で管理する
+    isolation_level = conn.isolation_level
+    conn.isolation_level = None
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            for statement in statements:
+                conn.execute(statement)
+            # PRAGMA user_version もトランザクションの一部として記録される
+            conn.execute(f"PRAGMA user_version = {int(migration['version'])}")
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+    finally:
+        conn.isolation_level = isolation_level
+    
+    return bool(statements)
+
+
+def migrate(conn, target_version=None, report=print):
+    """
+    未適用のマイグレーションを順番に適用する
+
+    report: 進捗を表示する関数（None なら表示しない）
+    戻り値: 適用したマイグレーションの (version, description, 所要秒数) のリスト
+    """
+    if target_version is None:
+        target_version = LATEST_VERSION
+
+    current_version = get_schema_version(conn)
+    pending = [
+        m for m in MIGRATIONS
+        if current_version < m['version'] <= target_version
+    ]
+
+    if not pending:
+        if report:
+            report(f"✅ スキーマは最新です（バージョン {current_version}）")
+        return []
+
+    row_count = count_todos(conn)
+    if report:
+        report(f"🔧 スキーマを バージョン {current_version} → {pending[-1]['version']} に更新します（todos: {row_count}件）")
+
+    applied = []
+    for migration in pending:
+        started = time.perf_counter()
+        applied_statements = apply_migration(conn, migration)
+        elapsed = time.perf_counter() - started
+        applied.append((migration['version'], migration['description'], elapsed))
+        if report and applied_statements:
+            report(f"  ✔ v{migration['version']}: {migration['description']}（{elapsed * 1000:.1f} ms）")
+        elif report:
+            report(f"  ⏭ v{migration['version']}: {migration['description']}（このSQLiteでは未対応のためスキップ）")
+
+    return applied
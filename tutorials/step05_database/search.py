@@ -0,0 +1,94 @@
+"""
+Step 5: タスクの全文検索（FTS5 + trigram トークナイザー）
+日本語のように単語の区切りがない文章でも、3文字ずつの断片（trigram）で部分一致検索ができます
+"""
+
+# trigram は3文字単位で索引を作るため、これより短い語は索引で探せない
+MIN_TRIGRAM_LENGTH = 3
+
+SEARCH_COLUMNS = 't.id, t.title, t.description, t.priority, t.completed, t.created_at, t.updated_at'
+
+
+def fts_available(conn):
+    """
+    全文検索テーブル todos_fts が作成済みかどうか
+    """
+    row = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'todos_fts'"
+    ).fetchone()
+    return row is not None
+
+
+def split_terms(query):
+    """
+    検索語を空白（全角空白を含む）で区切る
+    """
+    return query.replace('　', ' ').split()
+
+
+def to_match_expression(terms):
+    """
+    検索語を FTS5 の MATCH 式に変換する
+    各語を "..." で囲んで記号をそのままの文字として扱い、すべてを含む行を探す（AND）
+    """
+    return ' '.join('"' + term.replace('"', '""') + '"' for term in terms)
+
+
+def escape_like(term):
+    """
+    LIKE の特殊文字（% _ \\）をそのままの文字として扱うためにエスケープする
+    """
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def search_todos(conn, query, page=1, per_page=20, use_fts=True):
+    """
+    タスクを検索し、1ページ分の結果を返す
+
+    - 全文検索が使える場合は一致度（bm25）の高い順に並べる
+    - 3文字未満の語を含む場合や全文検索がない場合は LIKE による部分一致で代用する
+    - 削除済みのタスクは索引に残っているが、結果には含めない
+    戻り値: (タスクのリスト, 次のページがあるか, 全文検索を使ったか)
+    """
+    terms = split_terms(query)
+    if not terms:
+        return [], False, False
+
+    offset = (page - 1) * per_page
+    if use_fts and all(len(term) >= MIN_TRIGRAM_LENGTH for term in terms):
+        rows = conn.execute(f'''
+            SELECT {SEARCH_COLUMNS}
+            FROM todos_fts
+            JOIN todos AS t ON t.id = todos_fts.rowid
+            WHERE todos_fts MATCH ? AND t.deleted_at IS NULL
+            ORDER BY todos_fts.rank
+            LIMIT ? OFFSET ?
+        ''', (to_match_expression(terms), per_page + 1, offset)).fetchall()
+        used_fts = True
+    else:
+        conditions = ' AND '.join(
+            "(t.title LIKE ? ESCAPE '\\' OR t.description LIKE ? ESCAPE '\\')" for _ in terms
+        )
+        params = []
+        for term in terms:
+            pattern = f'%{escape_like(term)}%'
+            params.extend([pattern, pattern])
+        rows = conn.execute(f'''
+            SELECT {SEARCH_COLUMNS}
+            FROM todos AS t
+            WHERE t.deleted_at IS NULL AND {conditions}
+            ORDER BY t.created_at DESC, t.id DESC
+            LIMIT ? OFFSET ?
+        ''', (*params, per_page + 1, offset)).fetchall()
+        used_fts = False
+
+    return rows[:per_page], len(rows) > per_page, used_fts
+
+
+def rebuild_search_index(conn):
+    """
+    全文検索の索引を todos テーブルから作り直す
+    """
+    with conn:
+        conn.execute("INSERT INTO todos_fts (todos_fts) VALUES ('rebuild')")
+        conn.execute("INSERT INTO todos_fts (todos_fts) VALUES ('optimize')")
@@ -0,0 +1,219 @@
+"""
+Step 5: 大量の合成データ（テスト用のタスク）の生成と高速な一括登録
+インデックス・キャッシュ・ページ送りの効果を確かめるために、数百万件のタスクを短時間で作ります
+
+同じ seed からは常に同じデータが作られるため、測定を何度でも同じ条件でやり直せます。
+"""
+
+import random
+import time
+from datetime import datetime, timedelta
+
+from search import fts_available, rebuild_search_index
+from stats import rebuild_stats
+
+# タイトルの組み立てに使う語句（「〇〇を△△する」の形になる）
+TITLE_OBJECTS = (
+    '週次レポート', '議事録', '見積書', '請求書', '企画書', '顧客リスト', '在庫表', '売上データ',
+    'プレゼン資料', '採用計画', '研修資料', 'マニュアル', 'ホームページ', '問い合わせ対応表',
+    'データベース設計', 'Flaskアプリ', 'HTMLテンプレート', 'CSSデザイン', 'JavaScriptの処理',
+    'テスト計画', 'バックアップ', 'セキュリティ設定', '予算案', '出張申請', '経費精算',
+)
+TITLE_ACTIONS = (
+    'を作成する', 'を確認する', 'を修正する', 'を提出する', 'を見直す', 'を共有する',
+    'をまとめる', 'を更新する', 'を整理する', 'をレビューする', 'の準備をする', 'を調査する',
+)
+DESCRIPTIONS = (
+    '{deadline}までに対応する', '関係者に確認してから進める', '前回の内容を参考にする',
+    '不明点はチームに相談する', '{deadline}の会議で報告する', '手順をメモに残しておく',
+    '優先度を見直して着手する', '完了したら上長に連絡する',
+)
+
+# 優先度の割合（high 20% / medium 50% / low 30%）
+PRIORITY_WEIGHTS = (('high', 20), ('medium', 50), ('low', 30))
+
+# 説明文を付ける割合
+DESCRIPTION_RATIO = 0.7
+
+# 完了率（古いタスクほど完了している: 最新は約 20%、最古は約 90%）
+COMPLETED_RATIO_NEWEST = 0.2
+COMPLETED_RATIO_OLDEST = 0.9
+
+# 作成日時を散らばらせる期間（同じ seed で同じデータになるよう、終わりの日時は固定）
+SPAN_DAYS = 730
+END_DATETIME = datetime(2024, 12, 31, 18, 0, 0)
+
+# 一括登録の既定値
+DEFAULT_CHUNK_SIZE = 10000
+BULK_CACHE_SIZE_KIB = 262144  # 256MB
+
+
+def generate_todos(rows, seed=0, span_days=SPAN_DAYS, end=END_DATETIME):
+    """
+    INSERT 用のタスク (title, description, priority, completed, created_at, updated_at) を rows 件順に返す
+    作成日時は古い順に並ぶため、IDの順と作成日時の順がほぼ一致する（実際の使われ方と同じ）
+    """
+    rng = random.Random(seed)
+    rand = rng.random
+    start = end - timedelta(days=span_days)
+    span_seconds = span_days * 86400
+    # 優先度は累積の割合と乱数を比べて選ぶ（random.choices を1件ずつ呼ぶより速い）
+    total_weight = sum(weight for _, weight in PRIORITY_WEIGHTS)
+    thresholds = []
+    cumulative = 0
+    for name, weight in PRIORITY_WEIGHTS:
+        cumulative += weight
+        thresholds.append((cumulative / total_weight, name))
+
+    for i in range(rows):
+        # 期間全体に均等に並べ、少しだけずらす
+        position = (i + rand()) / rows
+        created = start + timedelta(seconds=int(position * span_seconds))
+
+        title = TITLE_OBJECTS[int(rand() * len(TITLE_OBJECTS))] + TITLE_ACTIONS[int(rand() * len(TITLE_ACTIONS))]
+        if rand() < DESCRIPTION_RATIO:
+            deadline = created + timedelta(days=1 + int(rand() * 14))
+            description = DESCRIPTIONS[int(rand() * len(DESCRIPTIONS))].format(
+                deadline=f'{deadline.month:02d}月{deadline.day:02d}日'
+            )
+        else:
+            description = None
+
+        r = rand()
+        priority = next(name for threshold, name in thresholds if r < threshold)
+
+        age = 1.0 - position
+        completed_ratio = COMPLETED_RATIO_NEWEST + (COMPLETED_RATIO_OLDEST - COMPLETED_RATIO_NEWEST) * age
+        completed = 1 if rand() < completed_ratio else 0
+
+        # 完了したタスクは作成後しばらくしてから更新されている
+        created_at = created.isoformat(sep=' ')
+        if completed:
+            updated = min(created + timedelta(minutes=10 + int(rand() * 30 * 24 * 60)), end)
+            updated_at = updated.isoformat(sep=' ')
+        else:
+            updated_at = created_at
+
+        yield (title, description, priority, completed, created_at, updated_at)
+
+
+def _chunks(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _restore_objects(conn, saved):
+    """
+    bulk_load() で外したトリガー・インデックスのうち、まだないものを作り直す（インデックスを先に作る）
+    戻り値: 作り直した数
+    """
+    existing = {name for (name,) in conn.execute(
+        "SELECT name FROM sqlite_master WHERE tbl_name = 'todos' AND type IN ('trigger', 'index')"
+    )}
+    restored = 0
+    with conn:
+        for object_type, name, sql in sorted(saved, key=lambda item: item[0] != 'index'):
+            if name not in existing:
+                conn.execute(sql)
+                restored += 1
+    return restored
+
+
+def _rebuild_derived(conn):
+    """
+    トリガーを外している間に追加した分を、集計テーブルと全文検索の索引に反映する
+    """
+    rebuild_stats(conn)
+    if fts_available(conn):
+        rebuild_search_index(conn)
+
+
+def bulk_load(conn, rows, seed=0, chunk_size=DEFAULT_CHUNK_SIZE, report=print):
+    """
+    合成データを rows 件、できるだけ速く todos テーブルに追加する
+
+    - 登録中だけジャーナル（書き込みの控え）と同期書き込みを止め、キャッシュを大きくする
+    - todos のトリガーとインデックスをいったん外し、登録後に作り直す
+      （1行ごとに集計・全文検索・インデックスを更新するより、最後にまとめて作る方が速い）
+    - 集計テーブルと全文検索の索引は、登録後に todos から作り直す
+
+    ※ 登録中に中断するとデータベースが壊れる可能性があるため、大切なデータのファイルには使わないこと
+      （エラーや Ctrl+C で中断した場合も、外したトリガー・インデックスと集計テーブルは作り直してから終了する）
+    戻り値: {'rows': 件数, 'elapsed': 登録にかかった秒数, 'total_elapsed': 全体の秒数}
+    """
+    started = time.perf_counter()
+
+    # 元の設定を覚えておき、最後に戻す
+    journal_mode = conn.execute('PRAGMA journal_mode').fetchone()[0]
+    synchronous = conn.execute('PRAGMA synchronous').fetchone()[0]
+    cache_size = conn.execute('PRAGMA cache_size').fetchone()[0]
+
+    conn.execute('PRAGMA journal_mode = OFF')
+    conn.execute('PRAGMA synchronous = OFF')
+    conn.execute(f'PRAGMA cache_size = -{BULK_CACHE_SIZE_KIB}')
+    conn.execute('PRAGMA temp_store = MEMORY')
+
+    saved = []
+    completed = False
+    try:
+        # todos のトリガーとインデックスの定義を控えてから外す（自動作成のインデックスは除く）
+        saved = conn.execute('''
+            SELECT type, name, sql FROM sqlite_master
+            WHERE tbl_name = 'todos' AND type IN ('trigger', 'index') AND sql IS NOT NULL
+        ''').fetchall()
+        with conn:
+            for object_type, name, _ in saved:
+                conn.execute(f'DROP {object_type.upper()} IF EXISTS "{name}"')
+        if report:
+            report(f"  ⏸ トリガー・インデックスを一時的に外しました（{len(saved)}個）")
+
+        load_started = time.perf_counter()
+        inserted = 0
+        for chunk in _chunks(generate_todos(rows, seed), chunk_size):
+            with conn:
+                conn.executemany('''
+                    INSERT INTO todos (title, description, priority, completed, created_at, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', chunk)
+            inserted += len(chunk)
+            if report and (inserted % (chunk_size * 50) == 0 or inserted == rows):
+                elapsed = time.perf_counter() - load_started
+                report(f"  📥 {inserted:,} / {rows:,}件（{inserted / elapsed:,.0f} 件/秒）")
+        load_elapsed = time.perf_counter() - load_started
+
+        # インデックスとトリガーを元に戻す（インデックスはここで全件分をまとめて作る）
+        index_started = time.perf_counter()
+        _restore_objects(conn, saved)
+        if report:
+            report(f"  ▶ トリガー・インデックスを作り直しました（{time.perf_counter() - index_started:.2f}秒）")
+
+        # 外している間に追加した分を、集計テーブルと全文検索の索引に反映する
+        _rebuild_derived(conn)
+        completed = True
+        if report:
+            report("  📊 集計テーブル・全文検索の索引を作り直しました")
+    finally:
+        if saved and not completed:
+            # 途中で失敗・中断した場合も、トリガー・インデックスがないまま残さない
+            # （スキーマのバージョンは最新のままのため、migrate() では作り直されない）
+            if conn.in_transaction:
+                conn.rollback()
+            restored = _restore_objects(conn, saved)
+            _rebuild_derived(conn)
+            if report:
+                report(f"  ⚠️ 登録を中断したため、トリガー・インデックス（{restored}個）と集計テーブルを作り直しました")
+        conn.execute(f'PRAGMA journal_mode = {journal_mode}')
+        conn.execute(f'PRAGMA synchronous = {synchronous}')
+        conn.execute(f'PRAGMA cache_size = {cache_size}')
+
+    return {
+        'rows': inserted,
+        'elapsed': load_elapsed,
+        'total_elapsed': time.perf_counter() - started,
+    }
@@ -0,0 +1,179 @@
+"""
+Step 5: 遅いSQLの記録（スロークエリログ）と実行計画（EXPLAIN QUERY PLAN）の取得
+しきい値より時間のかかったSQLを、パラメータの型・実行計画と一緒にファイルとメモリに記録します
+
+todos テーブルを全件読む（インデックスを使わない）SQLは、速くても一度だけ記録します。
+データが少ないうちは速くても、件数が増えると遅くなる原因になるためです。
+"""
+
+import collections
+import logging
+import logging.handlers
+import re
+import sqlite3
+import threading
+from datetime import datetime
+
+from flask import has_request_context, request
+
+# 実行計画を調べる対象のSQL（BEGIN・PRAGMA・CREATE などは調べない）
+EXPLAINABLE = re.compile(r'^\s*(SELECT|WITH|INSERT|UPDATE|DELETE|REPLACE)\b', re.IGNORECASE)
+
+# インデックスを使わずにテーブルを全件読む実行計画（SQLiteのバージョンで "SCAN TABLE todos" の場合もある）
+FULL_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)$')
+
+# SQLの中で todos に付けられた別名（FROM todos AS t の t）。実行計画には別名で表示される
+TODOS_ALIAS = re.compile(r'\btodos\s+(?:AS\s+)?(\w+)', re.IGNORECASE)
+NOT_ALIAS = {'WHERE', 'ORDER', 'GROUP', 'LIMIT', 'JOIN', 'LEFT', 'INNER', 'ON', 'SET', 'VALUES', 'USING', 'RETURNING'}
+
+# 実行計画を覚えておくSQLの種類の上限
+PLAN_CACHE_SIZE = 512
+
+# 全件読みを承知で実行するSQL（エクスポートなど）に付ける目印。付いたSQLは遅いときだけ記録する
+EXPECTED_FULL_SCAN = '/* expected-full-scan */'
+
+
+def normalize_sql(sql):
+    """
+    SQLの改行・空白をまとめて1行にする（ログで読みやすくするため）
+    """
+    return ' '.join(sql.split())
+
+
+def todos_names(sql):
+    """
+    実行計画で todos テーブルを表す名前（todos と、SQLの中で付けられた別名）
+    """
+    names = {'todos'}
+    for alias in TODOS_ALIAS.findall(sql):
+        if alias.upper() not in NOT_ALIAS:
+            names.add(alias)
+    return names
+
+
+def is_full_scan(sql, plan):
+    """
+    実行計画に todos の全件読み（インデックスを使わない SCAN）が含まれるか
+    """
+    names = todos_names(sql)
+    for detail in plan:
+        match = FULL_SCAN.match(detail)
+        if match and match.group(1) in names:
+            return True
+    return False
+
+
+def parameter_shape(parameters, many=False):
+    """
+    パラメータの値そのものではなく「型の並び」を返す（個人情報をログに残さないため）
+    例: ('買い物', 3) → '(str, int)'
+    """
+    if many:
+        return 'executemany'
+    if parameters is None:
+        return '()'
+    if isinstance(parameters, dict):
+        return '{' + ', '.join(f'{name}: {type(value).__name__}' for name, value in parameters.items()) + '}'
+    return '(' + ', '.join(type(value).__name__ for value in parameters) + ')'
+
+
+class SlowQueryLog:
+    """
+    遅いSQLをログファイル（ローテーション付き）とメモリ上のリングバッファに記録する
+
+    - threshold_ms: これ以上時間のかかったSQLを記録する（ミリ秒）
+    - capacity: メモリに残す件数（古いものから消える）
+    - log_path: ログファイルのパス（None ならファイルには書かない）
+    """
+
+    def __init__(self, threshold_ms=50.0, capacity=200, log_path=None,
+                 max_bytes=1024 * 1024, backup_count=3):
+        self.threshold_ms = threshold_ms
+        self._entries = collections.deque(maxlen=capacity)
+        self._lock = threading.Lock()
+        self._plans = {}  # SQL -> (実行計画, 全件読みか)
+        self._reported_full_scans = set()
+
+        self.logger = logging.getLogger(f'{__name__}.{id(self)}')
+        self.logger.setLevel(logging.INFO)
+        self.logger.propagate = False
+        if log_path:
+            handler = logging.handlers.RotatingFileHandler(
+                log_path, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8', delay=True
+            )
+            handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(message)s'))
+            self.logger.addHandler(handler)
+
+    def explain(self, conn, sql, parameters):
+        """
+        SQLの実行計画を返す（同じSQLは2回目以降は覚えておいた結果を使う）
+        戻り値: (実行計画の各行のリスト, todos を全件読むか)
+        """
+        cached = self._plans.get(sql)
+        if cached is not None:
+            return cached
+        try:
+            # 計測しない素のカーソルで実行し、EXPLAIN 自体が記録されないようにする
+            rows = sqlite3.Cursor(conn).execute(f'EXPLAIN QUERY PLAN {sql}', parameters or ()).fetchall()
+            plan = [row[3] for row in rows]
+        except sqlite3.Error as e:
+            plan = [f'(実行計画を取得できませんでした: {e})']
+        result = (plan, is_full_scan(sql, plan))
+        if len(self._plans) >= PLAN_CACHE_SIZE:
+            self._plans.clear()
+        self._plans[sql] = result
+        return result
+
+    def record(self, conn, sql, parameters, seconds, many=False):
+        """
+        SQL文1つの実行結果を受け取り、遅い場合・全件読みの場合に記録する
+        （db_tracing.set_statement_listener に登録して使う）
+        """
+        duration_ms = seconds * 1000
+        slow = duration_ms >= self.threshold_ms
+        plan, full_scan = [], False
+        if not many and EXPLAINABLE.match(sql):
+            plan, full_scan = self.explain(conn, sql, parameters)
+        if full_scan and EXPECTED_FULL_SCAN in sql:
+            full_scan = False
+
+        first_full_scan = full_scan and sql not in self._reported_full_scans
+        if not slow and not first_full_scan:
+            return
+        if full_scan:
+            self._reported_full_scans.add(sql)
+
+        entry = {
+            'time': datetime.now().isoformat(timespec='milliseconds'),
+            'duration_ms': round(duration_ms, 3),
+            'slow': slow,
+            'full_scan': full_scan,
+            'sql': normalize_sql(sql),
+            'parameters': parameter_shape(parameters, many),
+            'plan': plan,
+            'endpoint': request.endpoint if has_request_context() else None,
+        }
+        with self._lock:
+            self._entries.append(entry)
+
+        level = logging.WARNING if full_scan else logging.INFO
+        reason = 'SLOW' if slow else 'FULL-SCAN'
+        self.logger.log(level, '%s %.1fms [%s] %s %s | plan: %s', reason, duration_ms,
+                        entry['endpoint'] or '-', entry['sql'], entry['parameters'],
+                        ' / '.join(plan) or '-')
+
+    def entries(self, limit=None, full_scan_only=False):
+        """
+        記録したSQLを新しい順に返す
+        """
+        with self._lock:
+            entries = list(self._entries)
+        entries.reverse()
+        if full_scan_only:
+            entries = [entry for entry in entries if entry['full_scan']]
+        return entries[:limit] if limit else entries
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        self._reported_full_scans.clear()
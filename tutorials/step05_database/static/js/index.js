@@ -0,0 +1,171 @@
+/**
+ * index.js - ToDoリスト（メインページ）専用JavaScript
+ * JSON API（/api/todos）を使い、ページを再読み込みせずに完了切り替え・削除を行う
+ *
+ * JavaScriptが無効な場合は、これまで通りフォーム送信（POST → リダイレクト）で動作します
+ */
+
+// ページ読み込み完了時に実行
+document.addEventListener('DOMContentLoaded', function() {
+    console.log('📝 ToDoリストページのJavaScript機能を初期化中...');
+    
+    // 完了切り替え・削除フォームをAPI呼び出しに置き換える
+    initializeToggleForms();
+    initializeDeleteForms();
+});
+
+/**
+ * 完了切り替えフォームの初期化
+ */
+function initializeToggleForms() {
+    document.querySelectorAll('.js-toggle-form').forEach(form => {
+        form.addEventListener('submit', function(event) {
+            event.preventDefault();
+            
+            const todoId = this.dataset.todoId;
+            const completed = this.dataset.completed !== '1';
+            
+            // サーバーに更新後の完了状態だけを送信（1回の通信で結果が返る）
+            fetch(`/api/todos/${todoId}`, {
+                method: 'PATCH',
+                headers: {
+                    'Content-Type': 'application/json',
+                },
+                body: JSON.stringify({ completed: completed })
+            })
+            .then(response => response.json())
+            .then(data => {
+                if (data.success) {
+                    updateTodoCardUI(this.closest('.todo-card'), this, data.todo.completed);
+                    updateStats(data.stats);
+                    showMessage(data.message, 'success');
+                } else {
+                    showMessage(data.message || 'エラーが発生しました', 'error');
+                }
+            })
+            .catch(error => {
+                console.error('Error:', error);
+                showMessage('通信エラーが発生しました', 'error');
+            });
+        });
+    });
+}
+
+/**
+ * 削除フォームの初期化
+ */
+function initializeDeleteForms() {
+    document.querySelectorAll('.js-delete-form').forEach(form => {
+        form.addEventListener('submit', function(event) {
+            // 確認ダイアログでキャンセルされた場合は何もしない
+            if (event.defaultPrevented) return;
+            event.preventDefault();
+            
+            const todoCard = this.closest('.todo-card');
+            
+            fetch(`/api/todos/${this.dataset.todoId}`, {
+                method: 'DELETE'
+            })
+            .then(response => response.json())
+            .then(data => {
+                if (data.success) {
+                    todoCard.remove();
+                    updateStats(data.stats);
+                    showUndoMessage(data.message, data.restore_url);
+                } else {
+                    showMessage(data.message || 'エラーが発生しました', 'error');
+                }
+            })
+            .catch(error => {
+                console.error('Error:', error);
+                showMessage('通信エラーが発生しました', 'error');
+            });
+        });
+    });
+}
+
+/**
+ * 削除の直後に「元に戻す」ボタン付きのメッセージを表示する
+ * 元に戻したら、タスクを元の位置に表示するためにページを読み込み直す
+ */
+function showUndoMessage(message, restoreUrl) {
+    const messageArea = document.getElementById('js-message-area');
+    showMessage(message, 'success', 10000);
+    if (!messageArea || !restoreUrl) return;
+    
+    const undoButton = document.createElement('button');
+    undoButton.type = 'button';
+    undoButton.className = 'btn-undo';
+    undoButton.textContent = '↩️ 元に戻す';
+    undoButton.style.marginLeft = '12px';
+    undoButton.addEventListener('click', function() {
+        fetch(restoreUrl, { method: 'POST' })
+        .then(response => response.json())
+        .then(data => {
+            if (data.success) {
+                window.location.reload();
+            } else {
+                showMessage(data.message || 'エラーが発生しました', 'error');
+            }
+        })
+        .catch(error => {
+            console.error('Error:', error);
+            showMessage('通信エラーが発生しました', 'error');
+        });
+    });
+    messageArea.appendChild(undoButton);
+}
+
+/**
+ * ToDoカードのUI更新
+ */
+function updateTodoCardUI(todoCard, toggleForm, completed) {
+    const toggleButton = toggleForm.querySelector('.btn-toggle');
+    
+    toggleForm.dataset.completed = completed ? '1' : '0';
+    todoCard.classList.toggle('completed', completed);
+    todoCard.classList.toggle('pending', !completed);
+    toggleButton.classList.toggle('completed', completed);
+    toggleButton.textContent = completed ? '↩️ 未完了に戻す' : '✅ 完了にする';
+    todoCard.querySelector('.status-icon').textContent = completed ? '✅' : '📝';
+}
+
+/**
+ * 統計ダッシュボードの更新
+ */
+function updateStats(stats) {
+    if (!stats) return;
+    
+    const values = {
+        'stat-total': stats.total,
+        'stat-pending': stats.pending,
+        'stat-completed': stats.completed,
+        'stat-rate': `${stats.total > 0 ? Math.round(stats.completed / stats.total * 100) : 0}%`
+    };
+    
+    Object.entries(values).forEach(([id, value]) => {
+        const element = document.getElementById(id);
+        if (element) {
+            element.textContent = value;
+        }
+    });
+}
+
+/**
+ * メッセージ表示機能
+ */
+function showMessage(message, type, duration = 3000) {
+    const messageArea = document.getElementById('js-message-area');
+    
+    if (messageArea) {
+        messageArea.textContent = message;
+        messageArea.className = `alert alert-${type === 'success' ? 'success' : 'error'}`;
+        messageArea.style.display = 'block';
+        
+        // duration ミリ秒後（既定: 3秒後）に自動で非表示（新しいメッセージが出ていれば、そちらのタイマーに任せる）
+        clearTimeout(messageArea.hideTimer);
+        messageArea.hideTimer = setTimeout(() => {
+            messageArea.style.display = 'none';
+        }, duration);
+    }
+}
@@ -0,0 +1,100 @@
+"""
+Step 5: タスク統計（todo_stats 集計テーブル）の読み取りと再計算
+件数はトリガーで常に最新に保たれているため、表示のたびに COUNT(*) で数え直す必要はありません
+（数えるのは削除していないタスクだけ。論理削除したタスクは含めない）
+"""
+
+
+def read_stats(conn):
+    """
+    集計テーブルから統計情報を読み取る（行数に関係なく一定の速さ）
+    """
+    rows = conn.execute('SELECT name, value FROM todo_stats').fetchall()
+    return _to_stats(rows)
+
+
+def compute_stats(conn):
+    """
+    削除していないタスクを全件集計して統計情報を計算する（整合性チェック用、件数に比例して遅い）
+    """
+    rows = conn.execute('''
+        SELECT 'total' AS name, COUNT(*) AS value FROM todos WHERE deleted_at IS NULL
+        UNION ALL
+        SELECT 'completed', COUNT(*) FROM todos WHERE deleted_at IS NULL AND completed = 1
+        UNION ALL
+        SELECT 'priority:' || IFNULL(priority, ''), COUNT(*) FROM todos WHERE deleted_at IS NULL GROUP BY priority
+    ''').fetchall()
+    return _to_stats(rows)
+
+
+def _to_stats(rows):
+    """
+    (name, value) の行を、テンプレートで使う統計情報の辞書に変換する
+    """
+    values = {name: value for name, value in rows}
+    total = values.get('total', 0)
+    completed = values.get('completed', 0)
+    by_priority = {
+        name.split(':', 1)[1]: value
+        for name, value in values.items()
+        if name.startswith('priority:') and value > 0
+    }
+    return {
+        'total': total,
+        'completed': completed,
+        'pending': total - completed,
+        'by_priority': by_priority,
+    }
+
+
+def read_data_version(conn):
+    """
+    データのバージョン番号と最終更新時刻（UNIX時刻）を返す
+    todos が変更されるたびにトリガーで更新されるため、値が同じならデータも変わっていない
+    """
+    values = dict(conn.execute('''
+        SELECT name, value FROM todo_stats WHERE name IN ('data_version', 'last_modified')
+    ''').fetchall())
+    return values.get('data_version', 0), values.get('last_modified', 0)
+
+
+def check_stats(conn):
+    """
+    集計テーブルと実際の件数を比べ、食い違っている項目を返す
+    戻り値: {項目名: (集計テーブルの値, 実際の値)}（一致していれば空の辞書）
+    """
+    stored = read_stats(conn)
+    actual = compute_stats(conn)
+    differences = {}
+    for key in ('total', 'completed', 'pending'):
+        if stored[key] != actual[key]:
+            differences[key] = (stored[key], actual[key])
+    for priority in set(stored['by_priority']) | set(actual['by_priority']):
+        stored_count = stored['by_priority'].get(priority, 0)
+        actual_count = actual['by_priority'].get(priority, 0)
+        if stored_count != actual_count:
+            differences[f'priority:{priority}'] = (stored_count, actual_count)
+    return differences
+
+
+def rebuild_stats(conn):
+    """
+    集計テーブルを todos テーブルから作り直す（1つのトランザクションで実行）
+    """
+    with conn:
+        # 件数の行だけを作り直す（データのバージョン番号などは残す）
+        conn.execute('''
+            DELETE FROM todo_stats
+            WHERE name IN ('total', 'completed') OR name LIKE 'priority:%'
+        ''')
+        conn.execute('''
+            INSERT INTO todo_stats (name, value)
+            SELECT 'total', COUNT(*) FROM todos WHERE deleted_at IS NULL
+            UNION ALL
+            SELECT 'completed', COUNT(*) FROM todos WHERE deleted_at IS NULL AND completed = 1
+            UNION ALL
+            SELECT 'priority:' || IFNULL(priority, ''), COUNT(*) FROM todos WHERE deleted_at IS NULL GROUP BY priority
+        ''')
+        # 件数が変わった可能性があるため、キャッシュ済みのページも無効にする
+        conn.execute("UPDATE todo_stats SET value = value + 1 WHERE name = 'data_version'")
+    return read_stats(conn)
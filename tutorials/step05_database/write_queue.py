@@ -0,0 +1,206 @@
+"""
+Step 5: 書き込みキュー（グループコミット）
+複数のリクエストからの書き込みを1本の書き込み専用スレッドに集め、
+数ミリ秒ごと（または一定件数ごと）に1回のトランザクションでまとめてコミットする仕組み
+
+SQLiteは同時に1つの書き込みしかできないため、各リクエストが別々にコミットすると
+順番待ち（database is locked）とコミットごとのディスク書き込み（fsync）が発生します。
+まとめてコミットすることで、ディスク書き込みの回数を大幅に減らせます。
+"""
+
+import concurrent.futures
+import queue
+import sqlite3
+import threading
+import time
+
+# キューを止めるための目印
+_STOP = object()
+
+
+class WriteQueue:
+    """
+    書き込み専用スレッドとキュー
+
+    submit(fn, *args) で「接続を受け取って書き込む関数」を登録すると、
+    書き込みスレッドが他の書き込みとまとめて実行し、結果を Future で返す
+    各関数は SAVEPOINT で区切られるため、1件が失敗しても他の書き込みには影響しない
+
+    書き込み用の接続は pool（書き込み専用の接続プール）からまとめごとに借りて返すため、
+    キューを通さない書き込み（一括操作・インポートなど）と同じ1本の接続を順番に使える
+    """
+
+    def __init__(self, pool, max_batch=64, max_delay=0.005, timeout=10.0):
+        self._pool = pool
+        self.max_batch = max_batch      # 1回のコミットにまとめる最大件数
+        self.max_delay = max_delay      # 最初の書き込みから何秒待って後続を集めるか
+        self.timeout = timeout          # 結果を待つ最大秒数
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stats = {
+            'submitted': 0,   # 登録された書き込みの数
+            'committed': 0,   # コミットまで完了した書き込みの数
+            'failed': 0,      # エラーになった書き込みの数
+            'cancelled': 0,   # 待ち時間内に始まらず、実行せずに取り消した書き込みの数
+            'batches': 0,     # 実行したトランザクション（コミット）の数
+            'largest_batch': 0,
+        }
+
+    def start(self):
+        """
+        書き込みスレッドを起動する（起動済みなら何もしない）
+        """
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='sqlite-writer', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=5.0):
+        """
+        キューに残っている書き込みを処理してから書き込みスレッドを止める
+        """
+        thread = self._thread
+        if thread is None:
+            return
+        self._queue.put(_STOP)
+        thread.join(timeout)
+
+    def submit(self, fn, *args):
+        """
+        書き込みを登録し、結果を受け取るための Future を返す
+        fn は fn(conn, *args) の形で呼ばれ、コミットは書き込みスレッドが行う
+        """
+        self.start()
+        future = concurrent.futures.Future()
+        with self._lock:
+            self._stats['submitted'] += 1
+        self._queue.put((future, fn, args))
+        return future
+
+    def execute(self, fn, *args):
+        """
+        書き込みを登録し、コミットが終わるまで待って結果を返す
+        書き込みでエラーが起きた場合は、そのエラーがここで発生する
+
+        timeout 秒たっても始まっていない書き込みは取り消して OperationalError にする（後からコミットされることはない）
+        すでに始まっていた書き込みは、エラーにすると実際には保存された書き込みを失敗と伝えてしまう
+        （再送で同じタスクが2件できる）ため、コミットかロールバックが終わるまで待って、その結果を返す
+        """
+        future = self.submit(fn, *args)
+        try:
+            return future.result(timeout=self.timeout)
+        except concurrent.futures.TimeoutError:
+            if not future.cancel():
+                return future.result()
+            with self._lock:
+                self._stats['cancelled'] += 1
+            raise sqlite3.OperationalError(
+                f'書き込みキューの応答が{self.timeout}秒以内にありませんでした（書き込みは取り消しました）'
+            )
+
+    def get_stats(self):
+        """
+        書き込みキューの統計情報を返す（/health で表示）
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        stats['pending'] = self._queue.qsize()
+        stats['average_batch'] = round(stats['committed'] / stats['batches'], 2) if stats['batches'] else 0
+        stats['running'] = self._thread is not None and self._thread.is_alive()
+        return stats
+
+    def _run(self):
+        """
+        書き込みスレッドの本体
+        最初の1件が届いたら max_delay 秒だけ後続を待ち、まとめてコミットする
+        """
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+
+            batch = [item]
+            stopping = False
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            self._run_batch(batch)
+            if stopping:
+                break
+
+    def _run_batch(self, batch):
+        """
+        書き込み用の接続を借りてまとめた書き込みを実行し、終わったらすぐに返す
+        """
+        try:
+            conn = self._pool.acquire()
+        except Exception as e:
+            # 接続を借りられなかった場合は、まとめた書き込みすべてを失敗として返す
+            with self._lock:
+                self._stats['failed'] += len(batch)
+            for future, _, _ in batch:
+                if future.set_running_or_notify_cancel():
+                    future.set_exception(e)
+            return
+        try:
+            self._commit_batch(conn, batch)
+        finally:
+            self._pool.release(conn)
+
+    def _commit_batch(self, conn, batch):
+        """
+        集めた書き込みを1つのトランザクションで実行してコミットする
+        """
+        outcomes = []
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            for future, fn, args in batch:
+                # 待ち時間を過ぎて execute() が取り消した書き込みは実行しない
+                if not future.set_running_or_notify_cancel():
+                    continue
+                # 1件ごとに SAVEPOINT を作り、失敗した書き込みだけを取り消す
+                conn.execute('SAVEPOINT write_op')
+                try:
+                    result = fn(conn, *args)
+                    conn.execute('RELEASE write_op')
+                    outcomes.append((future, result, None))
+                except Exception as e:
+                    conn.execute('ROLLBACK TO write_op')
+                    conn.execute('RELEASE write_op')
+                    outcomes.append((future, None, e))
+            conn.execute('COMMIT')
+        except Exception as e:
+            # コミット自体に失敗した場合は、まとめた書き込みすべてを失敗として返す
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            with self._lock:
+                self._stats['failed'] += len(batch)
+            for future, _, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        # コミットが終わってから結果を返す（返した時点でデータは保存済み）
+        failed = sum(1 for _, _, error in outcomes if error is not None)
+        with self._lock:
+            self._stats['batches'] += 1
+            self._stats['committed'] += len(outcomes) - failed
+            self._stats['failed'] += failed
+            self._stats['largest_batch'] = max(self._stats['largest_batch'], len(outcomes))
+        for future, result, error in outcomes:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
@@ -0,0 +1,12 @@
+"""
+Step 5: 既定の設定（config.py）で作るアプリ
+本番用のサーバーや他の WSGI サーバーは、このファイルの app を読み込む
+
+    python -m common.serve step05_database   （tutorials フォルダから）
+
+app.py を import しただけではアプリは作られないため、テストやベンチマークは create_app(config) で作る
+"""
+
+from app import create_app, startup
+
+app = create_app(startup=startup)